@@ -1,15 +1,30 @@
-from flask import Flask
-from flask_cors import CORS
-from flask_socketio import SocketIO
 import os
-from datetime import datetime
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+if os.getenv('SOCKETIO_MESSAGE_QUEUE'):
+    # The message queue client does blocking socket I/O; patch it to cooperate with eventlet
+    import eventlet
+    eventlet.monkey_patch()
+
+from flask import Flask
+from flask_cors import CORS
+from flask_socketio import SocketIO
+from socketio import RedisManager
+from datetime import datetime
+
 def create_app():
+    from services.startup_report import startup_timer
+    startup_timer.begin()
+    
     app = Flask(__name__)
+    
+    # orjson-backed JSON for responses and request bodies
+    from services.json_codec import FastJSONProvider
+    app.json = FastJSONProvider(app)
+    
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'ideavolution')
     
     # Disable strict slashes to prevent redirects
@@ -21,19 +36,39 @@ def create_app():
          allow_headers=["Content-Type", "Authorization"],
          methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
          supports_credentials=True)
+    startup_timer.mark('flask')
     
     # Initialize SocketIO for real-time features
+    from websocket import serialization
+    socketio_options = {}
+    async_mode = os.getenv('SOCKETIO_ASYNC_MODE')
+    if async_mode:
+        # Skips auto-detection, which imports eventlet whenever it is installed
+        socketio_options['async_mode'] = async_mode
+    message_queue = os.getenv('SOCKETIO_MESSAGE_QUEUE')
+    if message_queue:
+        # Emits go through Redis and reach clients connected to any worker
+        socketio_options['client_manager'] = RedisManager(message_queue, json=serialization)
     socketio = SocketIO(app, 
                        cors_allowed_origins=["http://localhost:3000", "http://localhost:3001"],
-                       cors_credentials=True)
+                       cors_credentials=True,
+                       json=serialization,
+                       **socketio_options)
+    startup_timer.mark('socketio')
     
     # Initialize notification service
     from services.notification_service import init_notification_service
     init_notification_service(socketio)
+    startup_timer.mark('notification_service')
+    
+    # Start write-behind flushing of driver locations
+    from services.driver_location_store import driver_location_store
+    driver_location_store.start(socketio)
     
     # Register WebSocket handlers
     from websocket.handlers import register_socketio_handlers
     register_socketio_handlers(socketio)
+    startup_timer.mark('websocket_handlers')
     
     # Register blueprints
     from routes.restaurant_routes import restaurant_bp
@@ -49,6 +84,10 @@ def create_app():
     app.register_blueprint(alert_bp, url_prefix='/api/alerts')
     #app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(utility_bp)
+    startup_timer.mark('blueprints')
+    
+    # Cold start ends when the first request arrives
+    app.before_request(startup_timer.first_request)
     
     @app.route('/api/health')
     def health_check():
@@ -57,7 +96,8 @@ def create_app():
     @app.route('/api/test-firebase')
     def test_firebase():
         try:
-            from config.firebase_config import db
+            from config.firebase_config import FirebaseConfig
+            db = FirebaseConfig.get_db()
             # Try to access Firestore
             test_ref = db.collection('test').document('connection_test')
             test_ref.set({'test': True, 'timestamp': datetime.now()})
@@ -74,8 +114,9 @@ def create_app():
             'note': 'This endpoint works without Firebase'
         }
     
+    startup_timer.finish()
     return app, socketio
 
 if __name__ == '__main__':
     app, socketio = create_app()
-    socketio.run(app, debug=True, host='0.0.0.0', port=5001)
+    socketio.run(app, debug=True, host='0.0.0.0', port=int(os.getenv('PORT', 5001)))
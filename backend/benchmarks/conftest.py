@@ -0,0 +1,113 @@
+"""
+Shared fixtures for the microbenchmarks
+Everything runs offline: an in-memory SQLite store and a deterministic stub geocoder.
+"""
+import os
+import sys
+import random
+import hashlib
+import pytest
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+
+# Must be set before the services are imported
+os.environ['GEOCODE_CACHE_PATH'] = ''
+os.environ['STORAGE_BACKEND'] = 'sqlite'
+os.environ['SQLITE_PATH'] = ':memory:'
+
+from storage import set_backend
+from storage.sqlite_backend import SQLiteBackend
+from models.models import Restaurant, FoodBank, Driver, FoodAlert, _entity_caches
+from services.geocoding_service import GeocodingService
+from services.geocode_cache import GeocodeCache
+
+SEED = 42
+RESTAURANT_COUNT = 50
+FOODBANK_COUNT = 200
+DRIVER_COUNT = 100
+ALERT_COUNT = 1000
+
+# Halifax-ish bounding box
+LAT_RANGE = (44.55, 44.75)
+LNG_RANGE = (-63.75, -63.45)
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config):
+    """Keep saved runs next to the suite whatever directory pytest is started from"""
+    if config.getoption('benchmark_storage', None) == 'file://./.benchmarks':
+        config.option.benchmark_storage = 'file://' + os.path.join(BENCHMARK_DIR, '.benchmarks')
+
+
+class StubLocation:
+    def __init__(self, latitude, longitude):
+        self.latitude = latitude
+        self.longitude = longitude
+
+
+class StubGeolocator:
+    """Stands in for Nominatim: derives coordinates from a hash of the address"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def geocode(self, address, timeout=None):
+        self.calls += 1
+        digest = hashlib.sha1(address.lower().encode()).digest()
+        lat = LAT_RANGE[0] + (digest[0] / 255) * (LAT_RANGE[1] - LAT_RANGE[0])
+        lng = LNG_RANGE[0] + (digest[1] / 255) * (LNG_RANGE[1] - LNG_RANGE[0])
+        return StubLocation(lat, lng)
+
+
+def random_point(rng):
+    return {'lat': rng.uniform(*LAT_RANGE), 'lng': rng.uniform(*LNG_RANGE)}
+
+
+def clear_entity_caches():
+    for cache in _entity_caches.values():
+        cache.clear()
+
+
+@pytest.fixture
+def geocoder():
+    """Geocoding service backed by the stub, with a memory-only cache and no rate limit"""
+    return GeocodingService(geolocator=StubGeolocator(), cache=GeocodeCache(path=None), rate_limit=0)
+
+
+@pytest.fixture(scope='session')
+def store():
+    """Seeded in-memory store shared by the storage-backed benchmarks"""
+    set_backend(SQLiteBackend(':memory:'))
+    rng = random.Random(SEED)
+
+    restaurants = [Restaurant.create({
+        'name': f'Restaurant {i}',
+        'address': f'{i} Spring Garden Rd, Halifax, NS',
+        'coordinates': random_point(rng)
+    }) for i in range(RESTAURANT_COUNT)]
+    foodbanks = [FoodBank.create({
+        'name': f'Food Bank {i}',
+        'address': f'{i} Gottingen St, Halifax, NS',
+        'coordinates': random_point(rng),
+        'capacity': rng.randint(50, 500)
+    }) for i in range(FOODBANK_COUNT)]
+    drivers = [Driver.create({
+        'name': f'Driver {i}',
+        'current_location': random_point(rng),
+        'is_available': rng.random() < 0.5
+    }) for i in range(DRIVER_COUNT)]
+
+    statuses = list(FoodAlert.STATUSES.values())
+    for i in range(ALERT_COUNT):
+        FoodAlert.create({
+            'restaurant_id': rng.choice(restaurants).id,
+            'foodbank_id': rng.choice(foodbanks).id if i % 3 else None,
+            'driver_id': rng.choice(drivers).id if i % 5 == 0 else None,
+            'status': rng.choice(statuses),
+            'food_items': [{'name': 'Bread', 'quantity': rng.randint(1, 20), 'unit': 'loaves'}],
+            'total_quantity': rng.randint(1, 100),
+            'notes': 'Pick up at the back door'
+        })
+
+    return {'restaurants': restaurants, 'foodbanks': foodbanks, 'drivers': drivers}
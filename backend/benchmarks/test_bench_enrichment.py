@@ -0,0 +1,44 @@
+"""
+Benchmarks for the alert listing path: batched joins and the GET /api/alerts endpoint
+"""
+import pytest
+from models.models import FoodAlert
+from services.alert_enrichment import enrich_alerts
+from conftest import clear_entity_caches
+
+PAGE_SIZE = 100
+
+
+@pytest.fixture(scope='module')
+def client(store):
+    from app import create_app
+    app, _ = create_app()
+    return app.test_client()
+
+
+@pytest.fixture(scope='module')
+def page(store):
+    return FoodAlert.query().order_by('id').limit(PAGE_SIZE).get()
+
+
+def test_enrich_alerts_cold_cache(benchmark, page):
+    result = benchmark.pedantic(enrich_alerts, args=(page,), setup=clear_entity_caches, rounds=50)
+    assert len(result) == PAGE_SIZE
+    assert all('restaurant_name' in alert for alert in result)
+
+
+def test_enrich_alerts_warm_cache(benchmark, page):
+    enrich_alerts(page)
+    result = benchmark(enrich_alerts, page)
+    assert len(result) == PAGE_SIZE
+
+
+def test_get_alerts_endpoint(benchmark, client):
+    response = benchmark(client.get, f'/api/alerts/?page_size={PAGE_SIZE}')
+    assert response.status_code == 200
+    assert len(response.get_json()['alerts']) == PAGE_SIZE
+
+
+def test_get_alerts_endpoint_filtered(benchmark, client):
+    response = benchmark(client.get, f'/api/alerts/?status=pending&page_size={PAGE_SIZE}')
+    assert response.status_code == 200
@@ -0,0 +1,41 @@
+"""
+Benchmarks for distance calculation and nearest food bank ranking
+"""
+import random
+from models.models import FoodBank
+from conftest import SEED, random_point
+
+FOODBANK_COUNT = 1000
+
+
+def make_foodbanks(with_coordinates=True):
+    rng = random.Random(SEED)
+    return [FoodBank({
+        'id': f'fb{i}',
+        'name': f'Food Bank {i}',
+        'address': f'{i} Barrington St, Halifax, NS',
+        'coordinates': random_point(rng) if with_coordinates else {}
+    }) for i in range(FOODBANK_COUNT)]
+
+
+def test_calculate_distance(benchmark, geocoder):
+    distance = benchmark(geocoder.calculate_distance, 44.6488, -63.5752, 44.6714, -63.5773)
+    assert 2.0 < distance < 3.0
+
+
+def test_find_nearest_foodbanks_stored_coordinates(benchmark, geocoder):
+    foodbanks = make_foodbanks()
+    restaurant = {'lat': 44.6488, 'lng': -63.5752}
+
+    result = benchmark(geocoder.find_nearest_foodbanks, '1 Spring Garden Rd', foodbanks, 5, restaurant)
+    assert len(result) == 5
+    assert geocoder.geolocator.calls == 0
+
+
+def test_find_nearest_foodbanks_geocoded(benchmark, geocoder):
+    """Food banks without stored coordinates; after the first round they come from the geocode cache"""
+    foodbanks = make_foodbanks(with_coordinates=False)
+
+    result = benchmark(geocoder.find_nearest_foodbanks, '1 Spring Garden Rd, Halifax, NS', foodbanks)
+    assert len(result) == 5
+    assert geocoder.geolocator.calls == FOODBANK_COUNT + 1
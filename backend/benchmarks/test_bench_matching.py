@@ -0,0 +1,29 @@
+"""
+Benchmarks for food bank matching: scoring the nearest candidates and refreshing acceptance stats
+"""
+import pytest
+from services.foodbank_locator import FoodBankLocator
+from services.foodbank_matcher import FoodBankMatcher, AcceptanceStats, MATCH_CANDIDATES
+from conftest import ALERT_COUNT
+
+RESTAURANT = (44.6488, -63.5752)
+
+
+@pytest.fixture(scope='module')
+def matcher(store):
+    locator = FoodBankLocator()
+    locator.ensure_loaded()
+    yield FoodBankMatcher(locator=locator, acceptance=AcceptanceStats(refresh_seconds=3600))
+    locator.view._watch.unsubscribe()
+
+
+def test_rank_foodbanks(benchmark, matcher):
+    ranked = benchmark(matcher.rank, *RESTAURANT, 50)
+    assert len(ranked) == MATCH_CANDIDATES
+    assert ranked[0][2] >= ranked[-1][2]
+
+
+def test_refresh_acceptance_stats(benchmark, store):
+    stats = AcceptanceStats()
+    benchmark(stats.refresh)
+    assert stats.stats()['offers'] <= ALERT_COUNT
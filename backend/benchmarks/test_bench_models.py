@@ -0,0 +1,46 @@
+"""
+Benchmarks for model construction and serialization
+"""
+from datetime import datetime
+from models.models import FoodAlert, Driver
+
+ALERT_DATA = {
+    'id': 'alert1',
+    'created_at': datetime(2024, 1, 1, 12, 0),
+    'updated_at': datetime(2024, 1, 1, 12, 5),
+    'restaurant_id': 'restaurant1',
+    'foodbank_id': 'foodbank1',
+    'status': 'foodbank_notified',
+    'food_items': [{'name': 'Bread', 'quantity': 10, 'unit': 'loaves'}],
+    'total_quantity': 10,
+    'notes': 'Pick up at the back door',
+    'notified_foodbanks': ['foodbank1']
+}
+
+DRIVER_DATA = {
+    'id': 'driver1',
+    'name': 'Driver',
+    'current_location': {'lat': 44.6488, 'lng': -63.5752},
+    'is_available': True
+}
+
+
+def test_food_alert_construction(benchmark):
+    alert = benchmark(FoodAlert, ALERT_DATA)
+    assert alert.status == 'foodbank_notified'
+
+
+def test_food_alert_to_dict(benchmark):
+    alert = FoodAlert(ALERT_DATA)
+    data = benchmark(alert.to_dict)
+    assert data['id'] == 'alert1'
+
+
+def test_food_alert_round_trip(benchmark):
+    data = benchmark(lambda: FoodAlert(ALERT_DATA).to_dict())
+    assert data['total_quantity'] == 10
+
+
+def test_driver_construction(benchmark):
+    driver = benchmark(Driver, DRIVER_DATA)
+    assert driver.is_available
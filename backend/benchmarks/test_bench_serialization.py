@@ -0,0 +1,27 @@
+"""
+Benchmarks for JSON encoding of an alert page: Flask's default provider vs services.json_codec
+"""
+import pytest
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from models.models import FoodAlert
+from services import json_codec
+from services.alert_enrichment import enrich_alerts
+
+PAGE_SIZE = 100
+
+
+@pytest.fixture(scope='module')
+def alert_page(store):
+    return {'alerts': enrich_alerts(FoodAlert.query().order_by('id').limit(PAGE_SIZE).get())}
+
+
+def test_dumps_alert_page_flask_default(benchmark, alert_page):
+    provider = DefaultJSONProvider(Flask(__name__))
+    result = benchmark(provider.dumps, alert_page)
+    assert result.startswith('{')
+
+
+def test_dumps_alert_page(benchmark, alert_page):
+    result = benchmark(json_codec.dumps_bytes, alert_page)
+    assert json_codec.loads(result)['alerts'][0]['id'] == alert_page['alerts'][0]['id']
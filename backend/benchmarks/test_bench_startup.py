@@ -0,0 +1,34 @@
+"""
+Benchmark for a worker's cold start: a fresh interpreter that builds the app and serves one request
+"""
+import json
+import os
+import subprocess
+import sys
+
+from conftest import BENCHMARK_DIR
+
+COLD_START_SCRIPT = """
+import json
+from app import create_app
+app, socketio = create_app()
+client = app.test_client()
+assert client.get('/api/test-simple').status_code == 200
+print(json.dumps(client.get('/api/utility/stats').get_json()['startup']))
+"""
+
+
+def cold_start():
+    env = dict(os.environ, STORAGE_BACKEND='sqlite', SQLITE_PATH=':memory:', GEOCODE_CACHE_PATH='')
+    result = subprocess.run(
+        [sys.executable, '-c', COLD_START_SCRIPT],
+        cwd=os.path.dirname(BENCHMARK_DIR), env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_cold_start_to_first_request(benchmark):
+    startup = benchmark.pedantic(cold_start, rounds=3, iterations=1)
+    # Storage clients and the geocoder are created on first use, not at import
+    assert startup['deferred_modules_loaded'] == []
+    assert startup['first_request_ms'] >= startup['ready_ms']
@@ -0,0 +1,25 @@
+"""
+Benchmarks for reading active food banks: a collection query vs the materialized view
+"""
+from models.models import FoodBank
+from services.materialized_view import MaterializedView
+from conftest import FOODBANK_COUNT
+
+
+def active_foodbanks():
+    return FoodBank.query().where('is_active', '==', True)
+
+
+def test_active_foodbanks_query(benchmark, store):
+    result = benchmark(lambda: active_foodbanks().get())
+    assert len(result) == FOODBANK_COUNT
+
+
+def test_active_foodbanks_view(benchmark, store):
+    view = MaterializedView('bench_active_foodbanks', active_foodbanks())
+    view.ensure_started()
+    try:
+        result = benchmark(view.values)
+        assert len(result) == FOODBANK_COUNT
+    finally:
+        view._watch.unsubscribe()
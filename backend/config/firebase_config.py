@@ -1,12 +1,20 @@
-import firebase_admin
-from firebase_admin import credentials, firestore
 import os
+import threading
 
 class FirebaseConfig:
+    """
+    Firebase app and Firestore client, created on first use
+    firebase_admin (and the gRPC client under it) is only imported then, so
+    importing the models or blueprints doesn't need credentials or network.
+    """
     _db = None
+    _lock = threading.Lock()
     
     @classmethod
     def initialize_app(cls):
+        import firebase_admin
+        from firebase_admin import credentials
+        
         if not firebase_admin._apps:
             # For development, you'll need to download the service account key
             # from Firebase Console and set the path in .env
@@ -23,9 +31,15 @@ class FirebaseConfig:
     @classmethod
     def get_db(cls):
         if cls._db is None:
-            cls.initialize_app()
-            cls._db = firestore.client()
+            with cls._lock:
+                if cls._db is None:
+                    from firebase_admin import firestore
+                    cls.initialize_app()
+                    cls._db = firestore.client()
         return cls._db
 
-# Initialize on import
-db = FirebaseConfig.get_db()
+def __getattr__(name):
+    # `from config.firebase_config import db` still works, but connects only when it runs
+    if name == 'db':
+        return FirebaseConfig.get_db()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
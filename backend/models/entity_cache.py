@@ -0,0 +1,84 @@
+"""
+Per-collection read-through cache for model documents
+"""
+import copy
+import time
+import threading
+from collections import OrderedDict
+
+
+class EntityCache:
+    """
+    LRU cache of documents with a TTL; models store them as tuples of
+    field values, which take far less memory than dicts.
+    Reads that race with a write are not cached: every invalidation bumps a
+    generation counter, and set() ignores data read under an older generation.
+    """
+
+    def __init__(self, ttl, max_entries=1000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # doc_id -> (document, expires_at)
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._counters = {
+            'hits': 0,
+            'misses': 0,
+            'expired': 0,
+            'evictions': 0,
+            'invalidations': 0
+        }
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def get(self, doc_id):
+        """Return a private copy of the cached document, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(doc_id)
+            if entry is None:
+                self._counters['misses'] += 1
+                return None
+            if entry[1] <= time.time():
+                del self._entries[doc_id]
+                self._counters['expired'] += 1
+                self._counters['misses'] += 1
+                return None
+            self._entries.move_to_end(doc_id)
+            self._counters['hits'] += 1
+            data = entry[0]
+        # Callers may mutate nested values, so never hand out the cached document itself
+        return copy.deepcopy(data)
+
+    def set(self, doc_id, data, generation=None):
+        """Cache a document read from storage under the given generation"""
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[doc_id] = (copy.deepcopy(data), time.time() + self.ttl)
+            self._entries.move_to_end(doc_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters['evictions'] += 1
+
+    def invalidate(self, doc_id):
+        with self._lock:
+            self._generation += 1
+            if self._entries.pop(doc_id, None) is not None:
+                self._counters['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['entries'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        stats['ttl_seconds'] = self.ttl
+        stats['max_entries'] = self.max_entries
+        return stats
@@ -1,159 +1,515 @@
+import operator
+import os
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
-from config.firebase_config import db
+from models.entity_cache import EntityCache
+from models.version_cache import VersionCache
+from storage import get_backend, FieldTransform, Increment
+
+ENTITY_CACHE_ENABLED = os.getenv('ENTITY_CACHE_ENABLED', 'true').lower() == 'true'
+
+_entity_caches = {}  # collection name -> EntityCache
+_MISSING = object()
+
+# Query operators evaluated in Python, for Query.matches
+_FILTER_OPERATORS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    'in': lambda current, values: current in values,
+    'not-in': lambda current, values: current not in values,
+    'array_contains': lambda current, value: value in (current or ()),
+    'array_contains_any': lambda current, values: any(value in (current or ()) for value in values),
+}
+
+# Seconds a served resource's ETag is trusted without re-reading it. Writes made by
+# other workers aren't seen here, so the default is short when several workers run.
+VERSION_CACHE_TTL = float(os.getenv('VERSION_CACHE_TTL', 5 if os.getenv('SOCKETIO_MESSAGE_QUEUE') else 60))
+
+# Global version cache instance
+document_versions = VersionCache(VERSION_CACHE_TTL, int(os.getenv('VERSION_CACHE_SIZE', 10000)))
+
+
+def entity_cache_stats() -> Dict:
+    """Hit-rate stats for every collection cache in use"""
+    return {name: cache.stats() for name, cache in _entity_caches.items()}
+
+
+class Query:
+    """
+    Composable server-side query over one model's collection
+    Each builder method returns a new Query, so partial queries can be reused.
+    """
+    
+    def __init__(self, model):
+        self.model = model
+        self.filters = []   # (field, op, value)
+        self.orders = []    # (field, descending)
+        self.fields = None
+        self.cursor = None
+        self.max_results = None
+    
+    def _copy(self) -> 'Query':
+        query = Query(self.model)
+        query.filters = list(self.filters)
+        query.orders = list(self.orders)
+        query.fields = self.fields
+        query.cursor = self.cursor
+        query.max_results = self.max_results
+        return query
+    
+    def where(self, field: str, op: str, value) -> 'Query':
+        """Filter with a Firestore operator (==, !=, <, <=, >, >=, in, array_contains, ...)"""
+        query = self._copy()
+        query.filters.append((field, op, value))
+        return query
+    
+    def order_by(self, field: str, descending: bool = False) -> 'Query':
+        query = self._copy()
+        query.orders.append((field, descending))
+        return query
+    
+    def limit(self, count: Optional[int]) -> 'Query':
+        query = self._copy()
+        query.max_results = count
+        return query
+    
+    def select(self, *fields: str) -> 'Query':
+        """Only read these fields; other attributes get their defaults"""
+        query = self._copy()
+        query.fields = list(fields)
+        return query
+    
+    def start_after(self, values: Dict) -> 'Query':
+        """Resume after the document with these values for the order_by fields"""
+        query = self._copy()
+        query.cursor = values
+        return query
+    
+    def stream(self):
+        """Yield model instances as documents arrive"""
+        for data in self.model.storage().stream(self.model.collection_name, self):
+            yield self.model(data)
+    
+    def get(self) -> List['BaseModel']:
+        return list(self.stream())
+    
+    def first(self) -> Optional['BaseModel']:
+        return next(self.limit(1).stream(), None)
+    
+    def watch(self, callback):
+        """
+        Follow the documents matching this query's filters (see StorageBackend.watch)
+        callback(changes, read_time) gets (doc_id, instance) pairs, with instance None
+        for documents that were deleted or no longer match. Returns the storage Watch.
+        """
+        model = self.model
+        
+        def on_changes(changes, read_time):
+            callback([(doc_id, None if data is None else model(data)) for doc_id, data in changes], read_time)
+        
+        return model.storage().watch(model.collection_name, self, on_changes)
+    
+    def matches(self, instance: 'BaseModel') -> bool:
+        """Whether an instance passes this query's filters, checked locally"""
+        for field, op, value in self.filters:
+            current = getattr(instance, field, None)
+            try:
+                if not _FILTER_OPERATORS[op](current, value):
+                    return False
+            except TypeError:
+                return False  # e.g. None compared with a number, which storage doesn't match either
+        return True
+
 
 class BaseModel:
-    """Base model with common Firestore operations"""
+    """
+    Base model with common storage operations
+    Subclasses declare their document fields in `fields` (name -> default; a
+    callable such as list or dict is called for a fresh default) and list the
+    same names in __slots__. Assigning a field marks it dirty so save() writes
+    only what changed, and to_dict() is built once until a field changes.
+    """
+    __slots__ = ('id', 'created_at', 'updated_at', '_dirty', '_document')
+    fields = {'id': None, 'created_at': datetime.now, 'updated_at': datetime.now}
     collection_name = None
+    indexed_fields = ()  # Fields filtered on; backends without managed indexes create them
+    cache_ttl = None     # Seconds to cache documents read by ID; None disables caching
+    cache_size = 1000    # Max cached documents for the collection
+    
+    _all_fields = fields  # Own and inherited fields, in document order
+    
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        own_fields = cls.__dict__.get('fields', {})
+        missing = set(own_fields) - set(cls.__dict__.get('__slots__', ()))
+        if missing:
+            raise TypeError(f'{cls.__name__}.__slots__ is missing fields: {sorted(missing)}')
+        cls._all_fields = {**cls._all_fields, **own_fields}
+        cls._compile_fields()
+    
+    @classmethod
+    def _compile_fields(cls):
+        """Precompute slot setters and a getter so building and reading instances stay cheap"""
+        static, factories = [], []
+        for name, default in cls._all_fields.items():
+            set_field = getattr(cls, name).__set__  # The slot's descriptor bypasses __setattr__
+            if callable(default):
+                factories.append((set_field, name, default))
+            else:
+                static.append((set_field, name, default))
+        cls._static_fields = tuple(static)
+        cls._factory_fields = tuple(factories)
+        cls._field_names = tuple(cls._all_fields)
+        cls._field_setters = tuple(getattr(cls, name).__set__ for name in cls._field_names)
+        cls._get_fields = operator.attrgetter(*cls._field_names)
     
     def __init__(self, data: Dict):
-        self.id = data.get('id')
-        self.created_at = data.get('created_at', datetime.now())
-        self.updated_at = data.get('updated_at', datetime.now())
+        get = data.get
+        for set_field, name, default in self._static_fields:
+            set_field(self, get(name, default))
+        for set_field, name, factory in self._factory_fields:
+            value = get(name, _MISSING)
+            set_field(self, factory() if value is _MISSING else value)
+        object.__setattr__(self, '_dirty', None)
+        object.__setattr__(self, '_document', None)
+    
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        if name in self._all_fields:
+            if self._dirty is None:
+                object.__setattr__(self, '_dirty', set())
+            self._dirty.add(name)
+            object.__setattr__(self, '_document', None)
     
     def to_dict(self) -> Dict:
-        """Convert model to dictionary for Firestore"""
-        return {
-            'id': self.id,
-            'created_at': self.created_at,
-            'updated_at': self.updated_at
-        }
+        """
+        Convert model to dictionary for Firestore
+        Returns a copy of a cached dict; changing a list or dict field in place
+        isn't noticed, so assign a new value instead.
+        """
+        document = self._document
+        if document is None:
+            document = dict(zip(self._field_names, self._get_fields(self)))
+            object.__setattr__(self, '_document', document)
+        return dict(document)
+    
+    def _row(self) -> tuple:
+        """Field values in declaration order; the compact form kept in entity caches"""
+        return self._get_fields(self)
+    
+    @classmethod
+    def _from_row(cls, row: tuple) -> 'BaseModel':
+        instance = object.__new__(cls)
+        for set_field, value in zip(cls._field_setters, row):
+            set_field(instance, value)
+        object.__setattr__(instance, '_dirty', None)
+        object.__setattr__(instance, '_document', None)
+        return instance
+    
+    @property
+    def dirty_fields(self) -> frozenset:
+        """Fields assigned since the instance was loaded or last written"""
+        return frozenset(self._dirty or ())
+    
+    def assign(self, data: Dict):
+        """Set fields from a client payload; unknown keys and id/timestamps are ignored"""
+        for key, value in data.items():
+            if key in self._all_fields and key not in BaseModel.fields:
+                setattr(self, key, value)
+    
+    @classmethod
+    def storage(cls):
+        """The storage backend, with this model's collection ready for use"""
+        backend = get_backend()
+        backend.ensure_collection(cls.collection_name, cls.indexed_fields)
+        return backend
+    
+    @classmethod
+    def cache(cls) -> Optional[EntityCache]:
+        """The read-through cache for this collection, if caching is enabled"""
+        if not ENTITY_CACHE_ENABLED or not cls.cache_ttl:
+            return None
+        cache = _entity_caches.get(cls.collection_name)
+        if cache is None:
+            cache = _entity_caches.setdefault(
+                cls.collection_name, EntityCache(cls.cache_ttl, cls.cache_size)
+            )
+        return cache
     
     @classmethod
     def create(cls, data: Dict):
-        """Create new document in Firestore"""
-        doc_ref = db.collection(cls.collection_name).document()
-        data['id'] = doc_ref.id
+        """Create new document"""
+        instance = cls._new(data)
+        cls.storage().create(cls.collection_name, instance.id, instance.to_dict())
+        cls._invalidate(instance.id)
+        return instance
+    
+    @classmethod
+    def _new(cls, data: Dict) -> 'BaseModel':
+        """Instance for a document about to be created, with its ID and timestamps assigned"""
+        data['id'] = cls.storage().new_id(cls.collection_name)
         data['created_at'] = datetime.now()
         data['updated_at'] = datetime.now()
-        
-        instance = cls(data)
-        doc_ref.set(instance.to_dict())
-        return instance
+        return cls(data)
     
     @classmethod
     def get_by_id(cls, doc_id: str):
         """Get document by ID"""
-        doc = db.collection(cls.collection_name).document(doc_id).get()
-        if doc.exists:
-            return cls(doc.to_dict())
+        cache = cls.cache()
+        if cache:
+            row = cache.get(doc_id)
+            if row is not None:
+                return cls._from_row(row)
+            generation = cache.generation
+        
+        data = cls.storage().get(cls.collection_name, doc_id)
+        if data is not None:
+            instance = cls(data)
+            if cache:
+                cache.set(doc_id, instance._row(), generation)
+            return instance
         return None
     
     @classmethod
-    def get_all(cls, limit: int = 100):
-        """Get all documents"""
-        docs = db.collection(cls.collection_name).limit(limit).stream()
-        return [cls(doc.to_dict()) for doc in docs]
+    def get_many(cls, doc_ids) -> Dict[str, 'BaseModel']:
+        """Get several documents in one batched read, keyed by ID (missing IDs are left out)"""
+        unique_ids = list(dict.fromkeys(doc_id for doc_id in doc_ids if doc_id))
+        found = {}
+        
+        cache = cls.cache()
+        if cache:
+            generation = cache.generation
+            for doc_id in unique_ids:
+                row = cache.get(doc_id)
+                if row is not None:
+                    found[doc_id] = cls._from_row(row)
+            unique_ids = [doc_id for doc_id in unique_ids if doc_id not in found]
+        
+        if unique_ids:
+            for doc_id, data in cls.storage().get_many(cls.collection_name, unique_ids).items():
+                found[doc_id] = instance = cls(data)
+                if cache:
+                    cache.set(doc_id, instance._row(), generation)
+        return found
+    
+    @classmethod
+    def query(cls) -> Query:
+        """Start a server-side query, e.g. Driver.query().where('is_available', '==', True).get()"""
+        return Query(cls)
+    
+    @classmethod
+    def get_all(cls, limit: Optional[int] = 100):
+        """Get all documents (pass limit=None to read the whole collection)"""
+        return cls.query().limit(limit).get()
     
     def update(self, data: Dict):
-        """Update document"""
+        """Update document; values may be ArrayUnion/ArrayRemove/Increment, applied by the backend"""
         data['updated_at'] = datetime.now()
-        db.collection(self.collection_name).document(self.id).update(data)
+        self.storage().update(self.collection_name, self.id, data)
+        self._invalidate(self.id)
+        self._apply(data)
+    
+    def save(self) -> Dict:
+        """Write only the dirty fields (the whole document if it was never stored); returns what was written"""
+        if self.id is None:
+            backend = self.storage()
+            self.id = backend.new_id(self.collection_name)
+            self.created_at = self.updated_at = datetime.now()
+            backend.create(self.collection_name, self.id, self.to_dict())
+            self._invalidate(self.id)
+            object.__setattr__(self, '_dirty', None)
+            return self.to_dict()
         
-        # Update instance attributes
+        changes = self._changes()
+        if changes:
+            self.update(changes)
+        return changes
+    
+    def _changes(self) -> Dict:
+        return {name: getattr(self, name) for name in self._dirty or ()}
+    
+    def _apply(self, data: Dict):
+        """Mirror a committed update onto the instance attributes; the written fields are clean again"""
         for key, value in data.items():
+            if key not in self._all_fields:
+                continue
+            if isinstance(value, FieldTransform):
+                # Applied to this copy's value; the stored value also includes concurrent writes
+                value = value.apply(getattr(self, key, None))
             setattr(self, key, value)
+        if self._dirty:
+            self._dirty.difference_update(data)
     
     def delete(self):
         """Delete document"""
-        db.collection(self.collection_name).document(self.id).delete()
+        self.storage().delete(self.collection_name, self.id)
+        self._invalidate(self.id)
+    
+    @classmethod
+    def _invalidate(cls, doc_id: str):
+        """Drop a document from the read-through cache and anything validated against it after a write"""
+        cache = cls.cache()
+        if cache:
+            cache.invalidate(doc_id)
+        document_versions.invalidate(cls.collection_name, doc_id)
+
+
+BaseModel._compile_fields()
+
+
+class Batch:
+    """
+    Writes to several documents committed together in one round trip; all apply or none do
+    
+        with Batch() as batch:
+            batch.update(alert, {'status': ...})
+            batch.update(driver, {'is_available': False})
+            delivery = batch.create(DeliveryRequest, {...})
+    
+    Instances and caches are updated only once the commit succeeds.
+    """
+    
+    def __init__(self, writer=None):
+        self._writer = writer if writer is not None else get_backend().batch()
+        self._written = []  # (model class, doc ID)
+        self._updated = []  # (instance, data) to mirror after commit
+    
+    def create(self, model_cls, data: Dict) -> BaseModel:
+        instance = model_cls._new(data)
+        self._writer.create(model_cls.collection_name, instance.id, instance.to_dict())
+        self._written.append((model_cls, instance.id))
+        return instance
+    
+    def update(self, instance: BaseModel, data: Dict):
+        data['updated_at'] = datetime.now()
+        self._writer.update(instance.collection_name, instance.id, data)
+        self._written.append((type(instance), instance.id))
+        self._updated.append((instance, data))
+    
+    def save(self, instance: BaseModel):
+        """Queue an update of the instance's dirty fields, if any"""
+        changes = instance._changes()
+        if changes:
+            self.update(instance, changes)
+    
+    def delete(self, instance: BaseModel):
+        self._writer.delete(instance.collection_name, instance.id)
+        self._written.append((type(instance), instance.id))
+    
+    def commit(self):
+        self._writer.commit()
+        self._committed()
+    
+    def _committed(self):
+        for model_cls, doc_id in self._written:
+            model_cls._invalidate(doc_id)
+        for instance, data in self._updated:
+            instance._apply(data)
+        self._written, self._updated = [], []
+    
+    def __enter__(self) -> 'Batch':
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+
+
+class Transaction(Batch):
+    """Batch that can also read; reads see the documents as they are when the writes commit"""
+    
+    def get(self, model_cls, doc_id: str) -> Optional[BaseModel]:
+        """Read a document bypassing the cache; all reads must come before the first write"""
+        model_cls.storage()
+        data = self._writer.get(model_cls.collection_name, doc_id)
+        return model_cls(data) if data is not None else None
+
+
+def run_transaction(func):
+    """
+    Call func(transaction) and commit its writes atomically, returning func's result
+    func may run more than once if documents it read change concurrently, so it
+    should only read and write through the transaction. Raising aborts it.
+    """
+    attempts = []
+    
+    def attempt(writer):
+        transaction = Transaction(writer)
+        attempts.append(transaction)
+        return func(transaction)
+    
+    result = get_backend().run_transaction(attempt)
+    attempts[-1]._committed()
+    return result
 
 
 class Restaurant(BaseModel):
     collection_name = 'restaurants'
+    indexed_fields = ('is_active',)
+    cache_ttl = 300  # Profiles rarely change
     
-    def __init__(self, data: Dict):
-        super().__init__(data)
-        self.name = data.get('name')
-        self.email = data.get('email')
-        self.phone = data.get('phone')
-        self.address = data.get('address')
-        self.coordinates = data.get('coordinates', {})  # {lat, lng}
-        self.contact_person = data.get('contact_person')
-        self.is_active = data.get('is_active', True)
-    
-    def to_dict(self) -> Dict:
-        base_dict = super().to_dict()
-        base_dict.update({
-            'name': self.name,
-            'email': self.email,
-            'phone': self.phone,
-            'address': self.address,
-            'coordinates': self.coordinates,
-            'contact_person': self.contact_person,
-            'is_active': self.is_active
-        })
-        return base_dict
+    fields = {
+        'name': None,
+        'email': None,
+        'phone': None,
+        'address': None,
+        'coordinates': dict,  # {lat, lng}
+        'contact_person': None,
+        'is_active': True
+    }
+    __slots__ = tuple(fields)
 
 
 class FoodBank(BaseModel):
     collection_name = 'foodbanks'
+    indexed_fields = ('is_active',)
+    cache_ttl = 60  # current_load changes as alerts are accepted
     
-    def __init__(self, data: Dict):
-        super().__init__(data)
-        self.name = data.get('name')
-        self.email = data.get('email')
-        self.phone = data.get('phone')
-        self.address = data.get('address')
-        self.coordinates = data.get('coordinates', {})  # {lat, lng}
-        self.capacity = data.get('capacity', 100)  # Max items they can handle
-        self.current_load = data.get('current_load', 0)
-        self.contact_person = data.get('contact_person')
-        self.is_active = data.get('is_active', True)
-    
-    def to_dict(self) -> Dict:
-        base_dict = super().to_dict()
-        base_dict.update({
-            'name': self.name,
-            'email': self.email,
-            'phone': self.phone,
-            'address': self.address,
-            'coordinates': self.coordinates,
-            'capacity': self.capacity,
-            'current_load': self.current_load,
-            'contact_person': self.contact_person,
-            'is_active': self.is_active
-        })
-        return base_dict
+    fields = {
+        'name': None,
+        'email': None,
+        'phone': None,
+        'address': None,
+        'coordinates': dict,  # {lat, lng}
+        'capacity': 100,  # Max items they can handle
+        'current_load': 0,
+        'contact_person': None,
+        'is_active': True
+    }
+    __slots__ = tuple(fields)
     
     @property
     def available_capacity(self):
-        return self.capacity - self.current_load
+        # Either can be cleared through the update endpoint; treat that as 0
+        return (self.capacity or 0) - (self.current_load or 0)
 
 
 class Driver(BaseModel):
     collection_name = 'drivers'
+    indexed_fields = ('is_available', 'is_active')
+    cache_ttl = 30  # Availability flips often
     
-    def __init__(self, data: Dict):
-        super().__init__(data)
-        self.name = data.get('name')
-        self.email = data.get('email')
-        self.phone = data.get('phone')
-        self.license_number = data.get('license_number')
-        self.vehicle_type = data.get('vehicle_type')  # car, van, truck
-        self.current_location = data.get('current_location', {})  # {lat, lng}
-        self.is_available = data.get('is_available', True)
-        self.is_active = data.get('is_active', True)
-        self.rating = data.get('rating', 5.0)
-    
-    def to_dict(self) -> Dict:
-        base_dict = super().to_dict()
-        base_dict.update({
-            'name': self.name,
-            'email': self.email,
-            'phone': self.phone,
-            'license_number': self.license_number,
-            'vehicle_type': self.vehicle_type,
-            'current_location': self.current_location,
-            'is_available': self.is_available,
-            'is_active': self.is_active,
-            'rating': self.rating
-        })
-        return base_dict
+    fields = {
+        'name': None,
+        'email': None,
+        'phone': None,
+        'license_number': None,
+        'vehicle_type': None,  # car, van, truck
+        'current_location': dict,  # {lat, lng}
+        'is_available': True,
+        'is_active': True,
+        'rating': 5.0
+    }
+    __slots__ = tuple(fields)
 
 
 class FoodAlert(BaseModel):
     collection_name = 'food_alerts'
+    indexed_fields = ('status', 'restaurant_id', 'foodbank_id', 'driver_id', 'created_at')
     
     STATUSES = {
         'PENDING': 'pending',
@@ -167,74 +523,74 @@ class FoodAlert(BaseModel):
         'CANCELLED': 'cancelled'
     }
     
-    def __init__(self, data: Dict):
-        super().__init__(data)
-        self.restaurant_id = data.get('restaurant_id')
-        self.foodbank_id = data.get('foodbank_id')
-        self.driver_id = data.get('driver_id')
-        self.status = data.get('status', self.STATUSES['PENDING'])
-        self.food_items = data.get('food_items', [])  # List of food items
-        self.total_quantity = data.get('total_quantity', 0)
-        self.pickup_time = data.get('pickup_time')
-        self.delivery_time = data.get('delivery_time')
-        self.notes = data.get('notes', '')
-        self.expires_at = data.get('expires_at')
-        self.notified_foodbanks = data.get('notified_foodbanks', [])  # Track escalation
+    fields = {
+        'restaurant_id': None,
+        'foodbank_id': None,
+        'driver_id': None,
+        'status': STATUSES['PENDING'],
+        'food_items': list,  # List of food items
+        'total_quantity': 0,
+        'pickup_time': None,
+        'delivery_time': None,
+        'notes': '',
+        'expires_at': None,
+        'notified_foodbanks': list,  # Track escalation
+        'notified_drivers': list,  # Drivers sent a delivery request
+        'escalation_deadline': None  # When to escalate if unanswered
+    }
+    __slots__ = tuple(fields)
     
-    def to_dict(self) -> Dict:
-        base_dict = super().to_dict()
-        base_dict.update({
-            'restaurant_id': self.restaurant_id,
-            'foodbank_id': self.foodbank_id,
-            'driver_id': self.driver_id,
-            'status': self.status,
-            'food_items': self.food_items,
-            'total_quantity': self.total_quantity,
-            'pickup_time': self.pickup_time,
-            'delivery_time': self.delivery_time,
-            'notes': self.notes,
-            'expires_at': self.expires_at,
-            'notified_foodbanks': self.notified_foodbanks
-        })
-        return base_dict
+    # Food bank has accepted; its current_load includes total_quantity
+    LOAD_HOLDING_STATUSES = (
+        STATUSES['FOODBANK_ACCEPTED'], STATUSES['DRIVER_REQUESTED'],
+        STATUSES['DRIVER_ASSIGNED'], STATUSES['IN_TRANSIT']
+    )
+    FINAL_STATUSES = (STATUSES['DELIVERED'], STATUSES['EXPIRED'], STATUSES['CANCELLED'])
+    
+    def set_status(self, transaction: 'Transaction', status: str, data: Optional[Dict] = None):
+        """
+        Queue a status change for an alert read through the transaction; closing an
+        accepted alert also takes its quantity off the food bank's current_load.
+        Reads the food bank, so call it before queueing other writes.
+        """
+        data = dict(data or {}, status=status)
+        if self.foodbank_id and self.status in self.LOAD_HOLDING_STATUSES and status in self.FINAL_STATUSES:
+            foodbank = transaction.get(FoodBank, self.foodbank_id)
+            if foodbank:
+                transaction.update(foodbank, {'current_load': Increment(-(self.total_quantity or 0))})
+        transaction.update(self, data)
     
     @classmethod
     def get_pending_alerts(cls):
         """Get all pending alerts for escalation"""
-        docs = db.collection(cls.collection_name).where(
-            'status', '==', cls.STATUSES['PENDING']
-        ).stream()
-        return [cls(doc.to_dict()) for doc in docs]
+        return cls.query().where('status', '==', cls.STATUSES['PENDING']).get()
+    
+    @classmethod
+    def get_escalation_deadlines(cls):
+        """
+        Get (alert_id, escalation_deadline, updated_at) for every alert awaiting a food bank
+        Only the fields needed to rebuild escalation timers are read
+        """
+        alerts = cls.query().where(
+            'status', '==', cls.STATUSES['FOODBANK_NOTIFIED']
+        ).select('escalation_deadline', 'updated_at').stream()
+        return [(alert.id, alert.escalation_deadline, alert.updated_at) for alert in alerts]
 
 
 class DeliveryRequest(BaseModel):
     collection_name = 'delivery_requests'
+    indexed_fields = ('status', 'alert_id', 'driver_id', 'created_at')
     
-    def __init__(self, data: Dict):
-        super().__init__(data)
-        self.alert_id = data.get('alert_id')
-        self.driver_id = data.get('driver_id')
-        self.pickup_address = data.get('pickup_address')
-        self.delivery_address = data.get('delivery_address')
-        self.pickup_coordinates = data.get('pickup_coordinates', {})
-        self.delivery_coordinates = data.get('delivery_coordinates', {})
-        self.estimated_duration = data.get('estimated_duration')  # in minutes
-        self.actual_pickup_time = data.get('actual_pickup_time')
-        self.actual_delivery_time = data.get('actual_delivery_time')
-        self.status = data.get('status', 'assigned')  # assigned, picked_up, delivered
-    
-    def to_dict(self) -> Dict:
-        base_dict = super().to_dict()
-        base_dict.update({
-            'alert_id': self.alert_id,
-            'driver_id': self.driver_id,
-            'pickup_address': self.pickup_address,
-            'delivery_address': self.delivery_address,
-            'pickup_coordinates': self.pickup_coordinates,
-            'delivery_coordinates': self.delivery_coordinates,
-            'estimated_duration': self.estimated_duration,
-            'actual_pickup_time': self.actual_pickup_time,
-            'actual_delivery_time': self.actual_delivery_time,
-            'status': self.status
-        })
-        return base_dict
+    fields = {
+        'alert_id': None,
+        'driver_id': None,
+        'pickup_address': None,
+        'delivery_address': None,
+        'pickup_coordinates': dict,
+        'delivery_coordinates': dict,
+        'estimated_duration': None,  # in minutes
+        'actual_pickup_time': None,
+        'actual_delivery_time': None,
+        'status': 'assigned'  # assigned, picked_up, delivered
+    }
+    __slots__ = tuple(fields)
@@ -0,0 +1,91 @@
+"""
+Validators of recently served resources, so conditional GETs can skip the document read
+"""
+import time
+import threading
+from collections import OrderedDict
+
+
+class VersionCache:
+    """
+    LRU cache of (etag, last_modified) per resource with a TTL.
+    Each entry records the documents its response was built from; a write to
+    any of them drops the entry. As in EntityCache, validators computed while
+    a write was in flight are not cached (see generation).
+    """
+
+    def __init__(self, ttl, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # resource key -> (validators, documents, expires_at)
+        self._dependents = {}  # (collection, doc_id) -> resource keys built from it
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._counters = {
+            'hits': 0,
+            'misses': 0,
+            'invalidations': 0
+        }
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def get(self, key):
+        """(etag, last_modified) for the resource, or None if unknown or possibly stale"""
+        if not self.ttl:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[2] <= time.time():
+                if entry is not None:
+                    self._drop(key)
+                self._counters['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters['hits'] += 1
+            return entry[0]
+
+    def set(self, key, validators, documents, generation=None):
+        """Remember a resource's validators; documents are the (collection, doc_id) it depends on"""
+        if not self.ttl:
+            return
+        documents = tuple(documents)
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._drop(key)
+            self._entries[key] = (validators, documents, time.time() + self.ttl)
+            for document in documents:
+                self._dependents.setdefault(document, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate(self, collection, doc_id):
+        with self._lock:
+            self._generation += 1
+            for key in self._dependents.pop((collection, doc_id), ()):
+                if key in self._entries:
+                    self._drop(key)
+                    self._counters['invalidations'] += 1
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for document in entry[1]:
+            keys = self._dependents.get(document)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._dependents[document]
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['entries'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        stats['ttl_seconds'] = self.ttl
+        stats['max_entries'] = self.max_entries
+        return stats
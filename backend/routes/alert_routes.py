@@ -1,11 +1,30 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from flask_socketio import emit
-from models.models import FoodAlert, Restaurant, FoodBank, Driver, DeliveryRequest
+from models.models import FoodAlert, Restaurant, FoodBank, Driver, DeliveryRequest, run_transaction
+from storage import Increment
+from services.alert_enrichment import enrich_alert, enrich_alerts, related_entities, FOREIGN_KEYS
+from services.alert_export import EXPORT_MODELS, export_lines
+from routes.pagination import list_response
+from routes.conditional import ConditionalGet
+from services.driver_locator import driver_locator
 from datetime import datetime, timedelta
+import itertools
 import logging
+import zlib
 
 alert_bp = Blueprint('alerts', __name__)
 
+DISPATCH_RETRY_AFTER_SECONDS = 5
+
+
+class AlertConflict(Exception):
+    """The alert moved on since the request was made, e.g. another food bank or driver took it"""
+
+
+def _dispatch_busy_response():
+    response = jsonify({'error': 'Too many alerts are being dispatched, please retry shortly'})
+    return response, 503, {'Retry-After': str(DISPATCH_RETRY_AFTER_SECONDS)}
+
 @alert_bp.route('/', methods=['POST'])
 def create_food_alert():
     """Create a new food alert from restaurant"""
@@ -30,13 +49,17 @@ def create_food_alert():
         # Set expiration time (food expires in 24 hours)
         data['expires_at'] = datetime.now() + timedelta(hours=24)
         
-        alert = FoodAlert.create(data)
-        
-        # Trigger real-time notification to nearby food banks
+        # Turn new alerts away while the dispatch backlog is full
         from services.notification_service import get_notification_service
         notification_service = get_notification_service()
+        if notification_service and not notification_service.can_dispatch():
+            return _dispatch_busy_response()
+        
+        alert = FoodAlert.create(data)
+        
+        # Notify nearby food banks in the background; the response only waits for the write
         if notification_service:
-            notification_service.notify_nearby_foodbanks(alert.id)
+            notification_service.dispatch_foodbank_notification(alert.id)
         
         return jsonify({
             'message': 'Food alert created successfully',
@@ -49,108 +72,105 @@ def create_food_alert():
 
 @alert_bp.route('/', methods=['GET'])
 def get_alerts():
-    """Get all alerts with optional filtering"""
+    """Get alerts with optional filtering, one page at a time"""
     try:
         status = request.args.get('status')
         restaurant_id = request.args.get('restaurant_id')
         foodbank_id = request.args.get('foodbank_id')
         driver_id = request.args.get('driver_id')
         
-        alerts = FoodAlert.get_all()
-        
-        # Apply filters
+        # Apply filters in Firestore
+        query = FoodAlert.query()
         if status:
-            alerts = [a for a in alerts if a.status == status]
+            query = query.where('status', '==', status)
         if restaurant_id:
-            alerts = [a for a in alerts if a.restaurant_id == restaurant_id]
+            query = query.where('restaurant_id', '==', restaurant_id)
         if foodbank_id:
-            alerts = [a for a in alerts if a.foodbank_id == foodbank_id]
+            query = query.where('foodbank_id', '==', foodbank_id)
         if driver_id:
-            alerts = [a for a in alerts if a.driver_id == driver_id]
+            query = query.where('driver_id', '==', driver_id)
         
-        # Enrich alerts with restaurant and foodbank details
-        enriched_alerts = []
-        for alert in alerts:
-            alert_dict = alert.to_dict()
-            
-            # Get restaurant details
-            if alert.restaurant_id:
-                restaurant = Restaurant.get_by_id(alert.restaurant_id)
-                if restaurant:
-                    alert_dict['restaurant_name'] = restaurant.name
-                    alert_dict['restaurant_address'] = restaurant.address
-                    alert_dict['restaurant_phone'] = restaurant.phone
-                    alert_dict['restaurant_email'] = restaurant.email
-            
-            # Get foodbank details
-            if alert.foodbank_id:
-                foodbank = FoodBank.get_by_id(alert.foodbank_id)
-                if foodbank:
-                    alert_dict['foodbank_name'] = foodbank.name
-                    alert_dict['foodbank_address'] = foodbank.address
-                    alert_dict['foodbank_phone'] = foodbank.phone
-                    alert_dict['foodbank_email'] = foodbank.email
-            
-            # Get driver details
-            if alert.driver_id:
-                driver = Driver.get_by_id(alert.driver_id)
-                if driver:
-                    alert_dict['driver_name'] = driver.name
-                    alert_dict['driver_phone'] = driver.phone
-                    alert_dict['driver_email'] = driver.email
-                    alert_dict['driver_vehicle_type'] = driver.vehicle_type
-            
-            enriched_alerts.append(alert_dict)
-        
-        return jsonify({
-            'alerts': enriched_alerts
-        }), 200
+        # Enrich each page with restaurant, foodbank and driver details
+        return list_response(
+            'alerts', query, serialize=enrich_alerts,
+            related=related_entities, version_fields=FOREIGN_KEYS
+        )
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logging.error(f"Error fetching alerts: {str(e)}")
         return jsonify({'error': 'Failed to fetch alerts'}), 500
 
+@alert_bp.route('/export', methods=['GET'])
+def export_alerts():
+    """Stream alerts and delivery requests created in a date range as NDJSON"""
+    try:
+        start = request.args.get('start')
+        end = request.args.get('end')
+        start = datetime.fromisoformat(start) if start else None
+        end = datetime.fromisoformat(end) if end else None
+        
+        collections = request.args.get('collections')
+        collections = collections.split(',') if collections else list(EXPORT_MODELS)
+        unknown = [c for c in collections if c not in EXPORT_MODELS]
+        if unknown:
+            return jsonify({'error': f'Unknown collections: {", ".join(unknown)}'}), 400
+        
+        lines = export_lines(collections, start, end, request.args.get('checkpoint'))
+        # Validate arguments before the response starts streaming
+        first_line = next(lines, None)
+        
+        use_gzip = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+        
+        def generate():
+            if first_line is None:
+                return
+            compressor = zlib.compressobj(wbits=31) if use_gzip else None  # 31 = gzip container
+            for line in itertools.chain([first_line], lines):
+                if compressor:
+                    chunk = compressor.compress(line.encode())
+                    if chunk:
+                        yield chunk
+                else:
+                    yield line
+            if compressor:
+                yield compressor.flush()
+        
+        filename = 'alerts-export.ndjson.gz' if use_gzip else 'alerts-export.ndjson'
+        return Response(
+            stream_with_context(generate()),
+            mimetype='application/gzip' if use_gzip else 'application/x-ndjson',
+            headers={'Content-Disposition': f'attachment; filename={filename}'}
+        )
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logging.error(f"Error exporting alerts: {str(e)}")
+        return jsonify({'error': 'Failed to export alerts'}), 500
+
 @alert_bp.route('/<alert_id>', methods=['GET'])
 def get_alert(alert_id):
     """Get a specific alert"""
     try:
+        conditional = ConditionalGet(f'food_alerts/{alert_id}')
+        cached = conditional.cached_response()
+        if cached:
+            return cached
+        
         alert = FoodAlert.get_by_id(alert_id)
         if not alert:
             return jsonify({'error': 'Alert not found'}), 404
         
-        # Enrich alert with restaurant and foodbank details
-        alert_dict = alert.to_dict()
-        
-        # Get restaurant details
-        if alert.restaurant_id:
-            restaurant = Restaurant.get_by_id(alert.restaurant_id)
-            if restaurant:
-                alert_dict['restaurant_name'] = restaurant.name
-                alert_dict['restaurant_address'] = restaurant.address
-                alert_dict['restaurant_phone'] = restaurant.phone
-                alert_dict['restaurant_email'] = restaurant.email
-        
-        # Get foodbank details
-        if alert.foodbank_id:
-            foodbank = FoodBank.get_by_id(alert.foodbank_id)
-            if foodbank:
-                alert_dict['foodbank_name'] = foodbank.name
-                alert_dict['foodbank_address'] = foodbank.address
-                alert_dict['foodbank_phone'] = foodbank.phone
-                alert_dict['foodbank_email'] = foodbank.email
-        
-        # Get driver details
-        if alert.driver_id:
-            driver = Driver.get_by_id(alert.driver_id)
-            if driver:
-                alert_dict['driver_name'] = driver.name
-                alert_dict['driver_phone'] = driver.phone
-                alert_dict['driver_email'] = driver.email
-                alert_dict['driver_vehicle_type'] = driver.vehicle_type
-            
-        return jsonify({
+        # Enrich alert with restaurant, foodbank and driver details
+        related = related_entities([alert])
+        alert_dict = enrich_alert(alert, known=related)
+        
+        # The ETag also changes when a joined restaurant, food bank or driver does
+        return conditional.respond({
             'alert': alert_dict
-        }), 200
+        }, [alert] + related)
         
     except Exception as e:
         logging.error(f"Error fetching alert: {str(e)}")
@@ -175,18 +195,41 @@ def accept_alert_by_foodbank(alert_id):
         if not foodbank:
             return jsonify({'error': 'Food bank not found'}), 404
         
-        # Update alert status
-        alert.update({
-            'foodbank_id': foodbank_id,
-            'status': FoodAlert.STATUSES['FOODBANK_ACCEPTED']
-        })
-        
-        # Cancel escalation timer and trigger driver notification
         from services.notification_service import get_notification_service
         notification_service = get_notification_service()
+        if notification_service and not notification_service.can_dispatch():
+            return _dispatch_busy_response()
+        
+        def accept(transaction):
+            # Re-read the alert in the transaction so it is accepted, and counted in a load, only once
+            current = transaction.get(FoodAlert, alert_id)
+            if not current:
+                raise AlertConflict('Alert no longer exists')
+            if current.status not in (FoodAlert.STATUSES['PENDING'], FoodAlert.STATUSES['FOODBANK_NOTIFIED']):
+                raise AlertConflict('Alert is no longer awaiting a food bank')
+            # Pending alerts haven't been offered to anyone yet; any food bank may take them
+            if (current.status == FoodAlert.STATUSES['FOODBANK_NOTIFIED']
+                    and foodbank_id not in (current.notified_foodbanks or [])):
+                raise AlertConflict('Alert was not offered to this food bank')
+            
+            # Update alert status and the food bank's load together
+            transaction.update(current, {
+                'foodbank_id': foodbank_id,
+                'status': FoodAlert.STATUSES['FOODBANK_ACCEPTED'],
+                'escalation_deadline': None
+            })
+            transaction.update(foodbank, {'current_load': Increment(current.total_quantity or 0)})
+            return current
+        
+        try:
+            alert = run_transaction(accept)
+        except AlertConflict as e:
+            return jsonify({'error': str(e)}), 409
+        
+        # Cancel escalation timer and notify drivers in the background
         if notification_service:
             notification_service.cancel_escalation_timer(alert_id)
-            notification_service.notify_available_drivers(alert_id)
+            notification_service.dispatch_driver_notification(alert_id)
         
         return jsonify({
             'message': 'Alert accepted successfully',
@@ -219,32 +262,52 @@ def assign_driver_to_alert(alert_id):
         if not driver.is_available:
             return jsonify({'error': 'Driver is not available'}), 400
         
-        # Update alert and driver
-        alert.update({
-            'driver_id': driver_id,
-            'status': FoodAlert.STATUSES['DRIVER_ASSIGNED']
-        })
-        
-        driver.update({'is_available': False})
-        
-        # Create delivery request
         restaurant = Restaurant.get_by_id(alert.restaurant_id)
         foodbank = FoodBank.get_by_id(alert.foodbank_id)
         
-        delivery_request = DeliveryRequest.create({
-            'alert_id': alert_id,
-            'driver_id': driver_id,
-            'pickup_address': restaurant.address if restaurant else '',
-            'delivery_address': foodbank.address if foodbank else '',
-            'pickup_coordinates': restaurant.coordinates if restaurant else {},
-            'delivery_coordinates': foodbank.coordinates if foodbank else {},
-            'estimated_duration': 30  # Default 30 minutes
-        })
+        def assign(transaction):
+            # Re-read the alert and driver in the transaction so an alert gets one driver
+            # and two alerts can't claim the same driver
+            current = transaction.get(FoodAlert, alert_id)
+            if not current:
+                raise AlertConflict('Alert no longer exists')
+            if current.driver_id or current.status not in (
+                    FoodAlert.STATUSES['FOODBANK_ACCEPTED'], FoodAlert.STATUSES['DRIVER_REQUESTED']):
+                raise AlertConflict('Alert is not awaiting a driver')
+            current_driver = transaction.get(Driver, driver_id)
+            if not current_driver or not current_driver.is_available:
+                raise ValueError('Driver is not available')
+            
+            # Update alert and driver and create the delivery request in one commit
+            transaction.update(current, {
+                'driver_id': driver_id,
+                'status': FoodAlert.STATUSES['DRIVER_ASSIGNED']
+            })
+            transaction.update(current_driver, {'is_available': False})
+            delivery_request = transaction.create(DeliveryRequest, {
+                'alert_id': alert_id,
+                'driver_id': driver_id,
+                'pickup_address': restaurant.address if restaurant else '',
+                'delivery_address': foodbank.address if foodbank else '',
+                'pickup_coordinates': restaurant.coordinates if restaurant else {},
+                'delivery_coordinates': foodbank.coordinates if foodbank else {},
+                'estimated_duration': 30  # Default 30 minutes
+            })
+            return current, current_driver, delivery_request
+        
+        try:
+            alert, driver, delivery_request = run_transaction(assign)
+        except AlertConflict as e:
+            return jsonify({'error': str(e)}), 409
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        driver_locator.update(driver)
         
         # Notify the driver via WebSocket
         from services.notification_service import get_notification_service
         notification_service = get_notification_service()
         if notification_service:
+            notification_service.cancel_driver_waves(alert_id)
             notification_service.notify_assigned_driver(alert_id, driver_id, delivery_request)
         
         return jsonify({
@@ -274,19 +337,33 @@ def update_alert_status(alert_id):
         if not alert:
             return jsonify({'error': 'Alert not found'}), 404
         
-        update_data = {'status': new_status}
-        
-        # Handle status-specific logic
-        if new_status == FoodAlert.STATUSES['DELIVERED']:
-            update_data['delivery_time'] = datetime.now()
+        def update_status(transaction):
+            # Re-read the alert so a repeated close releases the food bank's load only once
+            current = transaction.get(FoodAlert, alert_id)
+            if not current:
+                raise AlertConflict('Alert no longer exists')
+            update_data = {}
             
-            # Make driver available again
-            if alert.driver_id:
-                driver = Driver.get_by_id(alert.driver_id)
-                if driver:
-                    driver.update({'is_available': True})
-        
-        alert.update(update_data)
+            # Handle status-specific logic
+            driver = None
+            if new_status == FoodAlert.STATUSES['DELIVERED']:
+                update_data['delivery_time'] = datetime.now()
+                
+                # Make driver available again
+                if current.driver_id:
+                    driver = transaction.get(Driver, current.driver_id)
+            
+            current.set_status(transaction, new_status, update_data)
+            if driver:
+                transaction.update(driver, {'is_available': True})
+            return current, driver
+        
+        try:
+            alert, driver = run_transaction(update_status)
+        except AlertConflict as e:
+            return jsonify({'error': str(e)}), 409
+        if driver:
+            driver_locator.update(driver)
         
         return jsonify({
             'message': 'Alert status updated successfully',
@@ -0,0 +1,107 @@
+"""
+Conditional GET: strong ETags and Last-Modified derived from documents' updated_at
+"""
+import hashlib
+from datetime import timezone
+from flask import request, jsonify, current_app
+from models.models import document_versions
+from services.json_codec import JSON_PROVIDER, DATETIME_FORMAT
+
+# Part of every ETag, so changing how responses are encoded changes their validators too
+REPRESENTATION = f'{JSON_PROVIDER}:{DATETIME_FORMAT}'
+
+
+def _utc(value):
+    """updated_at as aware UTC; naive values are UTC, as the storage backends treat them"""
+    if value is None or not hasattr(value, 'tzinfo'):
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def validators(documents, extra=''):
+    """
+    (etag, last_modified) for a response built from these model instances
+    The ETag covers each document's identity and updated_at (plus extra, e.g.
+    whether a page has a next page); Last-Modified is the newest updated_at.
+    """
+    digest = hashlib.sha1(REPRESENTATION.encode())
+    last_modified = None
+    for document in documents:
+        updated_at = _utc(document.updated_at)
+        stamp = updated_at.timestamp() if updated_at else ''
+        digest.update(f'{document.collection_name}/{document.id}@{stamp};'.encode())
+        if updated_at and (last_modified is None or updated_at > last_modified):
+            last_modified = updated_at
+    digest.update(str(extra).encode())
+    return f'"{digest.hexdigest()}"', last_modified
+
+
+def is_conditional():
+    return bool(request.if_none_match or request.if_modified_since)
+
+
+def _matches(etag, last_modified):
+    # If-None-Match takes precedence over If-Modified-Since when both are sent
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag.strip('"'))
+    if request.if_modified_since and last_modified is not None:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def _with_validators(response, etag, last_modified):
+    response.set_etag(etag.strip('"'))
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # Let browsers keep the body but check back on every use
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def not_modified(etag, last_modified):
+    """304 response when the request's validators match, else None"""
+    if not _matches(etag, last_modified):
+        return None
+    return _with_validators(current_app.response_class(status=304), etag, last_modified)
+
+
+def respond(body, etag, last_modified):
+    """304 if the client's copy is current, else body as JSON with ETag and Last-Modified"""
+    return not_modified(etag, last_modified) or _with_validators(jsonify(body), etag, last_modified)
+
+
+class ConditionalGet:
+    """
+    Conditional handling for a single resource, backed by the version cache
+
+        conditional = ConditionalGet(f'foodbanks/{foodbank_id}')
+        cached = conditional.cached_response()
+        if cached:
+            return cached  # 304 without reading the food bank
+        ...
+        return conditional.respond({'foodbank': foodbank.to_dict()}, [foodbank])
+    """
+
+    def __init__(self, key):
+        self.key = key
+        # Captured before any read, so validators computed while a write lands aren't cached
+        self.generation = document_versions.generation
+
+    def cached_response(self):
+        """304 from cached validators when the client's copy is current, else None"""
+        if not is_conditional():
+            return None
+        cached = document_versions.get(self.key)
+        return not_modified(*cached) if cached else None
+
+    def respond(self, body, documents):
+        """Respond with body, validated against the documents it was built from"""
+        etag, last_modified = validators(documents)
+        document_versions.set(
+            self.key, (etag, last_modified),
+            [(document.collection_name, document.id) for document in documents],
+            self.generation
+        )
+        return respond(body, etag, last_modified)
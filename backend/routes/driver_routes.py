@@ -1,5 +1,8 @@
 from flask import Blueprint, request, jsonify
 from models.models import Driver
+from routes.pagination import list_response
+from services.driver_location_store import driver_location_store
+from services.driver_locator import driver_locator
 import logging
 
 driver_bp = Blueprint('drivers', __name__)
@@ -17,6 +20,7 @@ def create_driver():
                 return jsonify({'error': f'{field} is required'}), 400
         
         driver = Driver.create(data)
+        driver_locator.update(driver)
         return jsonify({
             'message': 'Driver created successfully',
             'driver': driver.to_dict()
@@ -28,13 +32,12 @@ def create_driver():
 
 @driver_bp.route('/', methods=['GET'])
 def get_drivers():
-    """Get all drivers"""
+    """Get all drivers, one page at a time"""
     try:
-        drivers = Driver.get_all()
-        return jsonify({
-            'drivers': [d.to_dict() for d in drivers]
-        }), 200
+        return list_response('drivers', Driver.query())
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logging.error(f"Error fetching drivers: {str(e)}")
         return jsonify({'error': 'Failed to fetch drivers'}), 500
@@ -43,12 +46,9 @@ def get_drivers():
 def get_available_drivers():
     """Get available drivers"""
     try:
-        drivers = Driver.get_all()
-        available_drivers = [d for d in drivers if d.is_available and d.is_active]
+        available_drivers = driver_locator.drivers()
         
-        logging.info(f"Total drivers: {len(drivers)}, Available: {len(available_drivers)}")
-        for driver in drivers:
-            logging.info(f"Driver {driver.name}: available={driver.is_available}, active={driver.is_active}")
+        logging.info(f"Available drivers: {len(available_drivers)}")
         
         return jsonify({
             'drivers': [d.to_dict() for d in available_drivers]
@@ -70,13 +70,20 @@ def update_driver_availability(driver_id):
         is_available = data.get('is_available')
         current_location = data.get('current_location')
         
-        update_data = {}
-        if is_available is not None:
-            update_data['is_available'] = is_available
+        position = None
         if current_location:
-            update_data['current_location'] = current_location
-            
-        driver.update(update_data)
+            position = driver_location_store.parse_location(current_location)
+            if not position:
+                return jsonify({'error': 'current_location must have numeric lat and lng'}), 400
+        
+        if is_available is not None:
+            driver.update({'is_available': is_available})
+        
+        # Location goes through the write-behind store like live GPS pings
+        if position:
+            driver_location_store.update(driver_id, *position)
+        driver_location_store.apply(driver)
+        driver_locator.update(driver)
         
         return jsonify({
             'message': 'Driver availability updated',
@@ -86,3 +93,23 @@ def update_driver_availability(driver_id):
     except Exception as e:
         logging.error(f"Error updating driver availability: {str(e)}")
         return jsonify({'error': 'Failed to update driver availability'}), 500
+
+@driver_bp.route('/<driver_id>/location', methods=['GET'])
+def get_driver_location(driver_id):
+    """Get a driver's latest known location"""
+    try:
+        location = driver_location_store.get(driver_id)
+        if location is None:
+            driver = Driver.get_by_id(driver_id)
+            if not driver:
+                return jsonify({'error': 'Driver not found'}), 404
+            location = driver.current_location or None
+        
+        return jsonify({
+            'driver_id': driver_id,
+            'location': location
+        }), 200
+        
+    except Exception as e:
+        logging.error(f"Error fetching driver location: {str(e)}")
+        return jsonify({'error': 'Failed to fetch driver location'}), 500
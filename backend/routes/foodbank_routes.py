@@ -1,5 +1,9 @@
 from flask import Blueprint, request, jsonify
 from models.models import FoodBank
+from services.geocoding_service import geocoding_service
+from services.foodbank_locator import foodbank_locator
+from routes.pagination import list_response
+from routes.conditional import ConditionalGet
 import logging
 
 foodbank_bp = Blueprint('foodbanks', __name__)
@@ -16,7 +20,12 @@ def create_foodbank():
             if field not in data:
                 return jsonify({'error': f'{field} is required'}), 400
         
+        # Geocode once at write time so ranking can use stored coordinates
+        if not data.get('coordinates'):
+            data['coordinates'] = geocoding_service.geocode_to_coordinates(data['address'])
+        
         foodbank = FoodBank.create(data)
+        foodbank_locator.update(foodbank)
         return jsonify({
             'message': 'Food bank created successfully',
             'foodbank': foodbank.to_dict()
@@ -28,13 +37,12 @@ def create_foodbank():
 
 @foodbank_bp.route('/', methods=['GET'])
 def get_foodbanks():
-    """Get all food banks"""
+    """Get all food banks, one page at a time"""
     try:
-        foodbanks = FoodBank.get_all()
-        return jsonify({
-            'foodbanks': [fb.to_dict() for fb in foodbanks]
-        }), 200
+        return list_response('foodbanks', FoodBank.query())
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logging.error(f"Error fetching food banks: {str(e)}")
         return jsonify({'error': 'Failed to fetch food banks'}), 500
@@ -43,18 +51,51 @@ def get_foodbanks():
 def get_foodbank(foodbank_id):
     """Get a specific food bank"""
     try:
+        conditional = ConditionalGet(f'foodbanks/{foodbank_id}')
+        cached = conditional.cached_response()
+        if cached:
+            return cached
+        
         foodbank = FoodBank.get_by_id(foodbank_id)
         if not foodbank:
             return jsonify({'error': 'Food bank not found'}), 404
             
-        return jsonify({
+        return conditional.respond({
             'foodbank': foodbank.to_dict()
-        }), 200
+        }, [foodbank])
         
     except Exception as e:
         logging.error(f"Error fetching food bank: {str(e)}")
         return jsonify({'error': 'Failed to fetch food bank'}), 500
 
+@foodbank_bp.route('/<foodbank_id>', methods=['PUT'])
+def update_foodbank(foodbank_id):
+    """Update a food bank"""
+    try:
+        foodbank = FoodBank.get_by_id(foodbank_id)
+        if not foodbank:
+            return jsonify({'error': 'Food bank not found'}), 404
+        
+        data = request.get_json()
+        
+        # Re-geocode when the address changes
+        if data.get('address') and data['address'] != foodbank.address and not data.get('coordinates'):
+            data['coordinates'] = geocoding_service.geocode_to_coordinates(data['address'])
+        
+        # Only fields that are part of the model and actually sent are written
+        foodbank.assign(data)
+        foodbank.save()
+        foodbank_locator.update(foodbank)
+        
+        return jsonify({
+            'message': 'Food bank updated successfully',
+            'foodbank': foodbank.to_dict()
+        }), 200
+        
+    except Exception as e:
+        logging.error(f"Error updating food bank: {str(e)}")
+        return jsonify({'error': 'Failed to update food bank'}), 500
+
 @foodbank_bp.route('/nearby', methods=['POST'])
 def get_nearby_foodbanks():
     """Get nearby food banks based on coordinates"""
@@ -63,17 +104,35 @@ def get_nearby_foodbanks():
         lat = data.get('lat')
         lng = data.get('lng')
         radius = data.get('radius', 10)  # Default 10km radius
+        max_results = data.get('max_results')
         
-        if not lat or not lng:
+        if lat is None or lng is None:
             return jsonify({'error': 'Latitude and longitude are required'}), 400
         
-        # For now, return all active food banks
-        # In production, you'd implement proper geo-queries
-        foodbanks = FoodBank.get_all()
-        active_foodbanks = [fb for fb in foodbanks if fb.is_active]
+        try:
+            lat, lng, radius = float(lat), float(lng), float(radius)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'lat, lng and radius must be numbers'}), 400
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            return jsonify({'error': 'lat must be within ±90 and lng within ±180'}), 400
+        if not 0 <= radius < float('inf'):
+            return jsonify({'error': 'radius must be a non-negative number of km'}), 400
+        
+        if max_results is not None and (
+                isinstance(max_results, bool) or not isinstance(max_results, int) or max_results < 1):
+            return jsonify({'error': 'max_results must be a positive integer'}), 400
+        
+        nearby = foodbank_locator.within_radius(lat, lng, radius, limit=max_results)
+        
+        result = []
+        for foodbank, distance in nearby:
+            fb_dict = foodbank.to_dict()
+            fb_dict['distance_km'] = round(distance, 2)
+            fb_dict['distance_miles'] = round(distance * 0.621371, 2)
+            result.append(fb_dict)
         
         return jsonify({
-            'nearby_foodbanks': [fb.to_dict() for fb in active_foodbanks]
+            'nearby_foodbanks': result
         }), 200
         
     except Exception as e:
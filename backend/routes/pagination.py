@@ -0,0 +1,125 @@
+"""
+Cursor pagination and streamed JSON responses for list endpoints
+"""
+import json
+import base64
+from itertools import islice
+from flask import request, Response, stream_with_context, current_app
+from routes.conditional import validators, is_conditional, not_modified, respond
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+STREAM_CHUNK_SIZE = 100  # Documents serialized (and enriched) together in streamed mode
+ORDER_KEY = 'id'  # Unique and stable, and matches Firestore's default document order
+
+
+def encode_page_token(last_id):
+    """Opaque token pointing just past the document with this ID"""
+    return base64.urlsafe_b64encode(json.dumps({'after': last_id}).encode()).decode().rstrip('=')
+
+
+def decode_page_token(token):
+    """Return the ID a page token points past; raises ValueError if the token is invalid"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        last_id = json.loads(base64.urlsafe_b64decode(padded.encode()))['after']
+    except Exception:
+        raise ValueError('Invalid page_token')
+    if not isinstance(last_id, str):
+        raise ValueError('Invalid page_token')
+    return last_id
+
+
+def _page_size():
+    value = request.args.get('page_size')
+    if value is None:
+        return None
+    try:
+        page_size = int(value)
+    except ValueError:
+        raise ValueError('page_size must be an integer')
+    if not 1 <= page_size <= MAX_PAGE_SIZE:
+        raise ValueError(f'page_size must be between 1 and {MAX_PAGE_SIZE}')
+    return page_size
+
+
+def _wants_stream():
+    return request.args.get('stream', '').lower() in ('1', 'true', 'yes')
+
+
+def _default_serialize(items):
+    return [item.to_dict() for item in items]
+
+
+def _page_validators(items, page_size, related):
+    page = items[:page_size]
+    documents = list(page) + (list(related(page)) if related else [])
+    return validators(documents, extra=len(items) > page_size)
+
+
+def list_response(key, query, serialize=None, related=None, version_fields=()):
+    """
+    Respond with one page of query results as {key: [...], next_page_token: ...}
+    Query args: page_size, page_token, and stream=true to stream results as they are read.
+    Raises ValueError for invalid pagination arguments.
+    
+    Pages carry an ETag and Last-Modified built from their documents and from
+    related(page), the entities joined into them. A conditional request is first
+    checked against a query reading only updated_at and version_fields (what
+    related needs), so an unchanged page costs no full document reads.
+    """
+    serialize = serialize or _default_serialize
+    page_size = _page_size()
+
+    query = query.order_by(ORDER_KEY)
+    page_token = request.args.get('page_token')
+    if page_token:
+        query = query.start_after({ORDER_KEY: decode_page_token(page_token)})
+
+    if _wants_stream():
+        return _stream_response(key, query, page_size, serialize)
+
+    page_size = page_size or DEFAULT_PAGE_SIZE
+    # Read one extra document to learn whether another page exists
+    page_query = query.limit(page_size + 1)
+
+    if is_conditional():
+        versions = page_query.select('updated_at', *version_fields).get()
+        response = not_modified(*_page_validators(versions, page_size, related))
+        if response:
+            return response
+
+    items = page_query.get()
+    next_page_token = encode_page_token(items[page_size - 1].id) if len(items) > page_size else None
+
+    return respond({
+        key: serialize(items[:page_size]),
+        'next_page_token': next_page_token
+    }, *_page_validators(items, page_size, related))
+
+
+def _stream_response(key, query, page_size, serialize):
+    """Stream the JSON envelope chunk by chunk; without page_size the whole result set is streamed"""
+    if page_size is not None:
+        query = query.limit(page_size)
+
+    def generate():
+        yield '{' + json.dumps(key) + ': ['
+        documents = query.stream()
+        count = 0
+        last_id = None
+        while True:
+            chunk = list(islice(documents, STREAM_CHUNK_SIZE))
+            if not chunk:
+                break
+            for item in serialize(chunk):
+                yield (',' if count else '') + current_app.json.dumps(item)
+                count += 1
+            last_id = chunk[-1].id
+
+        next_page_token = None
+        if page_size is not None and count == page_size and last_id is not None:
+            next_page_token = encode_page_token(last_id)
+        yield '], "next_page_token": ' + json.dumps(next_page_token) + '}'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
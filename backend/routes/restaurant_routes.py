@@ -1,5 +1,8 @@
 from flask import Blueprint, request, jsonify
 from models.models import Restaurant
+from services.geocoding_service import geocoding_service
+from routes.pagination import list_response
+from routes.conditional import ConditionalGet
 import logging
 
 restaurant_bp = Blueprint('restaurants', __name__)
@@ -16,6 +19,10 @@ def create_restaurant():
             if field not in data:
                 return jsonify({'error': f'{field} is required'}), 400
         
+        # Geocode once at write time so ranking can use stored coordinates
+        if not data.get('coordinates'):
+            data['coordinates'] = geocoding_service.geocode_to_coordinates(data['address'])
+        
         restaurant = Restaurant.create(data)
         return jsonify({
             'message': 'Restaurant created successfully',
@@ -28,13 +35,12 @@ def create_restaurant():
 
 @restaurant_bp.route('/', methods=['GET'])
 def get_restaurants():
-    """Get all restaurants"""
+    """Get all restaurants, one page at a time"""
     try:
-        restaurants = Restaurant.get_all()
-        return jsonify({
-            'restaurants': [r.to_dict() for r in restaurants]
-        }), 200
+        return list_response('restaurants', Restaurant.query())
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logging.error(f"Error fetching restaurants: {str(e)}")
         return jsonify({'error': 'Failed to fetch restaurants'}), 500
@@ -43,13 +49,18 @@ def get_restaurants():
 def get_restaurant(restaurant_id):
     """Get a specific restaurant"""
     try:
+        conditional = ConditionalGet(f'restaurants/{restaurant_id}')
+        cached = conditional.cached_response()
+        if cached:
+            return cached
+        
         restaurant = Restaurant.get_by_id(restaurant_id)
         if not restaurant:
             return jsonify({'error': 'Restaurant not found'}), 404
             
-        return jsonify({
+        return conditional.respond({
             'restaurant': restaurant.to_dict()
-        }), 200
+        }, [restaurant])
         
     except Exception as e:
         logging.error(f"Error fetching restaurant: {str(e)}")
@@ -64,7 +75,14 @@ def update_restaurant(restaurant_id):
             return jsonify({'error': 'Restaurant not found'}), 404
         
         data = request.get_json()
-        restaurant.update(data)
+        
+        # Re-geocode when the address changes
+        if data.get('address') and data['address'] != restaurant.address and not data.get('coordinates'):
+            data['coordinates'] = geocoding_service.geocode_to_coordinates(data['address'])
+        
+        # Only fields that are part of the model and actually sent are written
+        restaurant.assign(data)
+        restaurant.save()
         
         return jsonify({
             'message': 'Restaurant updated successfully',
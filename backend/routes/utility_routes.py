@@ -1,8 +1,14 @@
 """
 Utility routes for geocoding and distance calculations
 """
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from services.geocoding_service import geocoding_service
+from services.batch_geocoder import geocode_batch
+from services.haversine import distance_matrix
+import json
+
+MAX_MATRIX_ELEMENTS = 250000
+MAX_BATCH_ADDRESSES = 10000
 
 utility_bp = Blueprint('utility', __name__, url_prefix='/api/utility')
 
@@ -35,6 +41,44 @@ def geocode_address():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _read_batch_addresses():
+    """Read addresses from a JSON body or an NDJSON stream (one address or {"address": ...} per line)"""
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        addresses = []
+        for line in request.stream:
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            addresses.append(item.get('address') if isinstance(item, dict) else item)
+        return addresses
+    
+    data = request.get_json()
+    return data.get('addresses') if isinstance(data, dict) else data
+
+@utility_bp.route('/geocode/batch', methods=['POST'])
+def geocode_addresses_batch():
+    """Geocode many addresses, streaming NDJSON results as they finish"""
+    try:
+        addresses = _read_batch_addresses()
+        
+        if not isinstance(addresses, list) or not addresses:
+            return jsonify({'error': 'A list of addresses is required'}), 400
+        
+        if len(addresses) > MAX_BATCH_ADDRESSES:
+            return jsonify({'error': f'Batches are limited to {MAX_BATCH_ADDRESSES} addresses'}), 400
+        
+        def generate():
+            for result in geocode_batch(geocoding_service, addresses):
+                yield json.dumps(result) + '\n'
+        
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+        
+    except ValueError as e:
+        return jsonify({'error': f'Invalid NDJSON: {str(e)}'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @utility_bp.route('/distance', methods=['POST'])
 def calculate_distance():
     """Calculate distance between two addresses or coordinates"""
@@ -51,10 +95,11 @@ def calculate_distance():
                 
         # Option 2: Two coordinate pairs
         elif 'coordinates1' in data and 'coordinates2' in data:
-            coords1 = data['coordinates1']
-            coords2 = data['coordinates2']
-            lat1, lon1 = coords1['latitude'], coords1['longitude']
-            lat2, lon2 = coords2['latitude'], coords2['longitude']
+            try:
+                lat1, lon1 = _coordinate_pair(data['coordinates1'], 'coordinates1')
+                lat2, lon2 = _coordinate_pair(data['coordinates2'], 'coordinates2')
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
             
         else:
             return jsonify({'error': 'Invalid input format'}), 400
@@ -72,11 +117,83 @@ def calculate_distance():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _coordinate_pair(location, name):
+    """(lat, lon) from a {latitude, longitude} dict; ValueError if either is missing, not a number or out of range"""
+    try:
+        lat, lon = float(location['latitude']), float(location['longitude'])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError(f'{name} needs numeric latitude and longitude')
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError(f'{name} must have latitude within ±90 and longitude within ±180')
+    return lat, lon
+
+def _parse_locations(locations, name):
+    """Check every location before any is geocoded: addresses stay strings, coordinate objects become (lat, lon)"""
+    parsed = []
+    for i, location in enumerate(locations):
+        if isinstance(location, str):
+            parsed.append(location)
+        elif isinstance(location, dict):
+            parsed.append(_coordinate_pair(location, f'{name}[{i}]'))
+        else:
+            raise ValueError(f'{name}[{i}] must be an address or a {{latitude, longitude}} object')
+    return parsed
+
+def _resolve_location(location):
+    """Turn an address string or a parsed (lat, lon) into (lat, lon)"""
+    if isinstance(location, str):
+        return geocoding_service.get_coordinates(location)
+    return location
+
+@utility_bp.route('/distance-matrix', methods=['POST'])
+def calculate_distance_matrix():
+    """Calculate distances from every origin to every destination in one call"""
+    try:
+        data = request.json
+        origins = data.get('origins')
+        destinations = data.get('destinations')
+        
+        if not isinstance(origins, list) or not isinstance(destinations, list):
+            return jsonify({'error': 'origins and destinations must be lists'}), 400
+        
+        if len(origins) * len(destinations) > MAX_MATRIX_ELEMENTS:
+            return jsonify({'error': f'Matrix is limited to {MAX_MATRIX_ELEMENTS} elements'}), 400
+        
+        try:
+            origins = _parse_locations(origins, 'origins')
+            destinations = _parse_locations(destinations, 'destinations')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        origin_coords = [_resolve_location(o) for o in origins]
+        dest_coords = [_resolve_location(d) for d in destinations]
+        
+        matrix = distance_matrix(
+            [lat for lat, _ in origin_coords], [lon for _, lon in origin_coords],
+            [lat for lat, _ in dest_coords], [lon for _, lon in dest_coords]
+        )
+        
+        # Unresolvable locations come back as infinity, which JSON can't carry
+        distances = [
+            [round(d, 2) if d != float('inf') else None for d in row.tolist()]
+            for row in matrix
+        ]
+        
+        return jsonify({
+            'success': True,
+            'distances_km': distances,
+            'origins': [{'latitude': lat, 'longitude': lon} for lat, lon in origin_coords],
+            'destinations': [{'latitude': lat, 'longitude': lon} for lat, lon in dest_coords]
+        })
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @utility_bp.route('/nearest-foodbanks', methods=['POST'])
 def find_nearest_foodbanks():
     """Find nearest food banks to a restaurant address"""
     try:
-        from models.models import FoodBank
+        from services.foodbank_locator import foodbank_locator
         
         data = request.json
         restaurant_address = data.get('restaurant_address')
@@ -85,19 +202,18 @@ def find_nearest_foodbanks():
         if not restaurant_address:
             return jsonify({'error': 'Restaurant address is required'}), 400
         
-        # Get all active food banks
-        foodbanks = FoodBank.get_all()
-        active_foodbanks = [fb for fb in foodbanks if fb.is_active and fb.address]
+        if isinstance(max_results, bool) or not isinstance(max_results, int) or max_results < 1:
+            return jsonify({'error': 'max_results must be a positive integer'}), 400
         
-        if not active_foodbanks:
-            return jsonify({'error': 'No active food banks with addresses found'}), 404
+        lat, lon = geocoding_service.get_coordinates(restaurant_address)
+        if lat is None or lon is None:
+            return jsonify({'error': 'Could not geocode restaurant address'}), 404
         
-        # Find nearest food banks
-        nearest = geocoding_service.find_nearest_foodbanks(
-            restaurant_address, 
-            active_foodbanks, 
-            max_results
-        )
+        # Find nearest active food banks from the spatial index
+        nearest = foodbank_locator.nearest(lat, lon, max_results)
+        
+        if not nearest:
+            return jsonify({'error': 'No active food banks with addresses found'}), 404
         
         result = []
         for foodbank, distance in nearest:
@@ -114,3 +230,39 @@ def find_nearest_foodbanks():
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+@utility_bp.route('/stats', methods=['GET'])
+def get_stats():
+    """Cache hit/miss counters, view staleness, matching stats, scheduler state, dispatch queue depth and startup timings for monitoring"""
+    try:
+        from services.notification_service import get_notification_service
+        from models.models import entity_cache_stats, document_versions
+        from services.driver_location_store import driver_location_store
+        from services.startup_report import startup_timer
+        from services.foodbank_locator import foodbank_locator
+        from services.driver_locator import driver_locator
+        from services.foodbank_matcher import foodbank_matcher
+        
+        stats = {
+            'success': True,
+            'geocode_cache': geocoding_service.cache.stats(),
+            'entity_cache': entity_cache_stats(),
+            'version_cache': document_versions.stats(),
+            'driver_locations': driver_location_store.stats(),
+            'views': {
+                view.name: view.stats() for view in (foodbank_locator.view, driver_locator.view)
+            },
+            'foodbank_matching': foodbank_matcher.stats(),
+            'startup': startup_timer.stats()
+        }
+        
+        notification_service = get_notification_service()
+        if notification_service:
+            stats['scheduler'] = notification_service.scheduler.stats()
+            stats['dispatch_queue'] = notification_service.dispatch_queue.stats()
+            stats['escalation_leader'] = notification_service.escalation_leader.stats()
+        
+        return jsonify(stats)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
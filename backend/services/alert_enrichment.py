@@ -0,0 +1,75 @@
+"""
+Joins restaurant, food bank and driver details onto alerts with one batched read per collection
+"""
+from models.models import Restaurant, FoodBank, Driver
+
+# relation -> (foreign key on the alert, model, {alert field: entity attribute})
+RELATIONS = {
+    'restaurant': ('restaurant_id', Restaurant, {
+        'restaurant_name': 'name',
+        'restaurant_address': 'address',
+        'restaurant_phone': 'phone',
+        'restaurant_email': 'email'
+    }),
+    'foodbank': ('foodbank_id', FoodBank, {
+        'foodbank_name': 'name',
+        'foodbank_address': 'address',
+        'foodbank_phone': 'phone',
+        'foodbank_email': 'email'
+    }),
+    'driver': ('driver_id', Driver, {
+        'driver_name': 'name',
+        'driver_phone': 'phone',
+        'driver_email': 'email',
+        'driver_vehicle_type': 'vehicle_type'
+    })
+}
+
+ALL_RELATIONS = tuple(RELATIONS)
+
+FOREIGN_KEYS = tuple(foreign_key for foreign_key, _, _ in RELATIONS.values())
+
+
+def _load_related(alerts, relations, known):
+    """relation -> {entity ID: entity} for the entities the alerts point to"""
+    known = list(known or [])
+    loaded = {}
+    for relation in relations:
+        foreign_key, model, _ = RELATIONS[relation]
+        entities = {e.id: e for e in known if isinstance(e, model)}
+        missing_ids = {getattr(a, foreign_key) for a in alerts} - set(entities) - {None}
+        if missing_ids:
+            entities.update(model.get_many(missing_ids))
+        loaded[relation] = entities
+    return loaded
+
+
+def related_entities(alerts, relations=ALL_RELATIONS):
+    """The restaurants, food banks and drivers the alerts point to (only foreign keys need to be loaded)"""
+    related = []
+    for entities in _load_related(alerts, relations, None).values():
+        related.extend(entities.values())
+    return related
+
+
+def enrich_alerts(alerts, relations=ALL_RELATIONS, known=None):
+    """
+    Convert alerts to dicts with related entity details added
+    known: entities already loaded by the caller, used instead of fetching them again
+    """
+    alert_dicts = [alert.to_dict() for alert in alerts]
+
+    for relation, entities in _load_related(alerts, relations, known).items():
+        foreign_key, _, fields = RELATIONS[relation]
+        for alert, alert_dict in zip(alerts, alert_dicts):
+            entity = entities.get(getattr(alert, foreign_key))
+            if entity:
+                for alert_field, attribute in fields.items():
+                    alert_dict[alert_field] = getattr(entity, attribute)
+
+    return alert_dicts
+
+
+def enrich_alert(alert, relations=ALL_RELATIONS, known=None):
+    """Single-alert version of enrich_alerts"""
+    return enrich_alerts([alert], relations, known)[0]
@@ -0,0 +1,87 @@
+"""
+Streams alert history as newline-delimited JSON with resumable checkpoints
+"""
+import json
+import base64
+from datetime import datetime
+from models.models import FoodAlert, DeliveryRequest
+
+EXPORT_BATCH_SIZE = 500  # Documents per Firestore read; memory stays bounded by this
+
+EXPORT_MODELS = {
+    FoodAlert.collection_name: FoodAlert,
+    DeliveryRequest.collection_name: DeliveryRequest
+}
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def encode_checkpoint(collection, created_at, doc_id):
+    """Opaque token for resuming just after this document"""
+    payload = {'collection': collection, 'created_at': created_at.isoformat(), 'id': doc_id}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+
+def decode_checkpoint(token):
+    """Return (collection, created_at, id) from a checkpoint; raises ValueError if invalid"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        collection = payload['collection']
+        created_at = datetime.fromisoformat(payload['created_at'])
+        doc_id = payload['id']
+    except Exception:
+        raise ValueError('Invalid checkpoint')
+    if collection not in EXPORT_MODELS:
+        raise ValueError('Invalid checkpoint')
+    return collection, created_at, doc_id
+
+
+def export_lines(collections, start=None, end=None, checkpoint=None):
+    """
+    Yield one NDJSON line per document created in [start, end), collection by collection
+    Each line carries the checkpoint to pass back to resume after it.
+    """
+    resume_collection, resume_created_at, resume_id = (None, None, None)
+    if checkpoint:
+        resume_collection, resume_created_at, resume_id = decode_checkpoint(checkpoint)
+        if resume_collection not in collections:
+            raise ValueError('Checkpoint does not match the requested collections')
+        # Collections before the checkpoint's one were already exported
+        collections = collections[collections.index(resume_collection):]
+
+    for collection in collections:
+        model = EXPORT_MODELS[collection]
+        query = model.query()
+        if start is not None:
+            query = query.where('created_at', '>=', start)
+        if end is not None:
+            query = query.where('created_at', '<', end)
+        query = query.order_by('created_at').order_by('id')
+
+        cursor = None
+        if collection == resume_collection:
+            cursor = {'created_at': resume_created_at, 'id': resume_id}
+
+        # Read in bounded batches so no single Firestore stream stays open for the whole export
+        while True:
+            batch_query = query.limit(EXPORT_BATCH_SIZE)
+            if cursor is not None:
+                batch_query = batch_query.start_after(cursor)
+
+            count = 0
+            for document in batch_query.stream():
+                count += 1
+                cursor = {'created_at': document.created_at, 'id': document.id}
+                yield json.dumps({
+                    'collection': collection,
+                    'checkpoint': encode_checkpoint(collection, document.created_at, document.id),
+                    'data': document.to_dict()
+                }, default=_json_default) + '\n'
+
+            if count < EXPORT_BATCH_SIZE:
+                break
@@ -0,0 +1,83 @@
+"""
+Batch geocoding: dedupes addresses, answers cached ones immediately and
+sends the rest through a bounded worker pool that respects the provider rate limit
+"""
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from services.geocode_cache import GeocodeCache
+from services import cooperative
+
+
+def _result(address, coordinates, cached):
+    lat, lon = coordinates
+    if lat is None or lon is None:
+        return {
+            'address': address,
+            'success': False,
+            'cached': cached,
+            'error': 'Could not geocode address'
+        }
+    return {
+        'address': address,
+        'success': True,
+        'cached': cached,
+        'coordinates': {
+            'latitude': lat,
+            'longitude': lon
+        }
+    }
+
+
+def geocode_batch(service, addresses, max_workers=None):
+    """
+    Geocode many addresses, yielding one result dict per distinct address as it finishes
+    Cached addresses are yielded first; the rest follow in completion order.
+    """
+    if max_workers is None:
+        max_workers = int(os.getenv('GEOCODE_BATCH_WORKERS', 4))
+
+    # Dedupe on the normalized cache key, keeping the first spelling seen
+    unique = {}
+    for address in addresses:
+        if isinstance(address, str) and address.strip():
+            unique.setdefault(GeocodeCache.normalize(address), address)
+
+    pending = []
+    for address in unique.values():
+        cached = service.get_cached_coordinates(address)
+        if cached is not None:
+            yield _result(address, cached, cached=True)
+        else:
+            pending.append(address)
+
+    if not pending:
+        return
+
+    logging.info(f"Batch geocoding {len(pending)} uncached of {len(unique)} distinct addresses")
+
+    # Keep only a small window of work queued so memory stays bounded for huge batches
+    window = max_workers * 2
+    remaining = iter(pending)
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='geocode') as executor:
+        in_flight = {}
+        for address in remaining:
+            in_flight[executor.submit(service.refresh_coordinates, address)] = address
+            if len(in_flight) >= window:
+                break
+
+        while in_flight:
+            # Waiting on the pool would otherwise hold the eventlet hub for the whole batch
+            done, _ = cooperative.call_blocking(wait, in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                address = in_flight.pop(future)
+                try:
+                    coordinates = future.result()
+                except Exception as e:
+                    logging.error(f"Batch geocoding failed for '{address}': {str(e)}")
+                    coordinates = (None, None)
+                yield _result(address, coordinates, cached=False)
+
+                next_address = next(remaining, None)
+                if next_address is not None:
+                    in_flight[executor.submit(service.refresh_coordinates, next_address)] = next_address
@@ -0,0 +1,37 @@
+"""
+Blocking waits that don't stall the eventlet hub. Without SOCKETIO_MESSAGE_QUEUE
+the standard library isn't monkey-patched, so time.sleep, socket I/O or waiting
+on a thread pool in a green thread would hold up every other request and
+Socket.IO heartbeat in the process.
+"""
+import sys
+import time
+
+
+def on_hub():
+    """True when called from a green thread of an unpatched eventlet hub"""
+    if 'eventlet' not in sys.modules:
+        return False  # Threading mode; eventlet is only imported when Socket.IO picks it
+    import greenlet
+    from eventlet import patcher
+    if patcher.is_monkey_patched('thread'):
+        return False  # Blocking calls already yield to the hub
+    # Green threads run under the hub's greenlet; native threads run in their root greenlet
+    return greenlet.getcurrent().parent is not None
+
+
+def sleep(seconds):
+    """time.sleep that lets other green threads run meanwhile"""
+    if on_hub():
+        import eventlet
+        eventlet.sleep(seconds)
+    else:
+        time.sleep(seconds)
+
+
+def call_blocking(func, *args, **kwargs):
+    """func(*args, **kwargs), in a native thread when called on the hub so green threads keep running"""
+    if on_hub():
+        from eventlet import tpool
+        return tpool.execute(func, *args, **kwargs)
+    return func(*args, **kwargs)
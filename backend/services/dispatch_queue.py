@@ -0,0 +1,154 @@
+"""
+Bounded work queue that runs alert dispatch off the request path
+"""
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+
+
+class DispatchQueueFull(Exception):
+    """Raised when work is submitted while the queue is at capacity"""
+
+
+class DispatchJob:
+    def __init__(self, name, func, args):
+        self.name = name
+        self.func = func
+        self.args = args
+        self.attempts = 0
+        self.enqueued_at = time.time()
+
+
+class DispatchQueue:
+    """
+    Jobs wait in a bounded queue and run on a fixed pool of Socket.IO
+    background tasks. A full queue rejects new work instead of growing
+    without limit; failed jobs are retried with exponential backoff and
+    jitter via the scheduler, up to max_attempts.
+    """
+
+    def __init__(self, socketio, scheduler, workers=None, max_size=None, max_attempts=None,
+                 retry_backoff=None, max_backoff=60.0):
+        self.socketio = socketio
+        self.scheduler = scheduler
+        self.workers = workers or int(os.getenv('DISPATCH_WORKERS', 4))
+        self.max_size = max_size or int(os.getenv('DISPATCH_QUEUE_SIZE', 1000))
+        self.max_attempts = max_attempts or int(os.getenv('DISPATCH_MAX_ATTEMPTS', 5))
+        if retry_backoff is None:
+            retry_backoff = float(os.getenv('DISPATCH_RETRY_BACKOFF', 1.0))
+        self.retry_backoff = retry_backoff
+        self.max_backoff = max_backoff
+        self._queue = None
+        self._queue_empty = None
+        self._lock = threading.Lock()
+        self._retry_seq = itertools.count()
+        self._stopped = False
+        self._in_flight = 0
+        self._retry_pending = 0
+        self._max_depth = 0
+        self._wait_total = 0.0
+        self._counters = {
+            'submitted': 0,
+            'completed': 0,
+            'retried': 0,
+            'failed': 0,
+            'rejected': 0
+        }
+
+    def start(self):
+        """Create the queue and start the workers once"""
+        if self._queue is not None:
+            return
+        with self._lock:
+            if self._queue is not None:
+                return
+            # Queue type matches the async mode (eventlet or threads); the bound is enforced in submit()
+            eio = self.socketio.server.eio
+            self._queue_empty = eio.get_queue_empty_exception()
+            self._queue = eio.create_queue()
+        for _ in range(self.workers):
+            self.socketio.start_background_task(self._worker)
+
+    def stop(self):
+        self._stopped = True
+
+    def depth(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def has_capacity(self):
+        return self.depth() < self.max_size
+
+    def submit(self, name, func, *args):
+        """Queue func(*args); raises DispatchQueueFull if the queue is at capacity"""
+        self.start()
+        with self._lock:
+            depth = self._queue.qsize()
+            if depth >= self.max_size:
+                self._counters['rejected'] += 1
+                raise DispatchQueueFull(f'Dispatch queue is full ({self.max_size} jobs)')
+            self._queue.put(DispatchJob(name, func, args))
+            self._counters['submitted'] += 1
+            self._max_depth = max(self._max_depth, depth + 1)
+
+    def _requeue(self, job):
+        """Put a job back after its backoff; it was already admitted, so the bound doesn't apply"""
+        with self._lock:
+            self._retry_pending -= 1
+            job.enqueued_at = time.time()
+            self._queue.put(job)
+
+    def _worker(self):
+        while not self._stopped:
+            try:
+                job = self._queue.get(timeout=1)
+            except self._queue_empty:
+                continue
+            self._run(job)
+
+    def _run(self, job):
+        with self._lock:
+            self._in_flight += 1
+            self._wait_total += time.time() - job.enqueued_at
+        job.attempts += 1
+        try:
+            job.func(*job.args)
+            with self._lock:
+                self._counters['completed'] += 1
+        except Exception as e:
+            self._retry(job, e)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def _retry(self, job, error):
+        if job.attempts >= self.max_attempts:
+            with self._lock:
+                self._counters['failed'] += 1
+            logging.error(f"Dispatch job {job.name} failed after {job.attempts} attempts: {str(error)}")
+            return
+
+        delay = min(self.max_backoff, self.retry_backoff * 2 ** (job.attempts - 1))
+        delay *= random.uniform(0.5, 1.0)  # Jitter so a burst of failures doesn't retry in lockstep
+        with self._lock:
+            self._counters['retried'] += 1
+            self._retry_pending += 1
+        logging.warning(
+            f"Dispatch job {job.name} failed (attempt {job.attempts}), retrying in {delay:.1f}s: {str(error)}"
+        )
+        self.scheduler.schedule(f'dispatch_retry_{next(self._retry_seq)}', delay, self._requeue, job)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['in_flight'] = self._in_flight
+            stats['retry_pending'] = self._retry_pending
+            started = stats['completed'] + stats['retried'] + stats['failed']
+            stats['avg_wait_seconds'] = round(self._wait_total / started, 4) if started else 0.0
+            stats['max_depth'] = self._max_depth
+        stats['depth'] = self.depth()
+        stats['max_size'] = self.max_size
+        stats['workers'] = self.workers
+        return stats
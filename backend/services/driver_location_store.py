@@ -0,0 +1,190 @@
+"""
+Latest driver positions kept in memory and written behind to Firestore in batches
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from models.models import Driver
+
+FLUSH_BATCH_SIZE = 500  # Firestore's limit on writes per batch
+MAX_WRITE_FAILURES = 3  # Consecutive failed flushes before a driver's position is dropped
+
+
+class DriverLocationStore:
+    """
+    Latest known position per driver. Pings between flushes overwrite each
+    other, so a driver sending one ping a second costs one write per flush
+    interval instead of one per ping. Readers get the in-memory position,
+    which is never older than what is stored on the driver document.
+    """
+
+    def __init__(self, flush_interval=None):
+        if flush_interval is None:
+            flush_interval = float(os.getenv('DRIVER_LOCATION_FLUSH_INTERVAL', 5))
+        self.flush_interval = flush_interval
+        self._positions = {}  # driver_id -> {'lat', 'lng', 'updated_at'}
+        self._dirty = set()
+        self._failures = {}  # driver_id -> consecutive failed writes
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._socketio = None
+        self._stopped = False
+        self._counters = {
+            'pings': 0,
+            'writes': 0,
+            'flushes': 0,
+            'failed_writes': 0
+        }
+
+    @staticmethod
+    def parse_location(location):
+        """Return (lat, lng) from a {lat, lng} dict, or None if it isn't a valid position"""
+        if not isinstance(location, dict):
+            return None
+        try:
+            lat, lng = float(location['lat']), float(location['lng'])
+        except (KeyError, TypeError, ValueError):
+            return None
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            return None
+        return lat, lng
+
+    def subscribe(self, callback):
+        """Call callback(driver_id, lat, lng) on every position update"""
+        self._listeners.append(callback)
+
+    def update(self, driver_id, lat, lng):
+        """Record a driver's position; it is persisted on the next flush"""
+        with self._lock:
+            self._positions[driver_id] = {'lat': lat, 'lng': lng, 'updated_at': time.time()}
+            self._dirty.add(driver_id)
+            self._counters['pings'] += 1
+        for callback in self._listeners:
+            callback(driver_id, lat, lng)
+
+    def get(self, driver_id):
+        """Latest {lat, lng} for a driver, or None if no ping was received since startup"""
+        position = self._positions.get(driver_id)
+        if position is None:
+            return None
+        return {'lat': position['lat'], 'lng': position['lng']}
+
+    def apply(self, driver):
+        """Overlay the latest in-memory position onto a Driver loaded from storage"""
+        location = self.get(driver.id)
+        if location is not None:
+            driver.current_location = location
+        return driver
+
+    def forget(self, driver_id):
+        with self._lock:
+            self._positions.pop(driver_id, None)
+            self._dirty.discard(driver_id)
+            self._failures.pop(driver_id, None)
+
+    def flush(self):
+        """Write every position changed since the last flush; returns the number written"""
+        with self._lock:
+            pending = {driver_id: self._positions[driver_id] for driver_id in self._dirty}
+            self._dirty = set()
+        if not pending:
+            return 0
+
+        items = list(pending.items())
+        written = 0
+        try:
+            for start in range(0, len(items), FLUSH_BATCH_SIZE):
+                written += self._write_batch(items[start:start + FLUSH_BATCH_SIZE])
+        except Exception:
+            self._retry_later(pending)
+            raise
+
+        with self._lock:
+            self._counters['writes'] += written
+            self._counters['flushes'] += 1
+        return written
+
+    def _write_batch(self, items):
+        backend = Driver.storage()
+        batch = backend.batch()
+        for driver_id, position in items:
+            batch.update(Driver.collection_name, driver_id, self._location_fields(position))
+        try:
+            batch.commit()
+        except Exception as e:
+            # One bad document (e.g. an unknown driver ID) fails the whole batch; retry one by one
+            logging.warning(f"Batched location flush failed, writing individually: {str(e)}")
+            return self._write_individually(backend, items)
+        self._invalidate(driver_id for driver_id, _ in items)
+        return len(items)
+
+    def _write_individually(self, backend, items):
+        written = []
+        for driver_id, position in items:
+            try:
+                backend.update(Driver.collection_name, driver_id, self._location_fields(position))
+                written.append(driver_id)
+            except Exception as e:
+                logging.error(f"Error saving location for driver {driver_id}: {str(e)}")
+                self._retry_later([driver_id])
+        self._invalidate(written)
+        return len(written)
+
+    def _retry_later(self, driver_ids):
+        """Mark failed writes dirty again, giving up on drivers that keep failing (e.g. unknown IDs)"""
+        with self._lock:
+            for driver_id in driver_ids:
+                self._counters['failed_writes'] += 1
+                failures = self._failures.get(driver_id, 0) + 1
+                if failures >= MAX_WRITE_FAILURES:
+                    self._failures.pop(driver_id, None)
+                    self._positions.pop(driver_id, None)
+                    self._dirty.discard(driver_id)
+                elif driver_id in self._positions:
+                    self._failures[driver_id] = failures
+                    self._dirty.add(driver_id)
+
+    @staticmethod
+    def _location_fields(position):
+        # updated_at moves too, so ETags of driver listings change with the position
+        return {'current_location': {'lat': position['lat'], 'lng': position['lng']}, 'updated_at': datetime.now()}
+
+    def _invalidate(self, driver_ids):
+        for driver_id in driver_ids:
+            self._failures.pop(driver_id, None)
+            Driver._invalidate(driver_id)
+
+    def start(self, socketio):
+        """Start the periodic flush once"""
+        if self._socketio is not None:
+            return
+        self._socketio = socketio
+        socketio.start_background_task(self._run)
+
+    def stop(self):
+        """Stop the flush loop and write what is still pending"""
+        self._stopped = True
+        self.flush()
+
+    def _run(self):
+        while not self._stopped:
+            self._socketio.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error(f"Error flushing driver locations: {str(e)}")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['tracked_drivers'] = len(self._positions)
+            stats['pending_writes'] = len(self._dirty)
+        stats['coalesced_pings'] = max(0, stats['pings'] - stats['writes'] - stats['pending_writes'])
+        stats['flush_interval_seconds'] = self.flush_interval
+        return stats
+
+
+# Global driver location store instance
+driver_location_store = DriverLocationStore()
@@ -0,0 +1,79 @@
+"""
+Keeps a spatial index of available drivers, following their live positions
+"""
+from models.models import Driver
+from services.geocoding_service import geocoding_service
+from services.driver_location_store import driver_location_store
+from services.materialized_view import MaterializedView
+from services.spatial_index import SpatialIndex
+
+
+class DriverLocator:
+    def __init__(self, location_store=driver_location_store):
+        self.index = SpatialIndex()
+        self.location_store = location_store
+        self._available = set()  # Available drivers, including those with no known position yet
+        # Available, active drivers, followed through the storage change feed
+        self.view = MaterializedView(
+            'available_drivers',
+            Driver.query().where('is_available', '==', True).where('is_active', '==', True),
+            on_change=self._index
+        )
+        location_store.subscribe(self.move)
+    
+    def ensure_loaded(self):
+        """Start following available drivers on first use"""
+        self.view.ensure_started()
+    
+    def _index(self, driver_id, driver):
+        """Keep the index in step with the view"""
+        if driver is None:
+            self._available.discard(driver_id)
+            self.index.remove(driver_id)
+            return
+        self._available.add(driver_id)
+        self.location_store.apply(driver)
+        lat, lng = geocoding_service.coordinates_of(driver.current_location)
+        if lat is not None:
+            self.index.upsert(driver_id, lat, lng, driver_id)
+        else:
+            self.index.remove(driver_id)
+    
+    def update(self, driver):
+        """Add or drop a driver after this worker changed their availability"""
+        self.view.put(driver)
+    
+    def move(self, driver_id, lat, lng):
+        """Follow a position update; only available drivers are indexed"""
+        if driver_id in self._available:
+            self.index.upsert(driver_id, lat, lng, driver_id)
+    
+    def remove(self, driver_id):
+        self.view.discard(driver_id)
+    
+    def drivers(self):
+        """Every available driver with their latest position, ordered by ID"""
+        self.ensure_loaded()
+        return [self.location_store.apply(driver) for driver in self.view.values()]
+    
+    def nearest(self, lat, lng, k=5, max_radius_km=None, exclude_ids=None):
+        """Up to k closest available driver IDs within max_radius_km, as (driver_id, distance_km)"""
+        self.ensure_loaded()
+        return self.index.nearest(lat, lng, k, max_radius_km=max_radius_km, exclude_ids=exclude_ids)
+    
+    def unplaced(self, k, exclude_ids=None):
+        """Up to k available driver IDs with no known position"""
+        self.ensure_loaded()
+        exclude_ids = set(exclude_ids or [])
+        candidates = [driver_id for driver_id in self._available
+                      if driver_id not in self.index and driver_id not in exclude_ids]
+        return sorted(candidates)[:k]
+    
+    def available(self, k, exclude_ids=None):
+        """Up to k available driver IDs regardless of position"""
+        self.ensure_loaded()
+        exclude_ids = set(exclude_ids or [])
+        return sorted(driver_id for driver_id in self._available if driver_id not in exclude_ids)[:k]
+
+# Global driver locator instance
+driver_locator = DriverLocator()
@@ -0,0 +1,75 @@
+"""
+Keeps a spatial index of active food banks and answers proximity queries against it
+"""
+import logging
+import threading
+from models.models import FoodBank
+from services.geocoding_service import geocoding_service
+from services.materialized_view import MaterializedView
+from services.spatial_index import SpatialIndex
+
+
+class FoodBankLocator:
+    def __init__(self):
+        self.index = SpatialIndex()
+        # Active food banks, followed through the storage change feed
+        self.view = MaterializedView(
+            'active_foodbanks',
+            FoodBank.query().where('is_active', '==', True),
+            on_change=self._index
+        )
+        self._backfilled = False
+        self._load_lock = threading.Lock()
+    
+    def ensure_loaded(self):
+        """Start following active food banks on first use"""
+        self.view.ensure_started()
+        if self._backfilled:
+            return
+        with self._load_lock:
+            if self._backfilled:
+                return
+            for foodbank in self.view.values():
+                if foodbank.address and not foodbank.coordinates:
+                    # Backfill food banks created before coordinates were stored
+                    coordinates = geocoding_service.geocode_to_coordinates(foodbank.address)
+                    if coordinates:
+                        foodbank.update({'coordinates': coordinates})
+                        self.update(foodbank)
+            self._backfilled = True
+            logging.info(f"Indexed {len(self.index)} of {len(self.view)} food banks")
+    
+    def _index(self, foodbank_id, foodbank):
+        """Keep the index in step with the view"""
+        lat, lng = None, None
+        if foodbank is not None:
+            lat, lng = geocoding_service.coordinates_of(foodbank.coordinates)
+        if lat is not None:
+            self.index.upsert(foodbank_id, lat, lng, foodbank)
+        else:
+            self.index.remove(foodbank_id)
+    
+    def update(self, foodbank):
+        """Add, move or drop a food bank this worker just created or changed"""
+        self.view.put(foodbank)
+    
+    def remove(self, foodbank_id):
+        self.view.discard(foodbank_id)
+    
+    def active(self):
+        """Every active food bank, placed on the map or not, ordered by ID"""
+        self.ensure_loaded()
+        return self.view.values()
+    
+    def within_radius(self, lat, lng, radius_km, limit=None):
+        """Active food banks within radius_km, as (foodbank, distance_km) sorted by distance"""
+        self.ensure_loaded()
+        return self.index.within_radius(lat, lng, radius_km, limit=limit)
+    
+    def nearest(self, lat, lng, k=5, exclude_ids=None):
+        """The k closest active food banks, as (foodbank, distance_km) sorted by distance"""
+        self.ensure_loaded()
+        return self.index.nearest(lat, lng, k, exclude_ids=exclude_ids)
+
+# Global food bank locator instance
+foodbank_locator = FoodBankLocator()
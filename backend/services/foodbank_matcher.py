@@ -0,0 +1,181 @@
+"""
+Ranks food banks for an alert by distance, spare capacity and how often they accept
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from models.models import FoodAlert
+from services.foodbank_locator import foodbank_locator
+
+# Weights of the three scores; only their ratios matter
+MATCH_WEIGHT_DISTANCE = float(os.getenv('MATCH_WEIGHT_DISTANCE', 0.5))
+MATCH_WEIGHT_CAPACITY = float(os.getenv('MATCH_WEIGHT_CAPACITY', 0.3))
+MATCH_WEIGHT_ACCEPTANCE = float(os.getenv('MATCH_WEIGHT_ACCEPTANCE', 0.2))
+MATCH_DISTANCE_SCALE_KM = float(os.getenv('MATCH_DISTANCE_SCALE_KM', 10))  # Distance that halves the distance score
+MATCH_CANDIDATES = int(os.getenv('MATCH_CANDIDATES', 20))  # Nearest food banks scored per selection
+ACCEPTANCE_WINDOW_DAYS = float(os.getenv('MATCH_ACCEPTANCE_WINDOW_DAYS', 30))
+ACCEPTANCE_REFRESH_SECONDS = float(os.getenv('MATCH_ACCEPTANCE_REFRESH', 300))
+
+# Food banks with few resolved offers are scored as if they had also had
+# PRIOR_OFFERS offers accepted at PRIOR_RATE, so one timeout doesn't bury a new food bank
+PRIOR_OFFERS = 3
+PRIOR_RATE = 0.5
+
+# Offers to food banks on these alerts are over even if nobody accepted
+_CLOSED_STATUSES = (FoodAlert.STATUSES['EXPIRED'], FoodAlert.STATUSES['CANCELLED'])
+
+
+class AcceptanceStats:
+    """
+    Offers and acceptances per food bank over a recent window, counted from
+    one projection of the alerts created in it and refreshed periodically.
+    An offer counts once it is resolved: accepted, escalated past, or closed.
+    """
+
+    def __init__(self, window_days=ACCEPTANCE_WINDOW_DAYS, refresh_seconds=ACCEPTANCE_REFRESH_SECONDS):
+        self.window_days = window_days
+        self.refresh_seconds = refresh_seconds
+        self._counts = {}  # foodbank_id -> (accepted, offered)
+        self._first_offer = (0, 0)  # (accepted by the first food bank offered, accepted)
+        self._refreshed_at = None
+        self._lock = threading.Lock()
+
+    def _ensure_fresh(self):
+        if self._refreshed_at is not None and time.time() - self._refreshed_at < self.refresh_seconds:
+            return
+        with self._lock:
+            if self._refreshed_at is not None and time.time() - self._refreshed_at < self.refresh_seconds:
+                return
+            try:
+                self.refresh()
+            except Exception as e:
+                # Keep the last counts; try again at the next interval
+                logging.error(f"Error refreshing food bank acceptance stats: {str(e)}")
+                self._refreshed_at = time.time()
+
+    def refresh(self):
+        since = datetime.now() - timedelta(days=self.window_days)
+        alerts = FoodAlert.query() \
+            .where('created_at', '>=', since) \
+            .select('status', 'foodbank_id', 'notified_foodbanks') \
+            .stream()
+
+        counts = {}
+        first_offer_accepted = accepted_alerts = 0
+        for alert in alerts:
+            notified = alert.notified_foodbanks or []
+            if alert.foodbank_id:
+                accepted_alerts += 1
+                if notified and notified[0] == alert.foodbank_id:
+                    first_offer_accepted += 1
+            for position, foodbank_id in enumerate(notified):
+                accepted = foodbank_id == alert.foodbank_id
+                resolved = (accepted or alert.foodbank_id or position < len(notified) - 1
+                            or alert.status in _CLOSED_STATUSES)
+                if not resolved:
+                    continue  # Still waiting on this food bank
+                accepts, offers = counts.get(foodbank_id, (0, 0))
+                counts[foodbank_id] = (accepts + accepted, offers + 1)
+
+        self._counts = counts
+        self._first_offer = (first_offer_accepted, accepted_alerts)
+        self._refreshed_at = time.time()
+
+    def rates(self, foodbank_ids):
+        """Smoothed acceptance rate of each food bank, as an array in the same order"""
+        self._ensure_fresh()
+        counts = self._counts
+        accepted = np.array([counts.get(foodbank_id, (0, 0))[0] for foodbank_id in foodbank_ids], dtype=float)
+        offered = np.array([counts.get(foodbank_id, (0, 0))[1] for foodbank_id in foodbank_ids], dtype=float)
+        return (accepted + PRIOR_RATE * PRIOR_OFFERS) / (offered + PRIOR_OFFERS)
+
+    def stats(self):
+        first_offer_accepted, accepted_alerts = self._first_offer
+        return {
+            'window_days': self.window_days,
+            'foodbanks': len(self._counts),
+            'offers': sum(offers for _, offers in self._counts.values()),
+            'accepted': sum(accepts for accepts, _ in self._counts.values()),
+            # Share of accepted alerts taken by the first food bank offered; the matcher aims to raise it
+            'first_offer_acceptance_rate': (
+                round(first_offer_accepted / accepted_alerts, 4) if accepted_alerts else None
+            ),
+            'age_seconds': round(time.time() - self._refreshed_at, 1) if self._refreshed_at else None
+        }
+
+
+class FoodBankMatcher:
+    """
+    Scores candidate food banks in one vectorized pass:
+    - distance: 1 / (1 + km / MATCH_DISTANCE_SCALE_KM), 0 when unknown
+    - capacity: share of the alert's quantity the food bank has room for
+    - acceptance: smoothed recent acceptance rate
+    and picks the best weighted sum. Candidates are the MATCH_CANDIDATES nearest
+    active food banks, or every active food bank when none can be ranked by distance.
+    """
+
+    def __init__(self, locator=foodbank_locator, acceptance=None, weights=None,
+                 distance_scale_km=MATCH_DISTANCE_SCALE_KM, candidates=MATCH_CANDIDATES):
+        self.locator = locator
+        self.acceptance = acceptance if acceptance is not None else AcceptanceStats()
+        self.weights = weights or {
+            'distance': MATCH_WEIGHT_DISTANCE,
+            'capacity': MATCH_WEIGHT_CAPACITY,
+            'acceptance': MATCH_WEIGHT_ACCEPTANCE
+        }
+        self.distance_scale_km = distance_scale_km
+        self.candidates = candidates
+
+    def _candidates(self, lat, lng, exclude_ids):
+        """[(foodbank, distance_km or None)] to score"""
+        if lat is not None and lng is not None:
+            nearest = self.locator.nearest(lat, lng, self.candidates, exclude_ids=exclude_ids)
+            if nearest:
+                return nearest
+        # Nothing to rank by distance, e.g. food banks that could not be placed on the map
+        return [(foodbank, None) for foodbank in self.locator.active() if foodbank.id not in exclude_ids]
+
+    def rank(self, lat, lng, quantity=0, exclude_ids=None):
+        """Candidates as (foodbank, distance_km, score), best first"""
+        candidates = self._candidates(lat, lng, set(exclude_ids or []))
+        if not candidates:
+            return []
+        foodbanks = [foodbank for foodbank, _ in candidates]
+
+        distances = np.array([np.inf if d is None else d for _, d in candidates], dtype=float)
+        distance_scores = 1.0 / (1.0 + distances / self.distance_scale_km)
+
+        available = np.array([foodbank.available_capacity for foodbank in foodbanks], dtype=float)
+        if quantity and quantity > 0:
+            capacity_scores = np.clip(available / quantity, 0.0, 1.0)
+        else:
+            capacity_scores = (available > 0).astype(float)
+
+        acceptance_scores = self.acceptance.rates([foodbank.id for foodbank in foodbanks])
+
+        scores = (self.weights['distance'] * distance_scores
+                  + self.weights['capacity'] * capacity_scores
+                  + self.weights['acceptance'] * acceptance_scores)
+        # Stable sort keeps the nearer food bank first on ties
+        order = np.argsort(-scores, kind='stable')
+        return [(foodbanks[i], candidates[i][1], float(scores[i])) for i in order]
+
+    def select(self, lat, lng, quantity=0, exclude_ids=None):
+        """The best food bank as (foodbank, distance_km, score), or (None, None, None)"""
+        ranked = self.rank(lat, lng, quantity, exclude_ids)
+        return ranked[0] if ranked else (None, None, None)
+
+    def stats(self):
+        return {
+            'weights': dict(self.weights),
+            'distance_scale_km': self.distance_scale_km,
+            'candidates': self.candidates,
+            'acceptance': self.acceptance.stats()
+        }
+
+
+# Global food bank matcher instance
+foodbank_matcher = FoodBankMatcher()
@@ -0,0 +1,143 @@
+"""
+Two-tier cache for geocoding results: an in-process LRU backed by SQLite on disk
+"""
+import os
+import re
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'geocode_cache.sqlite3'
+)
+
+
+class GeocodeCache:
+    """
+    Caches (latitude, longitude) per normalized address.
+    "Not found" results are cached as (None, None) with a shorter TTL.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=10000,
+                 ttl=30 * 24 * 3600, negative_ttl=24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._memory = OrderedDict()  # key -> (lat, lon, expires_at)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._counters = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'stores': 0,
+            'evictions': 0
+        }
+
+        if path:
+            try:
+                self._conn = sqlite3.connect(path, check_same_thread=False)
+                self._conn.execute(
+                    'CREATE TABLE IF NOT EXISTS geocode_cache ('
+                    'key TEXT PRIMARY KEY, lat REAL, lng REAL, expires_at REAL NOT NULL)'
+                )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logging.error(f"Could not open geocode cache at {path}, using memory only: {str(e)}")
+                self._conn = None
+
+    @staticmethod
+    def normalize(address):
+        """Normalize an address so trivially different spellings share a key"""
+        key = address.strip().lower()
+        key = re.sub(r'\s*,\s*', ', ', key)
+        key = re.sub(r'\s+', ' ', key)
+        return key.rstrip('.,; ')
+
+    def get(self, address):
+        """
+        Look up an address
+        Returns: (latitude, longitude), (None, None) for a cached "not found", or None on a miss
+        """
+        key = self.normalize(address)
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[2] > now:
+                    self._memory.move_to_end(key)
+                    self._counters['memory_hits'] += 1
+                    return entry[0], entry[1]
+                del self._memory[key]
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    'SELECT lat, lng, expires_at FROM geocode_cache WHERE key = ?', (key,)
+                ).fetchone()
+                if row and row[2] > now:
+                    self._remember(key, row)
+                    self._counters['disk_hits'] += 1
+                    return row[0], row[1]
+
+            self._counters['misses'] += 1
+            return None
+
+    def set(self, address, lat, lon):
+        """Store a result; pass (None, None) to cache a "not found" answer"""
+        key = self.normalize(address)
+        ttl = self.ttl if lat is not None and lon is not None else self.negative_ttl
+        entry = (lat, lon, time.time() + ttl)
+
+        with self._lock:
+            self._remember(key, entry)
+            self._counters['stores'] += 1
+            if self._conn is not None:
+                try:
+                    self._conn.execute(
+                        'INSERT OR REPLACE INTO geocode_cache (key, lat, lng, expires_at) VALUES (?, ?, ?, ?)',
+                        (key,) + entry
+                    )
+                    self._conn.commit()
+                except sqlite3.Error as e:
+                    logging.warning(f"Could not persist geocode cache entry for '{key}': {str(e)}")
+
+    def _remember(self, key, entry):
+        """Insert into the LRU tier, evicting the least recently used entry if full"""
+        self._memory[key] = tuple(entry)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._counters['evictions'] += 1
+
+    def clear(self):
+        """Drop every cached entry from both tiers"""
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                self._conn.execute('DELETE FROM geocode_cache')
+                self._conn.commit()
+
+    def stats(self):
+        """Hit/miss counters for monitoring"""
+        with self._lock:
+            stats = dict(self._counters)
+            stats['memory_entries'] = len(self._memory)
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['memory_hits'] + stats['disk_hits']) / lookups, 4) if lookups else 0.0
+        stats['persistent'] = self._conn is not None
+        return stats
+
+
+def create_geocode_cache():
+    """Build the cache from environment settings"""
+    path = os.getenv('GEOCODE_CACHE_PATH', DEFAULT_CACHE_PATH)
+    return GeocodeCache(
+        path=path,
+        max_entries=int(os.getenv('GEOCODE_CACHE_SIZE', 10000)),
+        ttl=int(os.getenv('GEOCODE_CACHE_TTL', 30 * 24 * 3600)),
+        negative_ttl=int(os.getenv('GEOCODE_CACHE_NEGATIVE_TTL', 24 * 3600))
+    )
@@ -1,15 +1,38 @@
 """
 Geocoding service to convert addresses to coordinates and calculate distances
 """
+import os
 import math
 import logging
-from geopy.geocoders import Nominatim
-from geopy.exc import GeocoderTimedOut, GeocoderServiceError
-import time
+from services.geocode_cache import create_geocode_cache
+from services.haversine import distances_from
+from services.rate_limiter import create_rate_limiter
+from services import cooperative
 
 class GeocodingService:
-    def __init__(self):
-        self.geolocator = Nominatim(user_agent="ideavolution-app")
+    def __init__(self, geolocator=None, cache=None, rate_limit=None):
+        self._geolocator = geolocator
+        self.cache = cache if cache is not None else create_geocode_cache()
+        if rate_limit is None:
+            rate_limit = float(os.getenv('GEOCODE_RATE_LIMIT', 1))  # Nominatim allows 1 req/s
+        # Shared by every worker when Redis is configured, as the provider limits us as a whole
+        self.rate_limiter = create_rate_limiter(rate_limit, 'ideavolution:geocode-rate')
+    
+    @property
+    def geolocator(self):
+        """Nominatim client, built on the first remote lookup (geopy is slow to import)"""
+        if self._geolocator is None:
+            from geopy.geocoders import Nominatim
+            self._geolocator = Nominatim(
+                user_agent="ideavolution-app",
+                domain=os.getenv('NOMINATIM_DOMAIN', 'nominatim.openstreetmap.org'),
+                scheme=os.getenv('NOMINATIM_SCHEME', 'https')
+            )
+        return self._geolocator
+    
+    @geolocator.setter
+    def geolocator(self, geolocator):
+        self._geolocator = geolocator
     
     def get_coordinates(self, address, retry_count=3):
         """
@@ -19,11 +42,45 @@ class GeocodingService:
         if not address or not address.strip():
             logging.warning("Empty address provided")
             return None, None
-            
+        
+        cached = self.cache.get(address)
+        if cached is not None:
+            return cached
+        
+        return self.refresh_coordinates(address, retry_count)
+    
+    def get_cached_coordinates(self, address):
+        """
+        Look up an address in the cache only
+        Returns: (latitude, longitude), (None, None) for a cached "not found", or None if not cached
+        """
+        return self.cache.get(address)
+    
+    def refresh_coordinates(self, address, retry_count=3):
+        """
+        Geocode an address with the provider, skipping the cache lookup, and cache the result
+        Returns: (latitude, longitude) or (None, None) if failed
+        """
+        result = self._geocode_remote(address, retry_count)
+        if result is None:
+            # Transient failure, don't cache so the next call retries
+            return None, None
+        
+        self.cache.set(address, *result)
+        return result
+    
+    def _geocode_remote(self, address, retry_count):
+        """
+        Ask the geocoding provider for an address
+        Returns: (latitude, longitude), (None, None) if not found, or None if the lookup failed
+        """
+        from geopy.exc import GeocoderTimedOut, GeocoderServiceError
+        
         for attempt in range(retry_count):
             try:
                 logging.info(f"Geocoding attempt {attempt + 1} for: {address}")
-                location = self.geolocator.geocode(address, timeout=10)
+                self.rate_limiter.acquire()
+                location = cooperative.call_blocking(self.geolocator.geocode, address, timeout=10)
                 if location:
                     logging.info(f"Successfully geocoded '{address}' to {location.latitude}, {location.longitude}")
                     return location.latitude, location.longitude
@@ -34,13 +91,13 @@ class GeocodingService:
             except (GeocoderTimedOut, GeocoderServiceError) as e:
                 logging.warning(f"Geocoding attempt {attempt + 1} failed: {str(e)}")
                 if attempt < retry_count - 1:
-                    time.sleep(1)  # Wait before retry
+                    cooperative.sleep(1)  # Wait before retry
                 else:
                     logging.error(f"All geocoding attempts failed for address: {address}")
-                    return None, None
+                    return None
             except Exception as e:
                 logging.error(f"Unexpected error geocoding '{address}': {str(e)}")
-                return None, None
+                return None
     
     @staticmethod
     def calculate_distance(lat1, lon1, lat2, lon2):
@@ -63,31 +120,57 @@ class GeocodingService:
         
         return R * c
     
-    def find_nearest_foodbanks(self, restaurant_address, foodbanks, max_results=5):
+    def geocode_to_coordinates(self, address):
+        """
+        Geocode an address into the {lat, lng} dict stored on entities
+        Returns an empty dict if the address could not be geocoded
+        """
+        lat, lon = self.get_coordinates(address)
+        if lat is None or lon is None:
+            return {}
+        return {'lat': lat, 'lng': lon}
+    
+    @staticmethod
+    def coordinates_of(coordinates):
+        """
+        Read a stored {lat, lng} dict
+        Returns: (latitude, longitude) or (None, None) if not set
+        """
+        if not coordinates:
+            return None, None
+        lat, lng = coordinates.get('lat'), coordinates.get('lng')
+        if lat is None or lng is None:
+            return None, None
+        return lat, lng
+    
+    def find_nearest_foodbanks(self, restaurant_address, foodbanks, max_results=5, restaurant_coordinates=None):
         """
         Find nearest food banks to a restaurant
+        Uses stored coordinates and only geocodes entities that have none
         Returns list of (foodbank, distance_km) tuples, sorted by distance
         """
         # Get restaurant coordinates
-        rest_lat, rest_lon = self.get_coordinates(restaurant_address)
-        if not rest_lat or not rest_lon:
+        rest_lat, rest_lon = self.coordinates_of(restaurant_coordinates)
+        if rest_lat is None:
+            rest_lat, rest_lon = self.get_coordinates(restaurant_address)
+        if rest_lat is None or rest_lon is None:
             logging.error(f"Could not geocode restaurant address: {restaurant_address}")
             return [(fb, None) for fb in foodbanks[:max_results]]
         
-        foodbank_distances = []
-        
+        fb_lats, fb_lons = [], []
         for foodbank in foodbanks:
-            # Get foodbank coordinates
-            fb_lat, fb_lon = self.get_coordinates(foodbank.address)
-            
-            # Calculate distance
-            distance = self.calculate_distance(rest_lat, rest_lon, fb_lat, fb_lon)
-            foodbank_distances.append((foodbank, distance))
+            # Get foodbank coordinates, geocoding only as a fallback
+            fb_lat, fb_lon = self.coordinates_of(foodbank.coordinates)
+            if fb_lat is None:
+                fb_lat, fb_lon = self.get_coordinates(foodbank.address)
+            fb_lats.append(fb_lat)
+            fb_lons.append(fb_lon)
         
-        # Sort by distance (closest first)
-        foodbank_distances.sort(key=lambda x: x[1] if x[1] is not None else float('inf'))
+        # Score all food banks in one call and sort (closest first)
+        distances = distances_from(rest_lat, rest_lon, fb_lats, fb_lons)
+        order = distances.argsort(kind='stable')[:max_results]
         
-        return foodbank_distances[:max_results]
+        return [(foodbanks[i], float(distances[i])) for i in order]
 
 # Global geocoding service instance
 geocoding_service = GeocodingService()
@@ -0,0 +1,40 @@
+"""
+Vectorized haversine distances for scoring many coordinates in one call
+"""
+import numpy as np
+
+EARTH_RADIUS_KM = 6371
+
+
+def to_array(values):
+    """Convert a sequence of coordinates to a float array, with None as NaN"""
+    return np.array([np.nan if v is None else v for v in values], dtype=float)
+
+
+def _haversine(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    distances = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+    # Missing coordinates propagate as NaN; report them as infinitely far away
+    return np.where(np.isnan(distances), np.inf, distances)
+
+
+def distances_from(lat, lon, lats, lons):
+    """
+    Distance in kilometers from one origin to M destinations
+    Returns an array of length M, with inf where any coordinate is missing
+    """
+    lats, lons = to_array(lats), to_array(lons)
+    if lat is None or lon is None:
+        return np.full(lats.shape, np.inf)
+    return _haversine(float(lat), float(lon), lats, lons)
+
+
+def distance_matrix(origin_lats, origin_lons, dest_lats, dest_lons):
+    """
+    Distance in kilometers from N origins to M destinations
+    Returns an N x M array, with inf where any coordinate is missing
+    """
+    o_lats, o_lons = to_array(origin_lats)[:, None], to_array(origin_lons)[:, None]
+    d_lats, d_lons = to_array(dest_lats)[None, :], to_array(dest_lons)[None, :]
+    return _haversine(o_lats, o_lons, d_lats, d_lons)
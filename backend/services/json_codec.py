@@ -0,0 +1,70 @@
+"""
+JSON encoding shared by Flask responses and Socket.IO packets
+Uses orjson when it is installed and JSON_PROVIDER is orjson (the default);
+JSON_PROVIDER=json selects the standard library. Datetimes are written as
+HTTP dates like Flask's jsonify, or as ISO 8601 with JSON_DATETIME_FORMAT=iso,
+which orjson encodes natively without calling back into Python.
+"""
+import json
+import logging
+import os
+from flask.json.provider import JSONProvider, DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_PROVIDER = os.getenv('JSON_PROVIDER', 'orjson').lower()
+DATETIME_FORMAT = os.getenv('JSON_DATETIME_FORMAT', 'http').lower()
+
+if JSON_PROVIDER == 'orjson' and orjson is None:
+    logging.warning("JSON_PROVIDER=orjson but orjson is not installed; using the standard json module")
+USE_ORJSON = JSON_PROVIDER == 'orjson' and orjson is not None
+
+
+def _default(value):
+    """Types JSON has no encoding for, handled the way Flask's jsonify handles them"""
+    if DATETIME_FORMAT == 'iso' and hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return DefaultJSONProvider.default(value)
+
+
+if USE_ORJSON:
+    _OPTIONS = orjson.OPT_NON_STR_KEYS
+    if DATETIME_FORMAT == 'iso':
+        # Naive datetimes are UTC, as when they are written as HTTP dates
+        _OPTIONS |= orjson.OPT_NAIVE_UTC
+    else:
+        _OPTIONS |= orjson.OPT_PASSTHROUGH_DATETIME
+
+    def dumps_bytes(obj) -> bytes:
+        return orjson.dumps(obj, default=_default, option=_OPTIONS)
+
+    def loads(s, **kwargs):
+        return orjson.loads(s)
+else:
+    def dumps_bytes(obj) -> bytes:
+        return json.dumps(obj, default=_default, separators=(',', ':')).encode()
+
+    def loads(s, **kwargs):
+        return json.loads(s, **kwargs)
+
+
+def dumps(obj, **kwargs) -> str:
+    """Compact JSON text; stdlib formatting options such as separators are accepted and ignored"""
+    return dumps_bytes(obj).decode()
+
+
+class FastJSONProvider(JSONProvider):
+    """Flask JSON provider for jsonify, request.get_json and returned dicts"""
+
+    def dumps(self, obj, **kwargs):
+        return dumps(obj)
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj) + b'\n', mimetype='application/json')
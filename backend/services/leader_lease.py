@@ -0,0 +1,153 @@
+"""
+Leases that let exactly one worker run singleton jobs such as escalation timers
+"""
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+
+
+class LocalLease:
+    """In-process lease for single-worker runs and tests"""
+
+    def __init__(self):
+        self._holders = {}  # name -> (holder, expires_at)
+        self._lock = threading.Lock()
+
+    def acquire(self, name, holder, ttl):
+        """Take or renew the lease; returns False while someone else holds it"""
+        now = time.time()
+        with self._lock:
+            current = self._holders.get(name)
+            if current and current[0] != holder and current[1] > now:
+                return False
+            self._holders[name] = (holder, now + ttl)
+            return True
+
+    def release(self, name, holder):
+        with self._lock:
+            current = self._holders.get(name)
+            if current and current[0] == holder:
+                del self._holders[name]
+
+
+class RedisLease:
+    """Lease kept in Redis: SET NX PX takes it, compare-and-set scripts renew or release it"""
+
+    RENEW_SCRIPT = """
+        if redis.call('get', KEYS[1]) == ARGV[1] then
+            return redis.call('pexpire', KEYS[1], ARGV[2])
+        end
+        return 0
+    """
+    RELEASE_SCRIPT = """
+        if redis.call('get', KEYS[1]) == ARGV[1] then
+            return redis.call('del', KEYS[1])
+        end
+        return 0
+    """
+
+    def __init__(self, url):
+        import redis  # Only needed when running several workers
+        self._redis = redis.Redis.from_url(url, socket_timeout=5)
+        self._renew = self._redis.register_script(self.RENEW_SCRIPT)
+        self._release = self._redis.register_script(self.RELEASE_SCRIPT)
+
+    def acquire(self, name, holder, ttl):
+        """Take or renew the lease; returns False while someone else holds it"""
+        ttl_ms = int(ttl * 1000)
+        if self._redis.set(name, holder, nx=True, px=ttl_ms):
+            return True
+        return bool(self._renew(keys=[name], args=[holder, ttl_ms]))
+
+    def release(self, name, holder):
+        self._release(keys=[name], args=[holder])
+
+
+def create_lease():
+    """Redis lease when a Redis URL is configured (LEASE_REDIS_URL or the Socket.IO message queue), else in-process"""
+    url = os.getenv('LEASE_REDIS_URL') or os.getenv('SOCKETIO_MESSAGE_QUEUE', '')
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisLease(url)
+    return LocalLease()
+
+
+class LeaderElection:
+    """
+    Keeps trying to hold a named lease from a background task and renews it
+    at a third of its TTL. This worker is leader only while the lease is
+    known to be held, so a worker that can't renew (e.g. Redis is down)
+    stops acting as leader before anyone else can take over.
+    """
+
+    def __init__(self, socketio, name, lease, ttl=15.0, on_elected=None, on_demoted=None):
+        self.socketio = socketio
+        self.name = name
+        self.lease = lease
+        self.ttl = ttl
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.holder = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self._held_until = 0.0
+        self._leader = False
+        self._started = False
+        self._stopped = False
+        self._elections = 0
+
+    @property
+    def is_leader(self):
+        return self._leader and time.time() < self._held_until
+
+    def start(self):
+        if self._started:
+            return
+        self._started = True
+        self.socketio.start_background_task(self._run)
+
+    def stop(self):
+        """Give up the lease so another worker can take over straight away"""
+        self._stopped = True
+        if self._leader:
+            self._set_leader(False)
+            try:
+                self.lease.release(self.name, self.holder)
+            except Exception as e:
+                logging.warning(f"Could not release lease {self.name}: {str(e)}")
+
+    def _run(self):
+        while not self._stopped:
+            attempted_at = time.time()
+            try:
+                acquired = self.lease.acquire(self.name, self.holder, self.ttl)
+            except Exception as e:
+                logging.warning(f"Lease {self.name} check failed: {str(e)}")
+                acquired = False
+
+            if acquired:
+                self._held_until = attempted_at + self.ttl
+            if acquired != self._leader:
+                self._set_leader(acquired)
+            self.socketio.sleep(self.ttl / 3)
+
+    def _set_leader(self, leader):
+        self._leader = leader
+        if leader:
+            self._elections += 1
+        logging.info(f"{self.holder} {'now holds' if leader else 'no longer holds'} lease {self.name}")
+        callback = self.on_elected if leader else self.on_demoted
+        if callback:
+            try:
+                callback()
+            except Exception as e:
+                logging.error(f"Error handling lease change for {self.name}: {str(e)}")
+
+    def stats(self):
+        return {
+            'lease': self.name,
+            'holder': self.holder,
+            'is_leader': self.is_leader,
+            'elections': self._elections,
+            'backend': type(self.lease).__name__
+        }
@@ -0,0 +1,159 @@
+"""
+In-process views of query results, kept current by the storage change feed
+"""
+import logging
+import os
+import threading
+import time
+
+VIEW_READY_TIMEOUT = float(os.getenv('VIEW_READY_TIMEOUT', 30))  # Seconds to wait for a view's first snapshot
+
+
+class MaterializedView:
+    """
+    The documents matching a query, held in memory and followed through the
+    storage backend's change feed (Firestore on_snapshot listeners, or the
+    SQLite backend's post-commit feed), so readers don't scan the collection.
+
+    on_change(doc_id, instance) runs for every document that enters or changes
+    in the view, and with instance None for one that leaves it. If the feed
+    stops, the next read resubscribes; the new snapshot replaces the contents.
+    """
+
+    def __init__(self, name, query, on_change=None):
+        self.name = name
+        self.query = query
+        self.on_change = on_change
+        self._rows = {}  # doc_id -> row, as kept in entity caches
+        self._lock = threading.RLock()
+        self._start_lock = threading.Lock()
+        self._ready = threading.Event()
+        self._watch = None
+        self._subscription = None  # Changes from an older subscription are ignored
+        self._snapshot_pending = False
+        self._last_change_at = None
+        self._lag = None
+        self._max_lag = 0.0
+        self._counters = {
+            'snapshots': 0,
+            'changes': 0,
+            'resubscribes': 0
+        }
+
+    @property
+    def is_listening(self):
+        return self._watch is not None and self._watch.is_active
+
+    def ensure_started(self):
+        """Subscribe on first use, or again if the feed stopped, and wait for the snapshot"""
+        if self._ready.is_set() and self.is_listening:
+            return
+        with self._start_lock:
+            if self._ready.is_set() and self.is_listening:
+                return
+            if self._watch is not None:
+                logging.warning(f"View {self.name} lost its change feed; resubscribing")
+                self._counters['resubscribes'] += 1
+                try:
+                    self._watch.unsubscribe()
+                except Exception as e:
+                    logging.warning(f"Could not close the change feed of view {self.name}: {str(e)}")
+
+            self._ready.clear()
+            subscription = self._subscription = object()
+            self._snapshot_pending = True
+            self._watch = self.query.watch(
+                lambda changes, read_time: self._apply(subscription, changes, read_time)
+            )
+            if not self._ready.wait(VIEW_READY_TIMEOUT):
+                raise TimeoutError(f'View {self.name} got no snapshot within {VIEW_READY_TIMEOUT}s')
+            logging.info(f"View {self.name} loaded {len(self._rows)} documents")
+
+    def _apply(self, subscription, changes, read_time):
+        if subscription is not self._subscription:
+            return
+        snapshot = False
+        with self._lock:
+            if self._snapshot_pending:
+                # The first delivery is the whole result set; anything else we hold has left it
+                incoming = {doc_id for doc_id, _ in changes}
+                changes = [(doc_id, None) for doc_id in self._rows if doc_id not in incoming] + list(changes)
+                self._snapshot_pending = False
+                self._counters['snapshots'] += 1
+                snapshot = True
+
+            for doc_id, instance in changes:
+                if instance is None:
+                    if self._rows.pop(doc_id, None) is None:
+                        continue
+                else:
+                    self._rows[doc_id] = instance._row()
+                self._counters['changes'] += 1
+                if self.on_change:
+                    try:
+                        self.on_change(doc_id, instance)
+                    except Exception as e:
+                        logging.error(f"Error applying change to {doc_id} in view {self.name}: {str(e)}")
+
+            self._last_change_at = time.time()
+            if read_time is not None:
+                # Clocks can disagree by a little; never report negative lag
+                self._lag = max(0.0, self._last_change_at - read_time.timestamp())
+                self._max_lag = max(self._max_lag, self._lag)
+        if snapshot:
+            self._ready.set()
+
+    def put(self, instance):
+        """
+        Apply a write this worker just made without waiting for the feed,
+        which lags behind commits on Firestore
+        """
+        if not self._ready.is_set():
+            return  # The snapshot will include it
+        match = instance if self.query.matches(instance) else None
+        self._apply(self._subscription, [(instance.id, match)], None)
+
+    def discard(self, doc_id):
+        if self._ready.is_set():
+            self._apply(self._subscription, [(doc_id, None)], None)
+
+    def get(self, doc_id):
+        self.ensure_started()
+        row = self._rows.get(doc_id)
+        return self.query.model._from_row(row) if row is not None else None
+
+    def values(self):
+        """Fresh instances of every document in the view, ordered by ID"""
+        self.ensure_started()
+        with self._lock:
+            rows = [self._rows[doc_id] for doc_id in sorted(self._rows)]
+        return [self.query.model._from_row(row) for row in rows]
+
+    def __len__(self):
+        return len(self._rows)
+
+    def stats(self):
+        listening = self.is_listening
+        since_change = time.time() - self._last_change_at if self._last_change_at is not None else None
+        if not self._ready.is_set():
+            staleness = None
+        elif listening:
+            # Up to date apart from changes still in flight; the last delivery shows how long those take
+            staleness = self._lag or 0.0
+        else:
+            # Not following storage any more: could be missing anything since the last change
+            staleness = since_change
+
+        def rounded(seconds):
+            return round(seconds, 3) if seconds is not None else None
+
+        stats = dict(self._counters)
+        stats.update({
+            'documents': len(self._rows),
+            'listening': listening,
+            'staleness_seconds': rounded(staleness),
+            'lag_seconds': rounded(self._lag),
+            'max_lag_seconds': rounded(self._max_lag),
+            'seconds_since_change': rounded(since_change)
+        })
+        return stats
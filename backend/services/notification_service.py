@@ -1,71 +1,92 @@
 from flask_socketio import emit, join_room, leave_room
-from models.models import FoodAlert, FoodBank, Driver, Restaurant
+from models.models import FoodAlert, Restaurant, run_transaction
+from storage import ArrayUnion
 from services.geocoding_service import geocoding_service
-from datetime import datetime, timedelta
-import threading
-import time
+from services.foodbank_matcher import foodbank_matcher
+from services.driver_locator import driver_locator
+from services.scheduler import TaskScheduler
+from services.dispatch_queue import DispatchQueue, DispatchQueueFull
+from services.leader_lease import LeaderElection, create_lease
+from services.alert_enrichment import enrich_alert
+from datetime import datetime, timedelta, timezone
 import logging
+import os
+import time
+
+ESCALATION_TIMEOUT_SECONDS = 600  # Escalate after 10 minutes without a response
+ESCALATION_LEASE_NAME = 'ideavolution:escalation-scheduler'
+# With several workers, how often the escalation leader picks up deadlines set by the others
+ESCALATION_SYNC_SECONDS = int(os.getenv('ESCALATION_SYNC_INTERVAL', 30))
+MULTI_WORKER = bool(os.getenv('SOCKETIO_MESSAGE_QUEUE'))
+DRIVER_WAVE_SIZE = int(os.getenv('DRIVER_WAVE_SIZE', 5))  # Drivers sent a delivery request per wave
+DRIVER_WAVE_INTERVAL_SECONDS = int(os.getenv('DRIVER_WAVE_INTERVAL', 120))  # Wait before widening the search
+# Search radius per wave; the last wave reaches any distance
+DRIVER_WAVE_RADII_KM = tuple(
+    float(radius) for radius in os.getenv('DRIVER_WAVE_RADII_KM', '5,15,40').split(',')
+) + (None,)
 
 class NotificationService:
     def __init__(self, socketio):
         self.socketio = socketio
-        self.active_timers = {}  # Track active escalation timers
+        self.scheduler = TaskScheduler(socketio)  # Escalation timers
+        self.dispatch_queue = DispatchQueue(socketio, self.scheduler)
+        # Escalation timers only run on the worker holding this lease
+        self.escalation_leader = LeaderElection(
+            socketio,
+            ESCALATION_LEASE_NAME,
+            create_lease(),
+            on_elected=self._on_escalation_leader_elected,
+            on_demoted=self._on_escalation_leader_demoted
+        )
+    
+    def can_dispatch(self):
+        """False when the dispatch queue is full and new alerts should be turned away"""
+        return self.dispatch_queue.has_capacity()
+    
+    def dispatch_foodbank_notification(self, alert_id):
+        """Notify food banks about a new alert in the background"""
+        self._dispatch(f'notify_foodbanks_{alert_id}', self.notify_nearby_foodbanks, alert_id)
+    
+    def dispatch_driver_notification(self, alert_id):
+        """Notify available drivers about an accepted alert in the background"""
+        self._dispatch(f'notify_drivers_{alert_id}', self.notify_available_drivers, alert_id)
+    
+    def _dispatch(self, name, func, alert_id):
+        try:
+            self.dispatch_queue.submit(name, func, alert_id)
+        except DispatchQueueFull:
+            # The queue filled up after the caller's capacity check; the alert is saved, so try again shortly
+            logging.warning(f"Dispatch queue full, deferring {name}")
+            self.scheduler.schedule(
+                f'dispatch_{name}', self.dispatch_queue.retry_backoff, self._dispatch, name, func, alert_id
+            )
         
     def notify_nearby_foodbanks(self, alert_id):
-        """Notify food banks about new alert"""
+        """Notify food banks about new alert (raises on failure so the dispatch queue retries)"""
         try:
             alert = FoodAlert.get_by_id(alert_id)
             if not alert:
                 return
             
+            # Already dispatched, e.g. by an earlier attempt that failed after the update
+            if alert.status != FoodAlert.STATUSES['PENDING']:
+                return
+            
             # Get restaurant for address
             restaurant = None
             if alert.restaurant_id:
                 restaurant = Restaurant.get_by_id(alert.restaurant_id)
             
-            if not restaurant or not restaurant.address:
-                logging.warning(f"No restaurant address found for alert {alert_id}")
-                # Fallback to first available food bank
-                foodbanks = FoodBank.get_all()
-                active_foodbanks = [fb for fb in foodbanks if fb.is_active]
-                if active_foodbanks:
-                    first_foodbank = active_foodbanks[0]
-                else:
-                    logging.warning(f"No active food banks found for alert {alert_id}")
-                    return
-            else:
-                # Get nearby food banks using geocoding
-                foodbanks = FoodBank.get_all()
-                active_foodbanks = [fb for fb in foodbanks if fb.is_active and fb.address]
-                
-                if not active_foodbanks:
-                    logging.warning(f"No active food banks with addresses found for alert {alert_id}")
-                    return
-                
-                # Find nearest food banks
-                nearest_foodbanks = geocoding_service.find_nearest_foodbanks(
-                    restaurant.address, 
-                    active_foodbanks, 
-                    max_results=5
-                )
-                
-                if not nearest_foodbanks:
-                    logging.warning(f"Could not find nearby food banks for alert {alert_id}")
-                    return
-                
-                # Get the closest food bank
-                first_foodbank, distance = nearest_foodbanks[0]
-                logging.info(f"Selected closest food bank {first_foodbank.id} at {distance:.2f} km distance")
+            first_foodbank, distance = self._select_foodbank(restaurant, quantity=alert.total_quantity)
+            if not first_foodbank:
+                logging.warning(f"No active food banks found for alert {alert_id}")
+                return
+            
+            if distance is not None:
+                logging.info(f"Selected food bank {first_foodbank.id} at {distance:.2f} km distance")
             
             # Enrich alert with restaurant details
-            alert_dict = alert.to_dict()
-            if alert.restaurant_id:
-                restaurant = Restaurant.get_by_id(alert.restaurant_id)
-                if restaurant:
-                    alert_dict['restaurant_name'] = restaurant.name
-                    alert_dict['restaurant_address'] = restaurant.address
-                    alert_dict['restaurant_phone'] = restaurant.phone
-                    alert_dict['restaurant_email'] = restaurant.email
+            alert_dict = enrich_alert(alert, ('restaurant',), known=[restaurant] if restaurant else None)
             
             notification_data = {
                 'alert_id': alert_id,
@@ -81,48 +102,155 @@ class NotificationService:
                 room=f'foodbank_{first_foodbank.id}'
             )
             
-            # Update alert with notified food bank
-            notified_list = alert.notified_foodbanks or []
-            notified_list.append(first_foodbank.id)
+            # Update alert with notified food bank and when to escalate
+            deadline = self._next_escalation_deadline()
             alert.update({
-                'notified_foodbanks': notified_list,
-                'status': FoodAlert.STATUSES['FOODBANK_NOTIFIED']
+                'notified_foodbanks': ArrayUnion([first_foodbank.id]),
+                'status': FoodAlert.STATUSES['FOODBANK_NOTIFIED'],
+                'escalation_deadline': deadline
             })
             
             # Start escalation timer (10 minutes)
-            self.start_escalation_timer(alert_id, first_foodbank.id)
+            self.start_escalation_timer(alert_id, first_foodbank.id, deadline)
             
             logging.info(f"Notified food bank {first_foodbank.id} about alert {alert_id}")
             
         except Exception as e:
             logging.error(f"Error notifying food banks: {str(e)}")
+            raise
+    
+    def _select_foodbank(self, restaurant, exclude_ids=None, quantity=0):
+        """
+        Pick the active food bank most likely to take quantity items, skipping exclude_ids
+        Ranks nearby food banks by distance, spare capacity and recent acceptance rate
+        Returns (foodbank, distance_km), with distance None if it could not be ranked
+        """
+        lat, lng = self._restaurant_location(restaurant)
+        foodbank, distance, score = foodbank_matcher.select(lat, lng, quantity, exclude_ids)
+        if foodbank is not None:
+            logging.info(f"Food bank {foodbank.id} scored {score:.3f} for {quantity or 0} items")
+        return foodbank, distance
+    
+    @staticmethod
+    def _restaurant_location(restaurant):
+        """(lat, lng) of a restaurant, geocoding only if it has no stored coordinates"""
+        lat, lng = None, None
+        if restaurant:
+            lat, lng = geocoding_service.coordinates_of(restaurant.coordinates)
+            if lat is None and restaurant.address:
+                lat, lng = geocoding_service.get_coordinates(restaurant.address)
+        return lat, lng
+    
+    @staticmethod
+    def _next_escalation_deadline():
+        """Deadline saved on the alert so escalation survives restarts"""
+        return datetime.now(timezone.utc) + timedelta(seconds=ESCALATION_TIMEOUT_SECONDS)
     
-    def start_escalation_timer(self, alert_id, current_foodbank_id):
-        """Start timer to escalate to next food bank if no response"""
-        def escalate():
-            time.sleep(600)  # Wait 10 minutes (600 seconds)
-            
-            try:
-                alert = FoodAlert.get_by_id(alert_id)
-                if not alert:
-                    return
+    def _on_escalation_leader_elected(self):
+        self.socketio.start_background_task(self._sync_escalations)
+    
+    def _on_escalation_leader_demoted(self):
+        cancelled = self.scheduler.cancel_prefix('escalation_')
+        logging.info(f"Handed off {cancelled} escalation timers to the next leader")
+    
+    def _sync_escalations(self):
+        """
+        Load saved deadlines; with several workers, repeat to pick up alerts notified
+        elsewhere or skipped here while a lease renewal ran late. The repeat stays
+        scheduled through such a lapse; losing the lease cancels it.
+        """
+        try:
+            if self.escalation_leader.is_leader:
+                self.recover_escalations()
+        finally:
+            if MULTI_WORKER:
+                self.scheduler.schedule('escalation_sync', ESCALATION_SYNC_SECONDS, self._sync_escalations)
+    
+    def start_escalation_timer(self, alert_id, current_foodbank_id, deadline=None):
+        """
+        Schedule escalation to the next food bank if there is no response
+        With several workers this is a no-op on those not holding the escalation
+        lease: the deadline is saved on the alert and the leader picks it up when
+        it syncs. A single worker always schedules, as nobody else would.
+        """
+        if MULTI_WORKER and not self.escalation_leader.is_leader:
+            logging.info(f"Not escalation leader; alert {alert_id} escalates from the leader's next sync")
+            return
+        if deadline is None:
+            deadline = self._next_escalation_deadline()
+        self.scheduler.schedule_at(
+            self._escalation_key(alert_id),
+            deadline.timestamp(),
+            self._escalate_if_unanswered,
+            alert_id
+        )
+    
+    @staticmethod
+    def _escalation_key(alert_id):
+        return f'escalation_{alert_id}'
+    
+    def _escalate_if_unanswered(self, alert_id):
+        """Escalation timer callback"""
+        try:
+            alert = FoodAlert.get_by_id(alert_id)
+            if not alert:
+                return
+            
+            # Check if alert is still pending
+            if alert.status != FoodAlert.STATUSES['FOODBANK_NOTIFIED']:
+                return
+            
+            # The deadline may have been pushed back since this timer was set
+            deadline = alert.escalation_deadline
+            if deadline and deadline.timestamp() > time.time() + 1:
+                self.start_escalation_timer(alert_id, None, deadline)
+                return
+            
+            self.escalate_to_next_foodbank(alert_id)
                 
-                # Check if alert is still pending
-                if alert.status == FoodAlert.STATUSES['FOODBANK_NOTIFIED']:
-                    self.escalate_to_next_foodbank(alert_id)
-                    
-            except Exception as e:
-                logging.error(f"Error in escalation timer: {str(e)}")
-            finally:
-                # Remove timer from active timers
-                if alert_id in self.active_timers:
-                    del self.active_timers[alert_id]
-        
-        # Store timer reference
-        timer = threading.Thread(target=escalate)
-        timer.daemon = True
-        self.active_timers[alert_id] = timer
-        timer.start()
+        except Exception as e:
+            logging.error(f"Error in escalation timer: {str(e)}")
+    
+    def recover_escalations(self):
+        """
+        Rebuild escalation timers from deadlines saved on alerts
+        Run when this worker becomes escalation leader, so alerts awaiting a food bank
+        don't get stuck after a restart or a leader change
+        """
+        try:
+            started = time.time()
+            pending = FoodAlert.get_escalation_deadlines()
+            overdue = 0
+            
+            for alert_id, deadline, updated_at in pending:
+                if deadline is None:
+                    # Alerts notified before deadlines were stored
+                    if updated_at is None:
+                        deadline = self._next_escalation_deadline()
+                    else:
+                        deadline = updated_at + timedelta(seconds=ESCALATION_TIMEOUT_SECONDS)
+                if deadline.timestamp() <= started:
+                    overdue += 1
+                self.start_escalation_timer(alert_id, None, deadline)
+            
+            logging.info(
+                f"Recovered {len(pending)} escalation timers ({overdue} overdue) "
+                f"in {time.time() - started:.2f}s"
+            )
+            return len(pending)
+            
+        except Exception as e:
+            logging.error(f"Error recovering escalation timers: {str(e)}")
+            return 0
+    
+    def _expire_alert(self, transaction, alert_id):
+        """Expire the alert unless a food bank took it meanwhile; True if it was expired"""
+        alert = transaction.get(FoodAlert, alert_id)
+        if not alert or alert.status not in (
+                FoodAlert.STATUSES['PENDING'], FoodAlert.STATUSES['FOODBANK_NOTIFIED']):
+            return False
+        alert.set_status(transaction, FoodAlert.STATUSES['EXPIRED'], {'escalation_deadline': None})
+        return True
     
     def escalate_to_next_foodbank(self, alert_id):
         """Escalate alert to the next available food bank"""
@@ -136,50 +264,23 @@ class NotificationService:
             if alert.restaurant_id:
                 restaurant = Restaurant.get_by_id(alert.restaurant_id)
             
-            # Get all food banks
-            foodbanks = FoodBank.get_all()
-            active_foodbanks = [fb for fb in foodbanks if fb.is_active]
-            
-            # Find next food bank that hasn't been notified
+            # Find next closest food bank that hasn't been notified
             notified_ids = alert.notified_foodbanks or []
-            available_foodbanks = [fb for fb in active_foodbanks if fb.id not in notified_ids]
+            next_foodbank, distance = self._select_foodbank(
+                restaurant, exclude_ids=notified_ids, quantity=alert.total_quantity
+            )
             
-            if not available_foodbanks:
+            if not next_foodbank:
                 # No more food banks available, mark as expired
-                alert.update({'status': FoodAlert.STATUSES['EXPIRED']})
-                logging.warning(f"Alert {alert_id} expired - no more food banks available")
+                if run_transaction(lambda transaction: self._expire_alert(transaction, alert_id)):
+                    logging.warning(f"Alert {alert_id} expired - no more food banks available")
                 return
             
-            # Use distance-based selection if restaurant address is available
-            if restaurant and restaurant.address:
-                foodbanks_with_address = [fb for fb in available_foodbanks if fb.address]
-                if foodbanks_with_address:
-                    # Find nearest available food banks
-                    nearest_foodbanks = geocoding_service.find_nearest_foodbanks(
-                        restaurant.address, 
-                        foodbanks_with_address, 
-                        max_results=len(foodbanks_with_address)
-                    )
-                    if nearest_foodbanks:
-                        next_foodbank, distance = nearest_foodbanks[0]
-                        logging.info(f"Selected next closest food bank {next_foodbank.id} at {distance:.2f} km distance")
-                    else:
-                        next_foodbank = available_foodbanks[0]
-                else:
-                    next_foodbank = available_foodbanks[0]
-            else:
-                # Fallback to first available
-                next_foodbank = available_foodbanks[0]
+            if distance is not None:
+                logging.info(f"Selected next food bank {next_foodbank.id} at {distance:.2f} km distance")
             
             # Enrich alert with restaurant details
-            alert_dict = alert.to_dict()
-            if alert.restaurant_id:
-                restaurant = Restaurant.get_by_id(alert.restaurant_id)
-                if restaurant:
-                    alert_dict['restaurant_name'] = restaurant.name
-                    alert_dict['restaurant_address'] = restaurant.address
-                    alert_dict['restaurant_phone'] = restaurant.phone
-                    alert_dict['restaurant_email'] = restaurant.email
+            alert_dict = enrich_alert(alert, ('restaurant',), known=[restaurant] if restaurant else None)
             
             # Notify next food bank
             notification_data = {
@@ -197,12 +298,14 @@ class NotificationService:
             )
             
             # Update alert
-            notified_list = alert.notified_foodbanks or []
-            notified_list.append(next_foodbank.id)
-            alert.update({'notified_foodbanks': notified_list})
+            deadline = self._next_escalation_deadline()
+            alert.update({
+                'notified_foodbanks': ArrayUnion([next_foodbank.id]),
+                'escalation_deadline': deadline
+            })
             
             # Start new escalation timer
-            self.start_escalation_timer(alert_id, next_foodbank.id)
+            self.start_escalation_timer(alert_id, next_foodbank.id, deadline)
             
             logging.info(f"Escalated alert {alert_id} to food bank {next_foodbank.id}")
             
@@ -210,59 +313,130 @@ class NotificationService:
             logging.error(f"Error escalating alert: {str(e)}")
     
     def notify_available_drivers(self, alert_id):
-        """Notify available drivers about delivery request"""
+        """
+        Send the delivery request to the nearest available drivers (raises on failure so the dispatch queue retries)
+        Later waves reach further out if nobody has taken the delivery
+        """
         try:
             alert = FoodAlert.get_by_id(alert_id)
             if not alert:
                 return
             
-            # Get available drivers
-            drivers = Driver.get_all()
-            available_drivers = [d for d in drivers if d.is_available and d.is_active]
+            # Drivers were already requested, or the alert moved on before this ran
+            if alert.status != FoodAlert.STATUSES['FOODBANK_ACCEPTED']:
+                return
             
-            if not available_drivers:
+            notified = self._notify_driver_wave(
+                alert, 0, {'status': FoodAlert.STATUSES['DRIVER_REQUESTED']}
+            )
+            if not notified:
                 logging.warning(f"No available drivers for alert {alert_id}")
                 return
             
-            # Enrich alert with restaurant details
-            alert_dict = alert.to_dict()
-            if alert.restaurant_id:
-                restaurant = Restaurant.get_by_id(alert.restaurant_id)
-                if restaurant:
-                    alert_dict['restaurant_name'] = restaurant.name
-                    alert_dict['restaurant_address'] = restaurant.address
-                    alert_dict['restaurant_phone'] = restaurant.phone
-                    alert_dict['restaurant_email'] = restaurant.email
+            logging.info(f"Notified {notified} drivers about alert {alert_id}")
             
-            notification_data = {
-                'alert_id': alert_id,
-                'alert': alert_dict,
-                'message': 'New delivery request available',
-                'estimated_duration': 30
-            }
+        except Exception as e:
+            logging.error(f"Error notifying drivers: {str(e)}")
+            raise
+    
+    def _widen_driver_search(self, alert_id, wave):
+        """Driver wave timer callback: reach the next ring of drivers if nobody took the delivery"""
+        try:
+            alert = FoodAlert.get_by_id(alert_id)
+            if not alert:
+                return
             
-            # Notify all available drivers
-            for driver in available_drivers:
-                self.socketio.emit(
-                    'delivery_request',
-                    notification_data,
-                    room=f'driver_{driver.id}'
-                )
+            if alert.status != FoodAlert.STATUSES['DRIVER_REQUESTED'] or alert.driver_id:
+                return
             
-            # Update alert status
-            alert.update({'status': FoodAlert.STATUSES['DRIVER_REQUESTED']})
+            notified = self._notify_driver_wave(alert, wave, {})
+            if not notified:
+                logging.warning(f"No more drivers to notify for alert {alert_id}")
+                return
             
-            logging.info(f"Notified {len(available_drivers)} drivers about alert {alert_id}")
+            logging.info(f"Widened driver search for alert {alert_id}: notified {notified} more drivers")
             
         except Exception as e:
-            logging.error(f"Error notifying drivers: {str(e)}")
+            logging.error(f"Error widening driver search: {str(e)}")
+    
+    def _notify_driver_wave(self, alert, first_wave, update_data):
+        """
+        Notify the closest not-yet-notified drivers, starting at first_wave and
+        skipping waves whose radius has nobody new. Saves update_data with the
+        notified drivers and arms the timer for the next wave.
+        Returns the number of drivers notified
+        """
+        restaurant = None
+        if alert.restaurant_id:
+            restaurant = Restaurant.get_by_id(alert.restaurant_id)
+        lat, lng = self._restaurant_location(restaurant)
+        notified_ids = alert.notified_drivers or []
+        
+        driver_ids = []
+        wave = first_wave
+        while wave < len(DRIVER_WAVE_RADII_KM) and not driver_ids:
+            driver_ids = self._pick_drivers(lat, lng, DRIVER_WAVE_RADII_KM[wave], notified_ids)
+            wave += 1
+        if not driver_ids:
+            return 0
+        
+        # Enrich alert with restaurant details
+        alert_dict = enrich_alert(alert, ('restaurant',), known=[restaurant] if restaurant else None)
+        
+        notification_data = {
+            'alert_id': alert.id,
+            'alert': alert_dict,
+            'message': 'New delivery request available',
+            'estimated_duration': 30
+        }
+        
+        # One emit to every driver's room encodes the payload once
+        self.socketio.emit(
+            'delivery_request',
+            notification_data,
+            room=[f'driver_{driver_id}' for driver_id in driver_ids]
+        )
+        
+        update_data['notified_drivers'] = ArrayUnion(driver_ids)
+        alert.update(update_data)
+        
+        if wave < len(DRIVER_WAVE_RADII_KM):
+            self.scheduler.schedule(
+                self._driver_wave_key(alert.id),
+                DRIVER_WAVE_INTERVAL_SECONDS,
+                self._widen_driver_search,
+                alert.id,
+                wave
+            )
+        return len(driver_ids)
+    
+    @staticmethod
+    def _pick_drivers(lat, lng, radius_km, exclude_ids):
+        """Up to DRIVER_WAVE_SIZE available drivers within radius_km (None = any distance)"""
+        if lat is None or lng is None:
+            # Nothing to rank by; any available drivers will do
+            return driver_locator.available(DRIVER_WAVE_SIZE, exclude_ids)
+        
+        nearest = driver_locator.nearest(
+            lat, lng, DRIVER_WAVE_SIZE, max_radius_km=radius_km, exclude_ids=exclude_ids
+        )
+        driver_ids = [driver_id for driver_id, _ in nearest]
+        if radius_km is None and len(driver_ids) < DRIVER_WAVE_SIZE:
+            # Last wave also reaches drivers who haven't reported a position
+            driver_ids += driver_locator.unplaced(DRIVER_WAVE_SIZE - len(driver_ids), exclude_ids)
+        return driver_ids
+    
+    @staticmethod
+    def _driver_wave_key(alert_id):
+        return f'driver_wave_{alert_id}'
+    
+    def cancel_driver_waves(self, alert_id):
+        """Stop widening the driver search once a driver is assigned"""
+        self.scheduler.cancel(self._driver_wave_key(alert_id))
     
     def cancel_escalation_timer(self, alert_id):
         """Cancel escalation timer when food bank accepts"""
-        if alert_id in self.active_timers:
-            # Note: We can't actually stop a sleeping thread, but we check alert status
-            # in the escalation function, so it will exit gracefully
-            del self.active_timers[alert_id]
+        if self.scheduler.cancel(self._escalation_key(alert_id)):
             logging.info(f"Cancelled escalation timer for alert {alert_id}")
     
     def notify_assigned_driver(self, alert_id, driver_id, delivery_request):
@@ -274,14 +448,7 @@ class NotificationService:
                 return
             
             # Enrich alert with restaurant details
-            alert_dict = alert.to_dict()
-            if alert.restaurant_id:
-                restaurant = Restaurant.get_by_id(alert.restaurant_id)
-                if restaurant:
-                    alert_dict['restaurant_name'] = restaurant.name
-                    alert_dict['restaurant_address'] = restaurant.address
-                    alert_dict['restaurant_phone'] = restaurant.phone
-                    alert_dict['restaurant_email'] = restaurant.email
+            alert_dict = enrich_alert(alert, ('restaurant',))
             
             notification_data = {
                 'alert_id': alert_id,
@@ -310,6 +477,8 @@ def init_notification_service(socketio):
     """Initialize the notification service with socketio instance"""
     global notification_service
     notification_service = NotificationService(socketio)
+    # Escalation timers are recovered once this worker holds the lease
+    notification_service.escalation_leader.start()
     return notification_service
 
 def get_notification_service():
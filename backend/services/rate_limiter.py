@@ -0,0 +1,76 @@
+"""
+Thread-safe rate limiters for calls to external providers
+"""
+import logging
+import os
+import time
+import threading
+from services import cooperative
+
+
+class RateLimiter:
+    """Spaces out calls so that at most `rate` of them start per second in this process"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until the caller may make its next call; green threads yield while waiting"""
+        if not self.interval:
+            return
+        wait = self._reserve()
+        if wait > 0:
+            cooperative.sleep(wait)
+
+    def _reserve(self):
+        """Claim the next free slot; returns the seconds until it starts"""
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        return wait
+
+
+class RedisRateLimiter(RateLimiter):
+    """
+    Spaces out calls across every worker sharing a Redis: the next free slot
+    is kept in Redis and claimed by a script timed with the Redis clock.
+    Falls back to limiting this process alone while Redis can't be reached.
+    """
+
+    RESERVE_SCRIPT = """
+        local time = redis.call('time')
+        local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+        local slot = math.max(now, tonumber(redis.call('get', KEYS[1]) or 0))
+        local next_slot = slot + tonumber(ARGV[1])
+        redis.call('set', KEYS[1], next_slot, 'px', next_slot - now + 1000)
+        return slot - now
+    """
+
+    def __init__(self, rate, url, key):
+        super().__init__(rate)
+        import redis  # Only needed when running several workers
+        self.key = key
+        self._redis = redis.Redis.from_url(url, socket_timeout=5)
+        self._reserve_script = self._redis.register_script(self.RESERVE_SCRIPT)
+
+    def _reserve(self):
+        interval_ms = max(1, round(self.interval * 1000))
+        try:
+            return int(self._reserve_script(keys=[self.key], args=[interval_ms])) / 1000
+        except Exception as e:
+            logging.warning(f"Shared rate limit {self.key} unavailable, limiting this worker only: {str(e)}")
+            return super()._reserve()
+
+
+def create_rate_limiter(rate, key):
+    """
+    Rate limiter shared through Redis when a Redis URL is configured
+    (RATE_LIMIT_REDIS_URL or the Socket.IO message queue), else per process
+    """
+    url = os.getenv('RATE_LIMIT_REDIS_URL') or os.getenv('SOCKETIO_MESSAGE_QUEUE', '')
+    if rate and rate > 0 and url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisRateLimiter(rate, url, key)
+    return RateLimiter(rate)
@@ -0,0 +1,121 @@
+"""
+Single background-task scheduler for delayed callbacks such as alert escalation
+"""
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+
+class TaskScheduler:
+    """
+    Keeps pending callbacks in a min-heap ordered by due time and runs them
+    from one Socket.IO background task. Scheduling is O(log n); cancelling
+    drops the entry so the callback never runs, and its heap slot is skipped
+    when it reaches the top.
+    """
+
+    def __init__(self, socketio, poll_interval=1.0):
+        self.socketio = socketio
+        self.poll_interval = poll_interval
+        self._heap = []     # (due_at, seq, key)
+        self._entries = {}  # key -> (due_at, seq, callback, args)
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._started = False
+        self._stopped = False
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def schedule(self, key, delay, callback, *args):
+        """Run callback(*args) after delay seconds, replacing any pending task with the same key"""
+        return self.schedule_at(key, time.time() + delay, callback, *args)
+
+    def schedule_at(self, key, due_at, callback, *args):
+        """Run callback(*args) at the given epoch time, replacing any pending task with the same key"""
+        with self._lock:
+            seq = next(self._seq)
+            self._entries[key] = (due_at, seq, callback, args)
+            heapq.heappush(self._heap, (due_at, seq, key))
+            self._compact()
+        self.start()
+        return due_at
+
+    def cancel(self, key):
+        """Cancel a pending task; returns True if one was pending"""
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def cancel_prefix(self, prefix):
+        """Cancel every pending task whose key starts with prefix; returns how many were pending"""
+        with self._lock:
+            keys = [key for key in self._entries if key.startswith(prefix)]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def due_at(self, key):
+        entry = self._entries.get(key)
+        return entry[0] if entry else None
+
+    def _compact(self):
+        """Rebuild the heap once cancelled or replaced slots dominate it"""
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._heap = [(due, seq, key) for key, (due, seq, _, _) in self._entries.items()]
+            heapq.heapify(self._heap)
+
+    def _pop_due(self, now):
+        """Remove and return every live entry that is due"""
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                _, seq, key = heapq.heappop(self._heap)
+                entry = self._entries.get(key)
+                if entry is not None and entry[1] == seq:
+                    del self._entries[key]
+                    due.append((key, entry[2], entry[3]))
+            next_due = self._heap[0][0] if self._heap else None
+        return due, next_due
+
+    def start(self):
+        """Start the scheduler loop once"""
+        if self._started:
+            return
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        self.socketio.start_background_task(self._run)
+
+    def stop(self):
+        self._stopped = True
+
+    def _run(self):
+        while not self._stopped:
+            due, next_due = self._pop_due(time.time())
+            for key, callback, args in due:
+                # Each callback runs in its own task so a slow one can't hold up the rest
+                self.socketio.start_background_task(self._fire, key, callback, args)
+
+            wait = self.poll_interval if next_due is None else next_due - time.time()
+            self.socketio.sleep(max(0.0, min(wait, self.poll_interval)))
+
+    @staticmethod
+    def _fire(key, callback, args):
+        try:
+            callback(*args)
+        except Exception as e:
+            logging.error(f"Scheduled task {key} failed: {str(e)}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pending': len(self._entries),
+                'heap_size': len(self._heap),
+                'next_due_in_seconds': round(self._heap[0][0] - time.time(), 3) if self._heap else None
+            }
@@ -0,0 +1,152 @@
+"""
+In-memory grid index over latitude/longitude points for radius and k-nearest queries
+"""
+import math
+import threading
+from services.haversine import distances_from
+
+KM_PER_DEGREE = 111.195  # Length of one degree of latitude
+HALF_EARTH_CIRCUMFERENCE_KM = 20038
+
+
+class SpatialIndex:
+    """
+    Buckets points into fixed-size lat/lng cells so a query only has to
+    look at the cells overlapping its search radius.
+    """
+
+    def __init__(self, cell_size_deg=0.1):
+        self.cell_size = cell_size_deg
+        self._columns = int(math.ceil(360 / cell_size_deg))
+        self._cells = {}   # (row, col) -> {item_id: (lat, lng)}
+        self._points = {}  # item_id -> (lat, lng, cell)
+        self._items = {}   # item_id -> item
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._points)
+
+    def __contains__(self, item_id):
+        return item_id in self._points
+
+    def _cell_of(self, lat, lng):
+        row = int(math.floor(lat / self.cell_size))
+        col = int(math.floor((lng + 180) / self.cell_size)) % self._columns
+        return row, col
+
+    def upsert(self, item_id, lat, lng, item=None):
+        """Add a point or move it to new coordinates"""
+        cell = self._cell_of(lat, lng)
+        with self._lock:
+            self._discard(item_id)
+            self._cells.setdefault(cell, {})[item_id] = (lat, lng)
+            self._points[item_id] = (lat, lng, cell)
+            self._items[item_id] = item if item is not None else item_id
+
+    def remove(self, item_id):
+        """Drop a point; unknown IDs are ignored"""
+        with self._lock:
+            self._discard(item_id)
+
+    def _discard(self, item_id):
+        point = self._points.pop(item_id, None)
+        if point is None:
+            return
+        self._items.pop(item_id, None)
+        bucket = self._cells.get(point[2])
+        if bucket is not None:
+            bucket.pop(item_id, None)
+            if not bucket:
+                del self._cells[point[2]]
+
+    def clear(self):
+        with self._lock:
+            self._cells.clear()
+            self._points.clear()
+            self._items.clear()
+
+    def get(self, item_id):
+        return self._items.get(item_id)
+
+    def _candidate_cells(self, lat, lng, radius_km):
+        """Cells overlapping the bounding box of a search circle"""
+        lat_span = radius_km / KM_PER_DEGREE
+        min_row = int(math.floor((lat - lat_span) / self.cell_size))
+        max_row = int(math.floor((lat + lat_span) / self.cell_size))
+
+        # Longitude degrees shrink towards the poles; scan whole rows there
+        max_abs_lat = min(abs(lat) + lat_span, 90)
+        cos_lat = math.cos(math.radians(max_abs_lat))
+        if cos_lat < 1e-6 or radius_km / (KM_PER_DEGREE * cos_lat) >= 180:
+            col_range = None
+        else:
+            lng_span = radius_km / (KM_PER_DEGREE * cos_lat)
+            min_col = int(math.floor((lng - lng_span + 180) / self.cell_size))
+            max_col = int(math.floor((lng + lng_span + 180) / self.cell_size))
+            col_range = (min_col, max_col)
+
+        box_cells = (max_row - min_row + 1) * (
+            self._columns if col_range is None else col_range[1] - col_range[0] + 1
+        )
+
+        # Large boxes over a sparse grid: filter the occupied cells instead
+        if box_cells > len(self._cells):
+            for cell in list(self._cells):
+                if not min_row <= cell[0] <= max_row:
+                    continue
+                if col_range is not None and \
+                        (cell[1] - col_range[0]) % self._columns > col_range[1] - col_range[0]:
+                    continue
+                yield cell
+            return
+
+        for row in range(min_row, max_row + 1):
+            if col_range is None:
+                cols = range(self._columns)
+            else:
+                cols = (c % self._columns for c in range(col_range[0], col_range[1] + 1))
+            for col in cols:
+                if (row, col) in self._cells:
+                    yield row, col
+
+    def within_radius(self, lat, lng, radius_km, exclude_ids=None, limit=None):
+        """
+        Find points within radius_km of (lat, lng)
+        Returns list of (item, distance_km) tuples, sorted by distance
+        """
+        exclude_ids = set(exclude_ids) if exclude_ids else ()
+        ids, lats, lngs = [], [], []
+        with self._lock:
+            for cell in self._candidate_cells(lat, lng, radius_km):
+                for item_id, (p_lat, p_lng) in self._cells[cell].items():
+                    if item_id not in exclude_ids:
+                        ids.append(item_id)
+                        lats.append(p_lat)
+                        lngs.append(p_lng)
+            if not ids:
+                return []
+
+            # Score every candidate in one vectorized call
+            distances = distances_from(lat, lng, lats, lngs)
+            inside = (distances <= radius_km).nonzero()[0]
+            order = inside[distances[inside].argsort(kind='stable')]
+            if limit is not None:
+                order = order[:limit]
+            return [(self._items[ids[i]], float(distances[i])) for i in order]
+
+    def nearest(self, lat, lng, k=1, max_radius_km=None, exclude_ids=None):
+        """
+        Find the k points closest to (lat, lng)
+        Grows the search radius until k points are inside it, so the result is exact.
+        Returns list of (item, distance_km) tuples, sorted by distance
+        """
+        if k <= 0 or not self._points:
+            return []
+
+        ceiling = min(max_radius_km or HALF_EARTH_CIRCUMFERENCE_KM, HALF_EARTH_CIRCUMFERENCE_KM)
+        radius = min(self.cell_size * KM_PER_DEGREE, ceiling)
+        while True:
+            results = self.within_radius(lat, lng, radius, exclude_ids=exclude_ids)
+            if len(results) >= k or radius >= ceiling:
+                return results[:k]
+            radius = min(radius * 2, ceiling)
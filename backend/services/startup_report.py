@@ -0,0 +1,100 @@
+"""
+Startup timing: how long each phase of create_app takes and how long a
+worker takes from process start to its first served request
+"""
+import logging
+import os
+import sys
+import threading
+import time
+
+# Modules that should only load when first used; the report lists any already imported
+DEFERRED_MODULES = ('firebase_admin', 'google.cloud.firestore', 'grpc', 'geopy')
+
+
+def _process_age():
+    """Seconds since this process started, from /proc; None where that isn't available"""
+    try:
+        with open('/proc/self/stat') as f:
+            # Field 22 (starttime) is in clock ticks since boot; the command name may contain spaces
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        return uptime - start_ticks / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class StartupTimer:
+    """
+    Records named phases of app startup and the first request
+
+        startup_timer.begin()
+        ...
+        startup_timer.mark('blueprints')
+        ...
+        startup_timer.finish()
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._phases = []  # (name, seconds)
+        self._began = None
+        self._last = None
+        self._process_started_ago = None  # process age when begin() ran
+        self._ready_after = None
+        self._first_request_after = None
+
+    def begin(self):
+        now = time.perf_counter()
+        self._began = self._last = now
+        self._process_started_ago = _process_age()
+        self._phases = []
+        self._ready_after = self._first_request_after = None
+
+    def mark(self, phase):
+        """Close a phase: the time since the previous mark (or begin) is charged to it"""
+        now = time.perf_counter()
+        if self._last is not None:
+            self._phases.append((phase, now - self._last))
+        self._last = now
+
+    def _since_process_start(self):
+        """Seconds from process start to now; from begin() when the process start is unknown"""
+        elapsed = time.perf_counter() - self._began
+        return elapsed + (self._process_started_ago or 0.0)
+
+    def finish(self):
+        """App is built; log the report"""
+        self._ready_after = self._since_process_start()
+        logging.info(self.summary())
+
+    def first_request(self):
+        """Called on each request until the first is recorded; later calls are no-ops"""
+        if self._first_request_after is not None or self._began is None:
+            return
+        with self._lock:
+            if self._first_request_after is None:
+                self._first_request_after = self._since_process_start()
+                logging.info(f"First request {self._first_request_after * 1000:.0f}ms after process start")
+
+    def summary(self):
+        phases = ', '.join(f'{name} {seconds * 1000:.0f}ms' for name, seconds in self._phases)
+        return f"App ready {self._ready_after * 1000:.0f}ms after process start ({phases})"
+
+    def stats(self):
+        def ms(seconds):
+            return round(seconds * 1000, 1) if seconds is not None else None
+
+        return {
+            'process_start_known': self._process_started_ago is not None,
+            'before_create_app_ms': ms(self._process_started_ago),
+            'phases_ms': {name: ms(seconds) for name, seconds in self._phases},
+            'ready_ms': ms(self._ready_after),
+            'first_request_ms': ms(self._first_request_after),
+            'deferred_modules_loaded': [name for name in DEFERRED_MODULES if name in sys.modules]
+        }
+
+
+# Global startup timer instance
+startup_timer = StartupTimer()
@@ -0,0 +1,42 @@
+"""
+Storage backends for the models: Firestore in production, SQLite for local runs
+Selected with STORAGE_BACKEND (firestore or sqlite); SQLITE_PATH sets the database file.
+"""
+import os
+import threading
+from storage.base import (
+    StorageBackend, WriteBatch, Transaction, Watch, DocumentNotFound,
+    FieldTransform, ArrayUnion, ArrayRemove, Increment
+)
+
+DEFAULT_SQLITE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'ideavolution.sqlite3')
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def create_backend(name: str = None) -> StorageBackend:
+    name = (name or os.getenv('STORAGE_BACKEND', 'firestore')).lower()
+    if name == 'firestore':
+        from storage.firestore_backend import FirestoreBackend
+        return FirestoreBackend()
+    if name == 'sqlite':
+        from storage.sqlite_backend import SQLiteBackend
+        return SQLiteBackend(os.getenv('SQLITE_PATH', DEFAULT_SQLITE_PATH))
+    raise ValueError(f'Unknown STORAGE_BACKEND: {name}')
+
+
+def get_backend() -> StorageBackend:
+    """The process-wide backend, created on first use"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_backend()
+    return _backend
+
+
+def set_backend(backend: StorageBackend):
+    """Swap the process-wide backend (tests, benchmarks, scripts)"""
+    global _backend
+    _backend = backend
@@ -0,0 +1,166 @@
+"""
+Storage backend interface used by BaseModel
+"""
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+class DocumentNotFound(Exception):
+    """Raised when updating a document that does not exist"""
+
+
+class FieldTransform(ABC):
+    """
+    Update value the backend resolves against the stored field at write time,
+    so concurrent writers don't overwrite each other's changes
+    """
+
+    @abstractmethod
+    def apply(self, current: Any) -> Any:
+        """The field's new value given its current one (None if unset)"""
+
+
+class ArrayUnion(FieldTransform):
+    """Append values not already in the array"""
+
+    def __init__(self, values: Iterable):
+        self.values = list(values)
+
+    def apply(self, current):
+        result = list(current) if isinstance(current, list) else []
+        for value in self.values:
+            if value not in result:
+                result.append(value)
+        return result
+
+
+class ArrayRemove(FieldTransform):
+    """Remove every occurrence of the values from the array"""
+
+    def __init__(self, values: Iterable):
+        self.values = list(values)
+
+    def apply(self, current):
+        if not isinstance(current, list):
+            return []
+        return [value for value in current if value not in self.values]
+
+
+class Increment(FieldTransform):
+    """Add to a number; a missing field counts as 0"""
+
+    def __init__(self, amount=1):
+        self.amount = amount
+
+    def apply(self, current):
+        if not isinstance(current, (int, float)) or isinstance(current, bool):
+            current = 0
+        return current + self.amount
+
+
+class WriteBatch(ABC):
+    """Writes collected and committed together; either all apply or none do"""
+
+    @abstractmethod
+    def create(self, collection: str, doc_id: str, data: Dict):
+        ...
+
+    @abstractmethod
+    def update(self, collection: str, doc_id: str, data: Dict):
+        ...
+
+    @abstractmethod
+    def delete(self, collection: str, doc_id: str):
+        ...
+
+    @abstractmethod
+    def commit(self):
+        ...
+
+
+class Transaction(WriteBatch):
+    """
+    Reads and buffered writes that commit atomically. All reads must come
+    before the first write; the writes are committed by the backend once the
+    transaction function returns.
+    """
+
+    @abstractmethod
+    def get(self, collection: str, doc_id: str) -> Optional[Dict]:
+        ...
+
+    def commit(self):
+        raise RuntimeError('Transactions are committed by StorageBackend.run_transaction')
+
+
+class Watch(ABC):
+    """A change feed opened with StorageBackend.watch"""
+
+    @property
+    @abstractmethod
+    def is_active(self) -> bool:
+        """False once the feed has stopped delivering changes (unsubscribed or failed)"""
+
+    @abstractmethod
+    def unsubscribe(self):
+        ...
+
+
+class StorageBackend(ABC):
+    """
+    Document store operations BaseModel is built on.
+    Documents are plain dicts; update values may be FieldTransforms. Queries are described by an object with
+    filters [(field, op, value)], orders [(field, descending)], fields,
+    cursor (values of the order fields to start after) and max_results.
+    """
+
+    @abstractmethod
+    def new_id(self, collection: str) -> str:
+        ...
+
+    @abstractmethod
+    def create(self, collection: str, doc_id: str, data: Dict):
+        ...
+
+    @abstractmethod
+    def get(self, collection: str, doc_id: str) -> Optional[Dict]:
+        ...
+
+    @abstractmethod
+    def get_many(self, collection: str, doc_ids: Iterable[str]) -> Dict[str, Dict]:
+        ...
+
+    @abstractmethod
+    def stream(self, collection: str, query) -> Iterator[Dict]:
+        ...
+
+    @abstractmethod
+    def update(self, collection: str, doc_id: str, data: Dict):
+        ...
+
+    @abstractmethod
+    def delete(self, collection: str, doc_id: str):
+        ...
+
+    @abstractmethod
+    def batch(self) -> WriteBatch:
+        ...
+
+    @abstractmethod
+    def run_transaction(self, func: Callable[[Transaction], Any]) -> Any:
+        """
+        Call func(transaction) and commit its writes atomically, returning func's result.
+        func may be called again if a concurrent write touched what it read.
+        """
+
+    @abstractmethod
+    def watch(self, collection: str, query, callback: Callable[[List[Tuple[str, Optional[Dict]]], Any], None]) -> Watch:
+        """
+        Follow the documents matching query's filters. callback(changes, read_time) first
+        gets every match, then the changes of each commit, in commit order. changes is a
+        list of (doc_id, data), with data None when the document was deleted or no longer
+        matches; read_time is when the changes were committed (aware UTC datetime).
+        """
+
+    def ensure_collection(self, collection: str, indexed_fields: Iterable[str]):
+        """Prepare a collection before first use (no-op where indexes are managed elsewhere)"""
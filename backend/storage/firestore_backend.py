@@ -0,0 +1,159 @@
+"""
+Firestore storage backend
+"""
+from storage.base import StorageBackend, WriteBatch, Transaction, Watch, ArrayUnion, ArrayRemove, Increment
+
+GET_MANY_CHUNK_SIZE = 300  # Documents per batched read
+TRANSACTION_MAX_ATTEMPTS = 5  # Firestore retries a transaction when documents it read change
+
+
+def _to_firestore(data):
+    """Swap field transforms for the Firestore sentinels that apply them server-side"""
+    from google.cloud import firestore
+    converted = {}
+    for field, value in data.items():
+        if isinstance(value, ArrayUnion):
+            value = firestore.ArrayUnion(value.values)
+        elif isinstance(value, ArrayRemove):
+            value = firestore.ArrayRemove(value.values)
+        elif isinstance(value, Increment):
+            value = firestore.Increment(value.amount)
+        converted[field] = value
+    return converted
+
+
+def _with_id(snapshot):
+    data = snapshot.to_dict()
+    data.setdefault('id', snapshot.id)
+    return data
+
+
+class FirestoreWriteBatch(WriteBatch):
+    def __init__(self, client, batch=None):
+        self._client = client
+        self._batch = batch if batch is not None else client.batch()
+
+    def _ref(self, collection, doc_id):
+        return self._client.collection(collection).document(doc_id)
+
+    def create(self, collection, doc_id, data):
+        self._batch.set(self._ref(collection, doc_id), _to_firestore(data))
+
+    def update(self, collection, doc_id, data):
+        self._batch.update(self._ref(collection, doc_id), _to_firestore(data))
+
+    def delete(self, collection, doc_id):
+        self._batch.delete(self._ref(collection, doc_id))
+
+    def commit(self):
+        self._batch.commit()
+
+
+class FirestoreTransaction(FirestoreWriteBatch, Transaction):
+    """Writes are buffered on the Firestore transaction and sent in its commit"""
+
+    def get(self, collection, doc_id):
+        snapshot = next(iter(self._batch.get(self._ref(collection, doc_id))), None)
+        return snapshot.to_dict() if snapshot is not None and snapshot.exists else None
+
+    def commit(self):
+        Transaction.commit(self)
+
+
+class FirestoreWatch(Watch):
+    """An on_snapshot listener; the client retries transient stream errors itself"""
+
+    def __init__(self, listener):
+        self._listener = listener
+
+    @property
+    def is_active(self):
+        return self._listener.is_active
+
+    def unsubscribe(self):
+        self._listener.unsubscribe()
+
+
+class FirestoreBackend(StorageBackend):
+    """Stores documents in Cloud Firestore; the client is created on first use"""
+
+    def __init__(self, client=None):
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            from config.firebase_config import FirebaseConfig
+            self._client = FirebaseConfig.get_db()
+        return self._client
+
+    def _collection(self, collection):
+        return self.client.collection(collection)
+
+    def new_id(self, collection):
+        return self._collection(collection).document().id
+
+    def create(self, collection, doc_id, data):
+        self._collection(collection).document(doc_id).set(_to_firestore(data))
+
+    def get(self, collection, doc_id):
+        doc = self._collection(collection).document(doc_id).get()
+        return doc.to_dict() if doc.exists else None
+
+    def get_many(self, collection, doc_ids):
+        doc_ids = list(doc_ids)
+        ref = self._collection(collection)
+        found = {}
+        for start in range(0, len(doc_ids), GET_MANY_CHUNK_SIZE):
+            refs = [ref.document(doc_id) for doc_id in doc_ids[start:start + GET_MANY_CHUNK_SIZE]]
+            for doc in self.client.get_all(refs):
+                if doc.exists:
+                    found[doc.id] = doc.to_dict()
+        return found
+
+    def _query(self, collection, query):
+        firestore_query = self._collection(collection)
+        for field, op, value in query.filters:
+            firestore_query = firestore_query.where(field, op, value)
+        for field, descending in query.orders:
+            firestore_query = firestore_query.order_by(
+                field, direction='DESCENDING' if descending else 'ASCENDING'
+            )
+        if query.fields is not None:
+            firestore_query = firestore_query.select(query.fields)
+        if query.cursor is not None:
+            firestore_query = firestore_query.start_after(query.cursor)
+        if query.max_results is not None:
+            firestore_query = firestore_query.limit(query.max_results)
+        return firestore_query
+
+    def stream(self, collection, query):
+        for doc in self._query(collection, query).stream():
+            yield _with_id(doc)
+
+    def watch(self, collection, query, callback):
+        def on_snapshot(documents, changes, read_time):
+            callback([
+                (change.document.id, None if change.type.name == 'REMOVED' else _with_id(change.document))
+                for change in changes
+            ], read_time)
+
+        return FirestoreWatch(self._query(collection, query).on_snapshot(on_snapshot))
+
+    def update(self, collection, doc_id, data):
+        self._collection(collection).document(doc_id).update(_to_firestore(data))
+
+    def delete(self, collection, doc_id):
+        self._collection(collection).document(doc_id).delete()
+
+    def batch(self):
+        return FirestoreWriteBatch(self.client)
+
+    def run_transaction(self, func):
+        from google.cloud import firestore
+
+        @firestore.transactional
+        def run(transaction):
+            return func(FirestoreTransaction(self.client, transaction))
+
+        return run(self.client.transaction(max_attempts=TRANSACTION_MAX_ATTEMPTS))
@@ -0,0 +1,425 @@
+"""
+SQLite storage backend for local development and tests
+"""
+import json
+import logging
+import secrets
+import sqlite3
+import string
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from storage.base import StorageBackend, WriteBatch, Transaction, Watch, DocumentNotFound, FieldTransform
+
+ID_ALPHABET = string.ascii_letters + string.digits
+ID_LENGTH = 20  # Same shape as Firestore auto-IDs
+GET_MANY_CHUNK_SIZE = 500  # Stays under SQLite's bound-parameter limit
+DATETIMES_KEY = '__datetimes__'  # Paths of datetime values inside a stored document
+
+COMPARISON_OPERATORS = {'==': '=', '!=': '!=', '<': '<', '<=': '<=', '>': '>', '>=': '>='}
+
+
+def _quote(identifier):
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _json_path(field):
+    return '$.' + '.'.join('"' + part.replace('"', '') + '"' for part in field.split('.'))
+
+
+def _encode_datetime(value):
+    """Fixed-width UTC text, so string order matches time order; naive values are UTC as in Firestore"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+def _decode_datetime(value):
+    return datetime.strptime(value, '%Y-%m-%dT%H:%M:%S.%fZ').replace(tzinfo=timezone.utc)
+
+
+def _encode_value(value):
+    return _encode_datetime(value) if isinstance(value, datetime) else value
+
+
+def _encode_document(data):
+    """JSON text for a document, recording where datetimes were so they come back as datetimes"""
+    paths = []
+
+    def encode(value, path):
+        if isinstance(value, datetime):
+            paths.append(path)
+            return _encode_datetime(value)
+        if isinstance(value, dict):
+            return {key: encode(item, path + [key]) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [_encode_datetime(item) if isinstance(item, datetime) else item for item in value]
+        return value
+
+    encoded = encode(data, [])
+    if paths:
+        encoded[DATETIMES_KEY] = paths
+    return json.dumps(encoded)
+
+
+def _decode_document(text):
+    data = json.loads(text)
+    for path in data.pop(DATETIMES_KEY, []):
+        parent = data
+        for key in path[:-1]:
+            parent = parent.get(key) if isinstance(parent, dict) else None
+        if isinstance(parent, dict) and isinstance(parent.get(path[-1]), str):
+            parent[path[-1]] = _decode_datetime(parent[path[-1]])
+    return data
+
+
+def _apply_update(data, fields):
+    """Merge update fields into a document; dotted keys address nested maps like Firestore"""
+    for field, value in fields.items():
+        parent = data
+        parts = field.split('.')
+        for part in parts[:-1]:
+            if not isinstance(parent.get(part), dict):
+                parent[part] = {}
+            parent = parent[part]
+        if isinstance(value, FieldTransform):
+            value = value.apply(parent.get(parts[-1]))
+        parent[parts[-1]] = value
+    return data
+
+
+def _resolve_transforms(data):
+    """Field transforms in a new document apply to an unset field"""
+    return {
+        field: value.apply(None) if isinstance(value, FieldTransform) else value
+        for field, value in data.items()
+    }
+
+
+class SQLiteWriteBatch(WriteBatch):
+    def __init__(self, backend):
+        self._backend = backend
+        self._writes = []
+
+    def create(self, collection, doc_id, data):
+        self._writes.append(('create', collection, doc_id, data))
+
+    def update(self, collection, doc_id, data):
+        self._writes.append(('update', collection, doc_id, data))
+
+    def delete(self, collection, doc_id):
+        self._writes.append(('delete', collection, doc_id, None))
+
+    def commit(self):
+        self._backend._apply_writes(self._writes)
+        self._writes = []
+
+
+class SQLiteTransaction(SQLiteWriteBatch, Transaction):
+    """Runs inside BEGIN IMMEDIATE, so reads already hold the write lock and can't go stale"""
+
+    def get(self, collection, doc_id):
+        return self._backend.get(collection, doc_id)
+
+    def commit(self):
+        Transaction.commit(self)
+
+
+class SQLiteWatch(Watch):
+    """
+    Change feed for writes committed through this backend (not other processes).
+    Changes are queued under the backend lock, so they keep commit order, and
+    delivered by whichever thread wrote them once the lock is released; a
+    callback that writes gets its own changes after it returns.
+    """
+
+    def __init__(self, backend, collection, query, callback):
+        self._backend = backend
+        self.collection = collection
+        self.query = query
+        self._callback = callback
+        self._pending = deque()  # (changes, read_time)
+        self._delivering = threading.Lock()
+        self._active = True
+
+    @property
+    def is_active(self):
+        return self._active
+
+    def unsubscribe(self):
+        self._active = False
+        self._backend._unwatch(self)
+
+    def _deliver(self):
+        while self._pending and self._active:
+            if not self._delivering.acquire(blocking=False):
+                return  # The thread delivering now picks these up too
+            try:
+                while self._pending and self._active:
+                    changes, read_time = self._pending.popleft()
+                    try:
+                        self._callback(changes, read_time)
+                    except Exception as e:
+                        logging.error(f"Error handling changes to {self.collection}: {str(e)}")
+            finally:
+                self._delivering.release()
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    Keeps each collection in its own table of (id, JSON document).
+    Fields listed by the model get expression indexes, so equality filters
+    on status and foreign keys are index lookups ordered by id.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if path != ':memory:':
+            self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._lock = threading.RLock()
+        self._indexed = {}  # collection -> fields with an index
+        self._watches = {}  # collection -> [SQLiteWatch]
+
+    def ensure_collection(self, collection, indexed_fields=()):
+        indexed = self._indexed.get(collection)
+        if indexed is not None and indexed.issuperset(indexed_fields):
+            return
+        with self._lock:
+            table = _quote(collection)
+            # WITHOUT ROWID keeps id in every index entry, so "field = ? ORDER BY id" needs no sort
+            self._conn.execute(
+                f'CREATE TABLE IF NOT EXISTS {table} (id TEXT PRIMARY KEY, data TEXT NOT NULL) WITHOUT ROWID'
+            )
+            indexed = self._indexed.setdefault(collection, set())
+            for field in indexed_fields:
+                if field in indexed:
+                    continue
+                index = _quote(f'idx_{collection}_{field}')
+                self._conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS {index} ON {table} (json_extract(data, '{_json_path(field)}'))"
+                )
+                indexed.add(field)
+
+    def new_id(self, collection):
+        return ''.join(secrets.choice(ID_ALPHABET) for _ in range(ID_LENGTH))
+
+    def create(self, collection, doc_id, data):
+        self._apply_writes([('create', collection, doc_id, data)])
+
+    def get(self, collection, doc_id):
+        self.ensure_collection(collection)
+        with self._lock:
+            row = self._conn.execute(
+                f'SELECT data FROM {_quote(collection)} WHERE id = ?', (doc_id,)
+            ).fetchone()
+        return _decode_document(row[0]) if row else None
+
+    def get_many(self, collection, doc_ids):
+        self.ensure_collection(collection)
+        doc_ids = list(doc_ids)
+        found = {}
+        for start in range(0, len(doc_ids), GET_MANY_CHUNK_SIZE):
+            chunk = doc_ids[start:start + GET_MANY_CHUNK_SIZE]
+            placeholders = ','.join('?' * len(chunk))
+            with self._lock:
+                rows = self._conn.execute(
+                    f'SELECT id, data FROM {_quote(collection)} WHERE id IN ({placeholders})', chunk
+                ).fetchall()
+            for doc_id, text in rows:
+                found[doc_id] = _decode_document(text)
+        return found
+
+    def update(self, collection, doc_id, data):
+        self._apply_writes([('update', collection, doc_id, data)])
+
+    def delete(self, collection, doc_id):
+        self._apply_writes([('delete', collection, doc_id, None)])
+
+    def batch(self):
+        return SQLiteWriteBatch(self)
+
+    def run_transaction(self, func):
+        # The connection lock keeps other threads out and BEGIN IMMEDIATE keeps other
+        # processes out, so func never needs to be retried
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                transaction = SQLiteTransaction(self)
+                result = func(transaction)
+                self._write(transaction._writes)
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+            watches = self._queue_changes(transaction._writes)
+        self._deliver(watches)
+        return result
+
+    def _apply_writes(self, writes):
+        """Apply writes in one transaction; an update of a missing document rolls back all of them"""
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                self._write(writes)
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+            watches = self._queue_changes(writes)
+        self._deliver(watches)
+
+    def _write(self, writes):
+        for kind, collection, doc_id, data in writes:
+            self.ensure_collection(collection)
+            table = _quote(collection)
+            if kind == 'create':
+                self._conn.execute(
+                    f'INSERT OR REPLACE INTO {table} (id, data) VALUES (?, ?)',
+                    (doc_id, _encode_document(_resolve_transforms(data)))
+                )
+            elif kind == 'update':
+                row = self._conn.execute(f'SELECT data FROM {table} WHERE id = ?', (doc_id,)).fetchone()
+                if row is None:
+                    raise DocumentNotFound(f'{collection}/{doc_id}')
+                document = _apply_update(_decode_document(row[0]), data)
+                self._conn.execute(
+                    f'UPDATE {table} SET data = ? WHERE id = ?', (_encode_document(document), doc_id)
+                )
+            else:
+                self._conn.execute(f'DELETE FROM {table} WHERE id = ?', (doc_id,))
+
+    def watch(self, collection, query, callback):
+        self.ensure_collection(collection)
+        watch = SQLiteWatch(self, collection, query, callback)
+        with self._lock:
+            snapshot = [(data['id'], data) for data in self.stream(collection, query)]
+            watch._pending.append((snapshot, datetime.now(timezone.utc)))
+            self._watches.setdefault(collection, []).append(watch)
+        watch._deliver()
+        return watch
+
+    def _unwatch(self, watch):
+        with self._lock:
+            watches = self._watches.get(watch.collection, [])
+            if watch in watches:
+                watches.remove(watch)
+
+    def _queue_changes(self, writes):
+        """Queue the documents just committed for the watches on their collections; call holding the lock"""
+        if not self._watches:
+            return []
+        written = {}  # collection -> doc IDs in write order
+        for _, collection, doc_id, _ in writes:
+            if self._watches.get(collection):
+                written.setdefault(collection, {})[doc_id] = None
+        read_time = datetime.now(timezone.utc)
+        watches = []
+        for collection, doc_ids in written.items():
+            for watch in self._watches[collection]:
+                matching = self._matching(collection, list(doc_ids), watch.query)
+                watch._pending.append(([(doc_id, matching.get(doc_id)) for doc_id in doc_ids], read_time))
+                watches.append(watch)
+        return watches
+
+    def _matching(self, collection, doc_ids, query):
+        """The documents among doc_ids that pass query's filters, keyed by ID"""
+        clauses, params = [], []
+        for field, op, value in query.filters:
+            clause, values = self._filter_clause(field, op, value)
+            clauses.append(clause)
+            params.extend(values)
+        found = {}
+        for start in range(0, len(doc_ids), GET_MANY_CHUNK_SIZE):
+            chunk = doc_ids[start:start + GET_MANY_CHUNK_SIZE]
+            sql = f'SELECT id, data FROM {_quote(collection)} WHERE id IN ({",".join("?" * len(chunk))})'
+            if clauses:
+                sql += ' AND ' + ' AND '.join(clauses)
+            for doc_id, text in self._conn.execute(sql, chunk + params).fetchall():
+                data = _decode_document(text)
+                data.setdefault('id', doc_id)
+                found[doc_id] = data
+        return found
+
+    @staticmethod
+    def _deliver(watches):
+        for watch in watches:
+            watch._deliver()
+
+    @staticmethod
+    def _column(field):
+        if field == 'id':
+            return 'id'
+        return f"json_extract(data, '{_json_path(field)}')"
+
+    def _filter_clause(self, field, op, value):
+        column = self._column(field)
+        if op in ('==', '!=') and value is None:
+            return f'{column} IS {"NOT " if op == "!=" else ""}NULL', []
+        if op in COMPARISON_OPERATORS:
+            return f'{column} {COMPARISON_OPERATORS[op]} ?', [_encode_value(value)]
+        if op in ('in', 'not-in'):
+            values = [_encode_value(item) for item in value]
+            placeholders = ','.join('?' * len(values))
+            negate = 'NOT ' if op == 'not-in' else ''
+            return f'{column} {negate}IN ({placeholders})', values
+        if op in ('array_contains', 'array_contains_any'):
+            values = [value] if op == 'array_contains' else list(value)
+            placeholders = ','.join('?' * len(values))
+            return (
+                f"EXISTS (SELECT 1 FROM json_each(data, '{_json_path(field)}') WHERE value IN ({placeholders}))",
+                [_encode_value(item) for item in values]
+            )
+        raise ValueError(f'Unsupported filter operator: {op}')
+
+    def _cursor_clause(self, orders, cursor):
+        """Rows strictly after the cursor in the (field, direction) ordering"""
+        clauses, params = [], []
+        for position, (field, descending) in enumerate(orders):
+            if field not in cursor:
+                break
+            parts = []
+            for prior_field, _ in orders[:position]:
+                parts.append(f'{self._column(prior_field)} = ?')
+                params.append(_encode_value(cursor[prior_field]))
+            parts.append(f'{self._column(field)} {"<" if descending else ">"} ?')
+            params.append(_encode_value(cursor[field]))
+            clauses.append('(' + ' AND '.join(parts) + ')')
+        return '(' + ' OR '.join(clauses) + ')' if clauses else None, params
+
+    def stream(self, collection, query):
+        self.ensure_collection(collection)
+        clauses, params = [], []
+        for field, op, value in query.filters:
+            clause, values = self._filter_clause(field, op, value)
+            clauses.append(clause)
+            params.extend(values)
+
+        orders = list(query.orders)
+        if query.cursor is not None:
+            clause, values = self._cursor_clause(orders, query.cursor)
+            if clause:
+                clauses.append(clause)
+                params.extend(values)
+
+        sql = f'SELECT id, data FROM {_quote(collection)}'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        order_terms = [f'{self._column(field)} {"DESC" if descending else "ASC"}' for field, descending in orders]
+        if not any(field == 'id' for field, _ in orders):
+            order_terms.append('id ASC')
+        sql += ' ORDER BY ' + ', '.join(order_terms)
+        if query.max_results is not None:
+            sql += ' LIMIT ?'
+            params.append(query.max_results)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+
+        for doc_id, text in rows:
+            data = _decode_document(text)
+            if query.fields is not None:
+                data = {field: data[field] for field in query.fields if field in data}
+            data.setdefault('id', doc_id)
+            yield data
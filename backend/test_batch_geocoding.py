@@ -0,0 +1,94 @@
+"""
+Test script for batch geocoding against a local stub Nominatim server
+Runs offline: no Firebase or internet access needed
+"""
+import sys
+import os
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.geocoding_service import GeocodingService
+from services.geocode_cache import GeocodeCache
+from services.batch_geocoder import geocode_batch
+
+STUB_RESULTS = {
+    '5511 bloomfield st, halifax, ns, canada': (44.659596, -63.594955),
+    '456 queen st, toronto, on, canada': (43.648230, -79.399458),
+    '789 king st, toronto, on, canada': (43.644720, -79.402130),
+}
+
+
+class StubNominatimHandler(BaseHTTPRequestHandler):
+    """Answers /search like Nominatim, from STUB_RESULTS"""
+    requests_seen = []
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query).get('q', [''])[0]
+        StubNominatimHandler.requests_seen.append((time.monotonic(), query))
+        coords = STUB_RESULTS.get(GeocodeCache.normalize(query))
+        body = [] if coords is None else [{
+            'lat': str(coords[0]),
+            'lon': str(coords[1]),
+            'display_name': query
+        }]
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubNominatimHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def test_batch_geocoding():
+    print("Testing batch geocoding against stub Nominatim...")
+    server = start_stub_server()
+    os.environ['NOMINATIM_DOMAIN'] = f'127.0.0.1:{server.server_port}'
+    os.environ['NOMINATIM_SCHEME'] = 'http'
+    StubNominatimHandler.requests_seen.clear()
+
+    try:
+        rate_limit = 5
+        service = GeocodingService(cache=GeocodeCache(path=None), rate_limit=rate_limit)
+        service.get_coordinates('5511 Bloomfield St, Halifax, NS, Canada')  # Warm the cache
+
+        addresses = [
+            '5511 Bloomfield St, Halifax, NS, Canada',
+            '456 Queen St, Toronto, ON, Canada',
+            '456  queen st , toronto, on, canada',  # Duplicate after normalization
+            '789 King St, Toronto, ON, Canada',
+            'Nowhere Lane, Atlantis',
+        ]
+        results = list(geocode_batch(service, addresses, max_workers=4))
+
+        assert len(results) == 4, results
+        assert results[0]['cached'] and results[0]['success']
+        assert sum(r['success'] for r in results) == 3
+        print(f"  ✅ {len(results)} distinct addresses, first served from cache")
+
+        # One warm-up request plus three uncached lookups; the duplicate never left the process
+        assert len(StubNominatimHandler.requests_seen) == 4
+        times = sorted(t for t, _ in StubNominatimHandler.requests_seen[1:])
+        gaps = [b - a for a, b in zip(times, times[1:])]
+        assert all(gap >= 1 / rate_limit - 0.02 for gap in gaps), gaps
+        print(f"  ✅ Provider requests spaced at >= {1 / rate_limit:.2f}s")
+    finally:
+        server.shutdown()
+
+    print("\n✅ Batch geocoding test completed!")
+
+
+if __name__ == "__main__":
+    test_batch_geocoding()
@@ -0,0 +1,38 @@
+"""
+Shared fixtures for the tests
+Each test gets its own in-memory SQLite store; nothing touches Firestore or a geocoder.
+"""
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Must be set before the services are imported
+os.environ['GEOCODE_CACHE_PATH'] = ''
+os.environ['STORAGE_BACKEND'] = 'sqlite'
+os.environ['SQLITE_PATH'] = ':memory:'
+
+from flask import Flask
+from storage import set_backend
+from storage.sqlite_backend import SQLiteBackend
+from models.models import _entity_caches
+
+
+@pytest.fixture
+def store():
+    """Empty in-memory store, with the entity caches cleared so nothing leaks between tests"""
+    set_backend(SQLiteBackend(':memory:'))
+    for cache in _entity_caches.values():
+        cache.clear()
+
+
+@pytest.fixture
+def client(store):
+    """Test client for the alert and utility routes; no notification service runs"""
+    from routes.alert_routes import alert_bp
+    from routes.utility_routes import utility_bp
+    app = Flask(__name__)
+    app.register_blueprint(alert_bp, url_prefix='/api/alerts')
+    app.register_blueprint(utility_bp)
+    return app.test_client()
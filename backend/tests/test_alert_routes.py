@@ -0,0 +1,57 @@
+"""
+Tests for the alert lifecycle routes: accepting, assigning a driver and closing alerts
+"""
+from models.models import FoodAlert, FoodBank
+
+
+def create_foodbank(name='Food Bank', capacity=100):
+    return FoodBank.create({'name': name, 'coordinates': {'lat': 44.65, 'lng': -63.58}, 'capacity': capacity})
+
+
+def test_accept_pending_alert_never_offered(client):
+    # Created while no food bank was active: still pending and offered to nobody
+    foodbank = create_foodbank()
+    alert = FoodAlert.create({'total_quantity': 5})
+
+    response = client.post(f'/api/alerts/{alert.id}/accept', json={'foodbank_id': foodbank.id})
+
+    assert response.status_code == 200
+    assert response.get_json()['alert']['status'] == FoodAlert.STATUSES['FOODBANK_ACCEPTED']
+    assert FoodBank.get_by_id(foodbank.id).current_load == 5
+
+
+def test_accept_notified_alert_by_other_foodbank(client):
+    offered, other = create_foodbank('Offered'), create_foodbank('Other')
+    alert = FoodAlert.create({
+        'status': FoodAlert.STATUSES['FOODBANK_NOTIFIED'],
+        'notified_foodbanks': [offered.id],
+        'total_quantity': 5
+    })
+
+    response = client.post(f'/api/alerts/{alert.id}/accept', json={'foodbank_id': other.id})
+
+    assert response.status_code == 409
+    assert FoodBank.get_by_id(other.id).current_load == 0
+
+
+def test_accept_twice_counts_load_once(client):
+    foodbank = create_foodbank()
+    alert = FoodAlert.create({
+        'status': FoodAlert.STATUSES['FOODBANK_NOTIFIED'],
+        'notified_foodbanks': [foodbank.id],
+        'total_quantity': 5
+    })
+
+    assert client.post(f'/api/alerts/{alert.id}/accept', json={'foodbank_id': foodbank.id}).status_code == 200
+    assert client.post(f'/api/alerts/{alert.id}/accept', json={'foodbank_id': foodbank.id}).status_code == 409
+    assert FoodBank.get_by_id(foodbank.id).current_load == 5
+
+
+def test_closing_accepted_alert_releases_load(client):
+    foodbank = create_foodbank()
+    alert = FoodAlert.create({'total_quantity': 5})
+    client.post(f'/api/alerts/{alert.id}/accept', json={'foodbank_id': foodbank.id})
+
+    assert client.put(f'/api/alerts/{alert.id}/status', json={'status': 'cancelled'}).status_code == 200
+    assert client.put(f'/api/alerts/{alert.id}/status', json={'status': 'cancelled'}).status_code == 200
+    assert FoodBank.get_by_id(foodbank.id).current_load == 0
@@ -0,0 +1,43 @@
+"""
+Tests for escalation timers and the lease that decides which worker runs them
+"""
+import pytest
+from flask import Flask
+from flask_socketio import SocketIO
+import services.notification_service as notification_module
+from services.notification_service import NotificationService
+
+
+@pytest.fixture
+def service(store):
+    socketio = SocketIO(Flask(__name__), async_mode='threading')
+    service = NotificationService(socketio)
+    yield service
+    service.scheduler.cancel_prefix('')
+
+
+def test_single_worker_schedules_without_lease(service, monkeypatch):
+    # A lease renewal that ran late must not drop the timer: no other worker would set it
+    monkeypatch.setattr(notification_module, 'MULTI_WORKER', False)
+    assert not service.escalation_leader.is_leader
+
+    service.start_escalation_timer('alert-1', None)
+
+    assert service.scheduler.due_at('escalation_alert-1') is not None
+
+
+def test_multi_worker_follower_leaves_timer_to_leader(service, monkeypatch):
+    monkeypatch.setattr(notification_module, 'MULTI_WORKER', True)
+
+    service.start_escalation_timer('alert-1', None)
+
+    assert service.scheduler.due_at('escalation_alert-1') is None
+
+
+def test_sync_stays_scheduled_while_lease_lapses(service, monkeypatch):
+    monkeypatch.setattr(notification_module, 'MULTI_WORKER', True)
+    assert not service.escalation_leader.is_leader
+
+    service._sync_escalations()
+
+    assert service.scheduler.due_at('escalation_sync') is not None
@@ -0,0 +1,53 @@
+"""
+Tests for food bank matching: capacity scores follow the load alerts put on food banks
+"""
+import pytest
+from models.models import FoodAlert, FoodBank
+from services.foodbank_locator import FoodBankLocator
+from services.foodbank_matcher import FoodBankMatcher, AcceptanceStats
+
+RESTAURANT = (44.6488, -63.5752)
+
+
+@pytest.fixture
+def matcher(store):
+    locator = FoodBankLocator()
+    locator.ensure_loaded()
+    yield FoodBankMatcher(locator=locator, acceptance=AcceptanceStats(refresh_seconds=3600))
+    locator.view._watch.unsubscribe()
+
+
+def create_foodbank(**fields):
+    return FoodBank.create(dict({
+        'name': 'Food Bank',
+        'coordinates': {'lat': RESTAURANT[0], 'lng': RESTAURANT[1]}
+    }, **fields))
+
+
+def score_of(matcher, foodbank, quantity):
+    return next(score for fb, _, score in matcher.rank(*RESTAURANT, quantity) if fb.id == foodbank.id)
+
+
+def test_capacity_score_recovers_after_delivery(matcher, client):
+    foodbank = create_foodbank(capacity=20)
+    alert = FoodAlert.create({
+        'status': FoodAlert.STATUSES['FOODBANK_NOTIFIED'],
+        'notified_foodbanks': [foodbank.id],
+        'total_quantity': 20
+    })
+    before = score_of(matcher, foodbank, 20)
+
+    assert client.post(f'/api/alerts/{alert.id}/accept', json={'foodbank_id': foodbank.id}).status_code == 200
+    assert score_of(matcher, foodbank, 20) == pytest.approx(before - matcher.weights['capacity'])
+
+    assert client.put(f'/api/alerts/{alert.id}/status', json={'status': 'delivered'}).status_code == 200
+    assert score_of(matcher, foodbank, 20) == pytest.approx(before)
+
+
+def test_rank_with_capacity_cleared(matcher):
+    # capacity and current_load can be cleared through PUT /api/foodbanks/<id>
+    foodbank = create_foodbank(capacity=None, current_load=None)
+
+    assert score_of(matcher, foodbank, 20) == pytest.approx(
+        matcher.weights['distance'] + matcher.weights['acceptance'] * 0.5
+    )
@@ -0,0 +1,27 @@
+"""
+Tests that waiting for the geocoding rate limit leaves the eventlet hub free
+"""
+import time
+import eventlet
+from services.rate_limiter import RateLimiter
+
+
+def test_acquire_on_hub_lets_other_green_threads_run():
+    limiter = RateLimiter(5)
+    ticks = []
+
+    def wait_for_slots():
+        for _ in range(3):
+            limiter.acquire()
+
+    def tick():
+        for _ in range(8):
+            ticks.append(time.monotonic())
+            eventlet.sleep(0.05)
+
+    ticker = eventlet.spawn(tick)
+    eventlet.spawn(wait_for_slots).wait()
+    ticker.wait()
+
+    gaps = [b - a for a, b in zip(ticks, ticks[1:])]
+    assert max(gaps) < 0.15, gaps
@@ -0,0 +1,44 @@
+"""
+Tests for input validation on the utility routes
+"""
+import pytest
+
+HALIFAX = {'latitude': 44.648764, 'longitude': -63.575239}
+
+
+def test_distance_matrix_of_coordinates(client):
+    response = client.post('/api/utility/distance-matrix', json={
+        'origins': [HALIFAX],
+        'destinations': [HALIFAX, {'latitude': '44.66', 'longitude': '-63.59'}]
+    })
+
+    assert response.status_code == 200
+    assert response.get_json()['distances_km'][0][0] == 0
+
+
+@pytest.mark.parametrize('location', [
+    {'latitude': 'north', 'longitude': -63.5},
+    {'latitude': 44.6},
+    {'latitude': 144.6, 'longitude': -63.5},
+    {'latitude': None, 'longitude': -63.5},
+    [44.6, -63.5],
+    42
+])
+def test_distance_matrix_rejects_malformed_location(client, location):
+    response = client.post('/api/utility/distance-matrix', json={
+        'origins': [HALIFAX],
+        'destinations': [HALIFAX, location]
+    })
+
+    assert response.status_code == 400
+    assert 'destinations[1]' in response.get_json()['error']
+
+
+@pytest.mark.parametrize('max_results', ['5', 2.5, 0, -3, True, None])
+def test_nearest_foodbanks_rejects_bad_max_results(client, max_results):
+    response = client.post('/api/utility/nearest-foodbanks', json={
+        'restaurant_address': '5511 Bloomfield St, Halifax, NS',
+        'max_results': max_results
+    })
+
+    assert response.status_code == 400
@@ -123,11 +123,21 @@ def register_socketio_handlers(socketio):
     @socketio.on('location_update')
     def handle_location_update(data):
         """Handle real-time location updates from drivers"""
+        from services.driver_location_store import driver_location_store
+        
         driver_id = data.get('driver_id')
         location = data.get('location')  # {lat, lng}
         alert_id = data.get('alert_id')
         
         if driver_id and location:
+            position = driver_location_store.parse_location(location)
+            if not position:
+                emit('error', {'message': 'location must have numeric lat and lng'})
+                return
+            
+            # Kept in memory and saved to the driver in the next batched flush
+            driver_location_store.update(driver_id, *position)
+            
             # Broadcast location update to relevant parties
             if alert_id:
                 # Notify restaurant and food bank about driver location
@@ -137,6 +147,6 @@ def register_socketio_handlers(socketio):
                     'alert_id': alert_id
                 }, room=f'alert_{alert_id}')
             
-            logging.info(f"Location update from driver {driver_id}: {location}")
+            logging.debug(f"Location update from driver {driver_id}: {location}")
 
     return socketio
@@ -0,0 +1,8 @@
+"""
+JSON module for Socket.IO packets and message-queue traffic
+Uses the same encoder as REST responses (services.json_codec), so WebSocket
+payloads match them, datetimes included.
+"""
+from services.json_codec import dumps, loads
+
+__all__ = ['dumps', 'loads']
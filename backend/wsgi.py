@@ -0,0 +1,9 @@
+"""
+WSGI entry point for running the API under gunicorn
+Socket.IO needs one eventlet worker per process; scale out with more processes
+sharing SOCKETIO_MESSAGE_QUEUE (see README):
+    gunicorn -k eventlet -w 1 -b 0.0.0.0:5001 wsgi:app
+"""
+from app import create_app
+
+app, socketio = create_app()